@@ -0,0 +1,194 @@
+"""In-process load tests of /api/analyze, /api/export-csv and /api/upload-csv.
+
+Every scenario runs in a fresh spawned process with its own scratch
+directory: a synthetic dataset as data/public and an empty user store. The
+app is imported there and driven through httpx's ASGI transport (no socket,
+no background precomputer or live feed) by ``--clients`` concurrent
+clients, each registered and logged in as its own user. After one warm-up
+request per client, ``--requests`` requests are timed.
+
+Scenarios:
+
+- ``analyze``: a different MA window on every request, so each is computed
+  and serialized (only the frames are cached)
+- ``analyze_cached``: the same query repeated, served from the response cache
+- ``export``: full-history CSV export, varied like ``analyze``
+- ``upload``: a ``--upload-rows`` row CSV per request, replacing the client's
+  own ticker
+
+::
+
+    python -m benchmarks.api_load --tickers 1 100 --rows 10000 --clients 8 --requests 200 --out load.json
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from queue import Empty
+
+import numpy as np
+
+from .datasets import default_freq, synthetic_ohlcv, ticker_names, write_dataset
+from .results import ROOT, Results, save
+from .upload import peak_mb
+
+SCENARIOS = ["analyze", "analyze_cached", "export", "upload"]
+PASSWORD = "benchmark-password"
+
+
+def request_for(scenario: str, client: int, i: int, tickers: list, rng: np.random.Generator, upload: bytes):
+    """(method, url, keyword arguments) of client ``client``'s ``i``-th request."""
+    stock = tickers[(client + i) % len(tickers)]
+    if scenario == "analyze":
+        return "GET", "/api/analyze", {"params": {"stock": stock, "ma_window": int(rng.integers(5, 200))}}
+    if scenario == "analyze_cached":
+        return "GET", "/api/analyze", {"params": {"stock": tickers[0]}}
+    if scenario == "export":
+        return "GET", "/api/export-csv", {"params": {"stock": stock, "ma_window": int(rng.integers(5, 200))}}
+    return "POST", "/api/upload-csv", {"files": {"file": (f"U{client}.csv", upload, "text/csv")}}
+
+
+async def login(client, clients: int) -> list:
+    async def one(i):
+        r = await client.post("/register", json={"username": f"bench{i}", "email": f"bench{i}@example.com",
+                                                 "password": PASSWORD})
+        r.raise_for_status()
+        r = await client.post("/token", data={"username": f"bench{i}", "password": PASSWORD})
+        r.raise_for_status()
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+    return await asyncio.gather(*(one(i) for i in range(clients)))
+
+
+async def drive(app, scenario: str, tickers: list, clients: int, requests: int, upload: bytes, seed: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        headers = await login(client, clients)
+        latencies, sizes, errors = [], [], []
+
+        async def one(c: int, i: int, rng, record: bool):
+            method, url, kwargs = request_for(scenario, c, i, tickers, rng, upload)
+            start = time.perf_counter()
+            r = await client.request(method, url, headers=headers[c], **kwargs)
+            body = r.content
+            if record:
+                latencies.append(time.perf_counter() - start)
+                sizes.append(len(body))
+                if r.status_code != 200:
+                    errors.append(r.status_code)
+
+        async def loop(c: int, count: int):
+            rng = np.random.default_rng(seed + c)
+            for i in range(count):
+                await one(c, i + 1, rng, True)
+
+        await asyncio.gather(*(one(c, 0, np.random.default_rng(seed + c), False) for c in range(clients)))
+        counts = [requests // clients + (c < requests % clients) for c in range(clients)]
+        start = time.perf_counter()
+        await asyncio.gather(*(loop(c, n) for c, n in enumerate(counts)))
+        elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1e3
+    return {
+        "requests_per_s": len(ms) / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_bytes": float(np.mean(sizes)),
+        "errors": len(errors),
+        "peak_rss_mb": peak_mb(),
+    }
+
+
+def worker(workdir: str, scenario: str, tickers: list, clients: int, requests: int, upload: bytes, seed: int,
+           results):
+    os.chdir(workdir)
+    # Frames stay in this process; a shared store would outlive the run
+    os.environ["SHARED_CACHE_DIR"] = ""
+    sys.path.insert(0, ROOT)
+    import main
+    results.put(asyncio.run(drive(main.app, scenario, tickers, clients, requests, upload, seed)))
+
+
+def run_case(scenario: str, dataset: str, tickers: list, clients: int, requests: int, upload: bytes,
+             seed: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="api-load-")
+    try:
+        os.makedirs(os.path.join(workdir, "data", "users"))
+        os.symlink(dataset, os.path.join(workdir, "data", "public"))
+        os.symlink(os.path.join(ROOT, "static"), os.path.join(workdir, "static"))
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        proc = ctx.Process(target=worker, args=(workdir, scenario, tickers, clients, requests, upload, seed, queue))
+        proc.start()
+        while True:
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Empty:
+                if not proc.is_alive():
+                    raise RuntimeError(f"{scenario} worker exited with code {proc.exitcode}")
+        proc.join()
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(scenarios, tickers_list, rows_list, clients: int, requests: int, upload_rows: int, seed: int = 0) -> Results:
+    results = {}
+    root = tempfile.mkdtemp(prefix="api-load-data-")
+    upload = synthetic_ohlcv(upload_rows, seed=seed, freq=default_freq(upload_rows)) \
+        .to_csv(index=False, date_format="%Y-%m-%d %H:%M:%S").encode("utf-8")
+    try:
+        for rows in rows_list:
+            for tickers in tickers_list:
+                dataset = os.path.join(root, f"{tickers}-{rows}")
+                write_dataset(dataset, tickers, rows, seed=seed)
+                for scenario in scenarios:
+                    # Uploads don't read the dataset
+                    if scenario == "upload" and (tickers, rows) != (tickers_list[0], rows_list[0]):
+                        continue
+                    case = f"http/{scenario}/rows={upload_rows}" if scenario == "upload" \
+                        else f"http/{scenario}/tickers={tickers},rows={rows}"
+                    results[case] = run_case(scenario, dataset, ticker_names(tickers), clients, requests,
+                                             upload, seed)
+                shutil.rmtree(dataset, ignore_errors=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000], help="rows per ticker")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--upload-rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def print_results(results: Results):
+    print(f"{'case':<44} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12} {'errors':>7}")
+    for case, r in results.items():
+        print(f"{case:<44} {r['requests_per_s']:>8.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+              f"{r['peak_rss_mb']:>12.1f} {r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+    results = run(args.scenarios, args.tickers, args.rows, args.clients, args.requests, args.upload_rows,
+                  args.seed)
+    print_results(results)
+    if args.out:
+        save(args.out, "api_load", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Login throughput and /api/analyze tail latency during a login burst.
+
+Starts the app under uvicorn in a scratch directory (copy of data/public,
+fresh user store), then measures /api/analyze latency on its own and while
+concurrent clients hammer POST /token::
+
+    python -m benchmarks.auth_load --duration 10 --analyze-clients 8 --login-clients 16
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark-password"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: str, port: int) -> subprocess.Popen:
+    shutil.copytree(os.path.join(ROOT, "data", "public"), os.path.join(workdir, "data", "public"))
+    os.symlink(os.path.join(ROOT, "static"), os.path.join(workdir, "static"))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", ROOT, "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/metrics")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def register(client: httpx.AsyncClient, users: int):
+    async def one(i):
+        r = await client.post("/register", json={"username": f"bench{i}", "email": f"bench{i}@example.com",
+                                                 "password": PASSWORD})
+        r.raise_for_status()
+    await asyncio.gather(*(one(i) for i in range(users)))
+    r = await client.post("/token", data={"username": "bench0", "password": PASSWORD})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def analyze_loop(client, headers, stock, stop_at, latencies):
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        r = await client.get("/api/analyze", params={"stock": stock}, headers=headers)
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def login_loop(client, users, worker, stop_at, counter):
+    i = worker
+    while time.monotonic() < stop_at:
+        r = await client.post("/token", data={"username": f"bench{i % users}", "password": PASSWORD})
+        r.raise_for_status()
+        counter.append(1)
+        i += 1
+
+
+async def phase(client, headers, stock, duration, analyze_clients, login_clients, users):
+    stop_at = time.monotonic() + duration
+    latencies, logins = [], []
+    tasks = [analyze_loop(client, headers, stock, stop_at, latencies) for _ in range(analyze_clients)]
+    tasks += [login_loop(client, users, w, stop_at, logins) for w in range(login_clients)]
+    await asyncio.gather(*tasks)
+    lat = np.array(latencies) * 1e3
+    return {"analyze_requests": len(lat), "analyze_p50_ms": float(np.percentile(lat, 50)),
+            "analyze_p99_ms": float(np.percentile(lat, 99)), "logins_per_s": len(logins) / duration}
+
+
+async def run(args):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(workdir, port)
+        try:
+            limits = httpx.Limits(max_connections=args.analyze_clients + args.login_clients + 4)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+                await wait_ready(client)
+                headers = await register(client, args.users)
+                # Warm the frame and indicator caches
+                await client.get("/api/analyze", params={"stock": args.stock}, headers=headers)
+                quiet = await phase(client, headers, args.stock, args.duration, args.analyze_clients, 0, args.users)
+                burst = await phase(client, headers, args.stock, args.duration, args.analyze_clients,
+                                    args.login_clients, args.users)
+        finally:
+            server.terminate()
+            server.wait()
+    return {"quiet": quiet, "login_burst": burst}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--analyze-clients", type=int, default=8)
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--stock", default="NVDA")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(f"{'phase':<12} {'analyze reqs':>12} {'p50 ms':>9} {'p99 ms':>9} {'logins/s':>9}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['analyze_requests']:>12} {r['analyze_p50_ms']:>9.1f} {r['analyze_p99_ms']:>9.1f} "
+              f"{r['logins_per_s']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
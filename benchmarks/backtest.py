@@ -0,0 +1,107 @@
+"""Parity check and timing of the array-based backtester.
+
+Every strategy is checked against a plain Python loop (signal state machine
+and equity recurrence), then timed per ticker-strategy on synthetic daily
+bars with a cold indicator cache::
+
+    python -m benchmarks.backtest --rows 2520 --tickers 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from stock_analysis.backtest import STRATEGIES, backtest
+from stock_analysis.engine import IndicatorEngine
+from .datasets import synthetic_ohlcv
+
+PARAMS = {
+    "ma_cross": {"fast": 20, "slow": 50},
+    "ema_cross": {"fast": 12, "slow": 26},
+    "rsi": {"window": 14, "lower": 30, "upper": 70},
+    "bollinger": {"window": 20, "num_std": 2.0},
+    "macd": {"fast": 12, "slow": 26, "signal": 9},
+}
+FEE_BPS = 5.0
+SLIPPAGE_BPS = 2.0
+
+
+def loop_positions(strategy: str, columns: dict, close: np.ndarray) -> np.ndarray:
+    p = PARAMS[strategy]
+    out = np.zeros(len(close), dtype=bool)
+    state = False
+    for t in range(len(close)):
+        if strategy == "ma_cross":
+            state = columns[f"MA_{p['fast']}"][t] > columns[f"MA_{p['slow']}"][t]
+        elif strategy == "ema_cross":
+            state = columns[f"EMA_{p['fast']}"][t] > columns[f"EMA_{p['slow']}"][t]
+        elif strategy == "macd":
+            state = columns["MACD"][t] > columns["MACD_Signal"][t]
+        elif strategy == "rsi":
+            rsi = columns[f"RSI_{p['window']}"][t]
+            if rsi < p["lower"]:
+                state = True
+            elif rsi > p["upper"]:
+                state = False
+        elif strategy == "bollinger":
+            w = p["window"]
+            if close[t] > columns[f"Upper_BB_{w}"][t]:
+                state = True
+            elif close[t] < columns[f"SMA_{w}"][t]:
+                state = False
+        out[t] = state
+    return out
+
+
+def loop_equity(close: np.ndarray, positions: np.ndarray, cost: float) -> np.ndarray:
+    equity = np.empty(len(close))
+    value, held = 1.0, 0.0
+    for t in range(len(close)):
+        if t:
+            value *= 1.0 + held * (close[t] / close[t - 1] - 1.0)
+        target = float(positions[t])
+        value *= 1.0 - cost * abs(target - held)
+        held = target
+        equity[t] = value
+    return equity
+
+
+def check_parity(df):
+    close = df["Close"].to_numpy()
+    for strategy, params in PARAMS.items():
+        engine = IndicatorEngine()
+        result = backtest(df, engine, strategy, params, FEE_BPS, SLIPPAGE_BPS)
+        specs, _ = STRATEGIES[strategy](**params)
+        expected = loop_positions(strategy, engine.compute(df, specs), close)
+        assert np.array_equal(result["positions"], expected), strategy
+        equity = loop_equity(close, expected, (FEE_BPS + SLIPPAGE_BPS) / 1e4)
+        np.testing.assert_allclose(result["equity"], equity, rtol=1e-10, err_msg=strategy)
+
+
+def run(rows: int, tickers: int):
+    frames = [synthetic_ohlcv(rows, seed=i) for i in range(tickers)]
+    check_parity(frames[0])
+    results = []
+    for strategy, params in PARAMS.items():
+        start = time.perf_counter()
+        for df in frames:
+            # A fresh engine per ticker: nothing comes from the indicator cache
+            backtest(df, IndicatorEngine(), strategy, params, FEE_BPS, SLIPPAGE_BPS)
+        elapsed = time.perf_counter() - start
+        results.append({"strategy": strategy, "rows": rows, "tickers": tickers,
+                        "ms_per_ticker": elapsed / tickers * 1e3})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2520)
+    parser.add_argument("--tickers", type=int, default=50)
+    args = parser.parse_args()
+    print(f"{'strategy':<10} {'rows':>7} {'tickers':>8} {'ms/ticker':>10}")
+    for r in run(args.rows, args.tickers):
+        print(f"{r['strategy']:<10} {r['rows']:>7} {r['tickers']:>8} {r['ms_per_ticker']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
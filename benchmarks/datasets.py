@@ -0,0 +1,75 @@
+"""Synthetic OHLCV data: single frames and whole ticker directories.
+
+    python -m benchmarks.datasets --out /tmp/bench-data --tickers 1000 --rows 10000
+"""
+import argparse
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from stock_analysis.columnar import write_columnar
+
+# Longer daily series run past 2262, where nanosecond dates end; use minute bars
+MAX_DAILY_ROWS = 80_000
+
+
+def default_freq(rows: int) -> str:
+    return "D" if rows <= MAX_DAILY_ROWS else "min"
+
+
+def synthetic_ohlcv(rows: int, seed: int = 0, start: str = "2000-01-03", freq: str = "D") -> pd.DataFrame:
+    """Geometric random-walk OHLCV bars shaped like the files in data/public."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+    open_ = np.empty(rows)
+    open_[:1] = close[:1]
+    open_[1:] = close[:-1] * np.exp(rng.normal(0, 0.005, max(rows - 1, 0)))
+    spread = np.abs(rng.normal(0, 0.01, rows)) * close
+    return pd.DataFrame({
+        "Date": pd.date_range(start, periods=rows, freq=freq),
+        "Close": close,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Open": open_,
+        "Volume": rng.integers(1_000_000, 50_000_000, rows),
+    })
+
+
+def ticker_names(tickers: int) -> List[str]:
+    return [f"T{i:04d}" for i in range(tickers)]
+
+
+def write_dataset(directory: str, tickers: int, rows: int, fmt: str = "columnar", seed: int = 0) -> List[str]:
+    """Write ``tickers`` tickers of ``rows`` bars each into ``directory``; returns their names.
+
+    ``fmt`` is ``columnar`` (.cols, what the app keeps) or ``csv`` (what
+    users upload, converted on first load). Ticker i uses seed ``seed + i``,
+    so a dataset is the same on every run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = ticker_names(tickers)
+    for i, name in enumerate(names):
+        df = synthetic_ohlcv(rows, seed=seed + i, freq=default_freq(rows))
+        if fmt == "csv":
+            df.to_csv(os.path.join(directory, f"{name}.csv"), index=False, date_format="%Y-%m-%d %H:%M:%S")
+        else:
+            write_columnar(df, os.path.join(directory, f"{name}.cols"))
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="directory to write the tickers to")
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--format", choices=["columnar", "csv"], default="columnar")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    names = write_dataset(args.out, args.tickers, args.rows, args.format, args.seed)
+    print(f"{len(names)} tickers of {args.rows} rows in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Peak memory and time-to-first-byte of the CSV export.
+
+Compares the old whole-file export (``to_csv`` into a StringIO, sent as one
+string) with the chunked encoder, plain and gzipped through the response
+cache as the app serves it. Each measurement runs in a fresh interpreter so
+peak RSS is not polluted by earlier runs::
+
+    python -m benchmarks.export --rows 100000 1000000
+"""
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from stock_analysis.engine import IndicatorEngine
+from stock_analysis.http_cache import ResponseCache
+from stock_analysis.serialize import iter_csv
+from .datasets import synthetic_ohlcv
+
+SPECS = [("ma", {"window": 30}), ("rsi", {"window": 14}), ("ema", {"span": 14}),
+         ("bollinger", {"window": 20, "num_std": 2.0}), ("macd", {}), ("atr", {"window": 14})]
+VARIANTS = ["legacy", "chunked", "chunked_gzip"]
+
+
+def legacy_body(df):
+    output = io.StringIO()
+    df.to_csv(output, index=False)
+    output.seek(0)
+    return iter([output.getvalue()])
+
+
+def body(variant: str, df):
+    if variant == "legacy":
+        return legacy_body(df)
+    if variant == "chunked":
+        return iter_csv(df)
+    # The path the app serves: compressed while it streams and kept in the response cache
+    return ResponseCache().tee("export", iter_csv(df), compressed=True)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(variant: str, rows: int) -> dict:
+    df = IndicatorEngine().apply(synthetic_ohlcv(rows), SPECS)
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    first_byte = None
+    sent = 0
+    for chunk in body(variant, df):
+        if chunk and first_byte is None:
+            first_byte = time.perf_counter() - start
+        sent += len(chunk)
+    return {"variant": variant, "rows": rows, "ttfb_s": first_byte, "total_s": time.perf_counter() - start,
+            "bytes": sent, "peak_rss_delta_mb": peak_rss_mb() - before}
+
+
+def run(rows_list):
+    results = []
+    for rows in rows_list:
+        for variant in VARIANTS:
+            out = subprocess.run([sys.executable, "-m", "benchmarks.export", "--measure", variant, str(rows)],
+                                 capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--measure", nargs=2, metavar=("VARIANT", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], int(args.measure[1]))))
+        return
+    print(f"{'rows':>10} {'variant':<14} {'ttfb ms':>10} {'total ms':>10} {'MB sent':>9} {'peak RSS +MB':>13}")
+    for r in run(args.rows):
+        print(f"{r['rows']:>10} {r['variant']:<14} {r['ttfb_s'] * 1e3:>10.1f} {r['total_s'] * 1e3:>10.1f} "
+              f"{r['bytes'] / 2 ** 20:>9.1f} {r['peak_rss_delta_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
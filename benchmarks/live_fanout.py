@@ -0,0 +1,130 @@
+"""Live update fan-out: subscribers per core against a simulated bar feed.
+
+A public ticker gets one new bar per tick through DataLoader.append_bars.
+Each tick then runs one LiveFeed poll (indicator state update and
+serialization, once per channel), queues the message for every subscriber
+and has each subscriber's writer task hand it to a stand-in socket that
+encodes the frame. Subscribers belong to distinct users and are spread over
+``--channels`` indicator parameter sets::
+
+    python -m benchmarks.live_fanout --subscribers 1 100 1000 10000 --channels 1 10
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from stock_analysis.columnar import write_columnar
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.engine import IndicatorEngine
+from stock_analysis.live import LiveFeed, Subscriber
+from .datasets import synthetic_ohlcv
+
+SPECS = [
+    ("ma", {"window": 30}),
+    ("rsi", {"window": 14}),
+    ("ema", {"span": 14}),
+    ("bollinger", {"window": 20, "num_std": 2.0}),
+    ("macd", {"fast": 12, "slow": 26, "signal": 9}),
+    ("atr", {"window": 14}),
+]
+
+
+class Socket:
+    """Stands in for a WebSocket: encodes each frame and counts it."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, text: str):
+        self.bytes += len(text.encode("utf-8"))
+        self.frames += 1
+
+
+async def writer(subscriber: Subscriber, socket: Socket, received: list, target: list, done: asyncio.Event):
+    while True:
+        await socket.send_text(await subscriber.queue.get())
+        received[0] += 1
+        if received[0] >= target[0]:
+            done.set()
+
+
+def specs_for(channel: int):
+    return [(name, {**params, "window": params["window"] + channel}) if "window" in params else (name, params)
+            for name, params in SPECS]
+
+
+async def run_case(workdir: str, rows: int, subscribers: int, channels: int, ticks: int) -> dict:
+    public = os.path.join(workdir, "public")
+    shutil.rmtree(public, ignore_errors=True)
+    os.makedirs(public)
+    history = synthetic_ohlcv(rows + ticks, freq="min")
+    write_columnar(history.iloc[:rows], os.path.join(public, "FEED.cols"))
+    loader = DataLoader(public, os.path.join(workdir, "users"), revalidate_seconds=3600)
+    feed = LiveFeed(loader, IndicatorEngine())
+    received, target, done = [0], [0], asyncio.Event()
+    tasks = []
+    for i in range(subscribers):
+        subscriber = Subscriber(f"user{i}")
+        await feed.subscribe(subscriber, "FEED", specs_for(i % channels))
+        tasks.append(asyncio.create_task(writer(subscriber, Socket(), received, target, done)))
+
+    append_s, fanout_s, cpu_s = [], [], []
+    for tick in range(ticks):
+        bar = history.iloc[rows + tick:rows + tick + 1].reset_index(drop=True)
+        start = time.perf_counter()
+        loader.append_bars("FEED", bar)
+        append_s.append(time.perf_counter() - start)
+        target[0] += subscribers
+        done.clear()
+        start, cpu = time.perf_counter(), time.process_time()
+        feed.deliver(*feed.poll())
+        await done.wait()
+        fanout_s.append(time.perf_counter() - start)
+        cpu_s.append(time.process_time() - cpu)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    cpu_per_tick = float(np.median(cpu_s))
+    return {
+        "subscribers": subscribers,
+        "channels": channels,
+        "append_ms": float(np.median(append_s)) * 1e3,
+        "fanout_ms": float(np.median(fanout_s)) * 1e3,
+        "fanout_p99_ms": float(np.percentile(fanout_s, 99)) * 1e3,
+        "us_per_delivery": cpu_per_tick / subscribers * 1e6,
+        # Subscribers one core can keep current when every ticker gets a bar per second
+        "subscribers_per_core": subscribers / cpu_per_tick if cpu_per_tick else float("inf"),
+    }
+
+
+def run(rows: int, subscriber_counts: list, channel_counts: list, ticks: int) -> list:
+    workdir = tempfile.mkdtemp(prefix="live-bench-")
+    try:
+        return [asyncio.run(run_case(workdir, rows, s, c, ticks))
+                for c in channel_counts for s in subscriber_counts if c <= s]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="history rows before the feed starts")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+    print(f"{'subs':>6} {'channels':>8} {'append ms':>9} {'fan-out ms':>10} {'p99 ms':>7} "
+          f"{'us/delivery':>11} {'subs/core @1 bar/s':>18}")
+    for r in run(args.rows, args.subscribers, args.channels, args.ticks):
+        print(f"{r['subscribers']:>6} {r['channels']:>8} {r['append_ms']:>9.2f} {r['fanout_ms']:>10.2f} "
+              f"{r['fanout_p99_ms']:>7.2f} {r['us_per_delivery']:>11.1f} {r['subscribers_per_core']:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
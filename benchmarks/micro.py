@@ -0,0 +1,128 @@
+"""Micro-benchmarks of every TechnicalIndicators.add_* method and of DataLoader.load_data.
+
+Indicators are timed on one synthetic ticker per ``--rows`` size. Loading is
+timed on one ticker per ``--rows`` size and on ``--tickers`` tickers of
+``--ticker-rows`` rows, in three phases: the first load of an uploaded CSV
+(parse plus conversion to .cols), a cold load of the .cols file by a fresh
+DataLoader (the file itself is in the OS page cache) and a warm load from
+the frame cache. Every phase is repeated ``--repeat`` times::
+
+    python -m benchmarks.micro --rows 1000 100000 10000000 --tickers 1 100 1000 --out micro.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from stock_analysis.columnar import COLUMNAR_SUFFIX
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.indicators import TechnicalIndicators
+from .datasets import synthetic_ohlcv, write_dataset
+from .indicators import METHODS
+from .results import Results, save
+
+LOAD_PHASES = ["csv_first", "columnar_cold", "warm"]
+
+
+def timings(func, repeat: int) -> np.ndarray:
+    """Seconds per call of ``func`` in each of ``repeat`` samples.
+
+    Fast calls are looped within a sample (as ``timeit`` does) until it
+    takes at least 50 ms, so timer resolution and one-off stalls even out.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < 0.05 and number < 10_000:
+        number *= 4
+    return np.array(timer.repeat(repeat, number)) / number
+
+
+def once(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_indicators(rows_list, repeat: int) -> Results:
+    results = {}
+    for rows in rows_list:
+        df = synthetic_ohlcv(rows)[["Close", "High", "Low"]]
+        for method in METHODS:
+            add = getattr(TechnicalIndicators, method)
+            seconds = timings(lambda: add(df.copy(deep=False)), repeat)
+            results[f"indicators/{method}/rows={rows}"] = {
+                "median_ms": float(np.median(seconds)) * 1e3,
+                "min_ms": float(seconds.min()) * 1e3,
+            }
+    return results
+
+
+def bench_load(workdir: str, tickers: int, rows: int, repeat: int) -> Results:
+    public = os.path.join(workdir, f"public-{tickers}-{rows}")
+    names = write_dataset(public, tickers, rows, fmt="csv")
+    samples = {phase: [] for phase in LOAD_PHASES}
+    for _ in range(repeat):
+        for name in names:
+            # Back to the uploaded CSV alone
+            columnar = os.path.join(public, f"{name}{COLUMNAR_SUFFIX}")
+            if os.path.exists(columnar):
+                os.remove(columnar)
+        loader = None
+        for phase in LOAD_PHASES:
+            if phase != "warm":
+                # Room for every frame, so the warm phase never misses
+                loader = DataLoader(public, os.path.join(workdir, "users"), cache_bytes=2 ** 40)
+            samples[phase].append([once(lambda: loader.load_data(name)) for name in names])
+    results = {}
+    for phase, runs in samples.items():
+        seconds = np.array(runs)
+        results[f"load_data/{phase}/tickers={tickers},rows={rows}"] = {
+            "per_ticker_ms": float(np.median(seconds)) * 1e3,
+            "total_ms": float(np.median(seconds.sum(axis=1))) * 1e3,
+        }
+    shutil.rmtree(public, ignore_errors=True)
+    return results
+
+
+def run(rows_list, tickers_list, ticker_rows: int, repeat: int) -> Results:
+    results = bench_indicators(rows_list, repeat)
+    workdir = tempfile.mkdtemp(prefix="micro-bench-")
+    try:
+        cases = [(1, rows) for rows in rows_list] + [(t, ticker_rows) for t in tickers_list if t > 1]
+        for tickers, rows in cases:
+            results.update(bench_load(workdir, tickers, rows, repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--ticker-rows", type=int, default=2_520, help="rows per ticker in multi-ticker loads")
+    parser.add_argument("--repeat", type=int, default=5)
+
+
+def print_results(results: Results):
+    print(f"{'case':<56} {'ms (median per ticker)':>22}")
+    for case, r in results.items():
+        print(f"{case:<56} {r.get('median_ms', r.get('per_ticker_ms')):>22.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+    results = run(args.rows, args.tickers, args.ticker_rows, args.repeat)
+    print_results(results)
+    if args.out:
+        save(args.out, "micro", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark results as JSON, and regression checks between two runs.
+
+A results file maps a case name (``indicators/add_ma/rows=100000``) to its
+metrics. A metric's unit suffix says which way is better: ``_per_s`` higher,
+``_ms``, ``_s`` and ``_mb`` lower. More ``errors`` is always a regression;
+other metrics are recorded but not compared::
+
+    python -m benchmarks.results baseline.json current.json --threshold 0.15
+
+exits with status 1 if any metric got worse by more than the threshold.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Results = Dict[str, Dict[str, float]]
+
+
+def environment() -> dict:
+    """What a run's numbers depend on besides the code."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    import numpy
+    import pandas
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save(path: str, suite: str, params: dict, results: Results):
+    document = {
+        "suite": suite,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def direction(metric: str) -> Optional[int]:
+    """+1 if higher is better, -1 if lower is better, None if not compared."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_s", "_mb")):
+        return -1
+    return None
+
+
+def compare(baseline: Results, current: Results, threshold: float = 0.15, min_ms: float = 0.5) -> List[dict]:
+    """Every compared metric present in both runs, with its relative change.
+
+    ``change`` is positive when the metric got worse. Timings below
+    ``min_ms`` in both runs are too close to timer noise to flag.
+    """
+    rows = []
+    for case in sorted(baseline.keys() & current.keys()):
+        for metric in sorted(baseline[case].keys() & current[case].keys()):
+            sign = direction(metric)
+            before, after = baseline[case][metric], current[case][metric]
+            if metric == "errors":
+                if after != before:
+                    rows.append({"case": case, "metric": metric, "baseline": before, "current": after,
+                                 "change": float(after > before), "regression": after > before})
+                continue
+            if sign is None or before is None or after is None or before == 0:
+                continue
+            change = (before - after) / before if sign > 0 else (after - before) / before
+            quiet = metric.endswith("_ms") and max(before, after) < min_ms
+            rows.append({"case": case, "metric": metric, "baseline": before, "current": after,
+                         "change": change, "regression": change > threshold and not quiet})
+    return rows
+
+
+def report(rows: List[dict], threshold: float):
+    """Print the metrics that changed by more than ``threshold`` either way."""
+    print(f"{'case':<48} {'metric':<16} {'baseline':>12} {'current':>12} {'change':>8}")
+    for r in rows:
+        if abs(r["change"]) <= threshold:
+            continue
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['case']:<48} {r['metric']:<16} {r['baseline']:>12.4g} {r['current']:>12.4g} "
+              f"{r['change'] * 100:>+7.1f}%{flag}")
+
+
+def check(baseline_path: str, current: dict, threshold: float) -> bool:
+    """Print the comparison of ``current`` against a saved run; False if anything regressed."""
+    baseline = load(baseline_path)
+    for key in ("cpus", "python", "numpy", "pandas"):
+        if baseline["environment"].get(key) != current["environment"].get(key):
+            print(f"note: {key} differs: {baseline['environment'].get(key)} vs {current['environment'].get(key)}")
+    rows = compare(baseline["results"], current["results"], threshold)
+    report(rows, threshold)
+    regressions = [r for r in rows if r["regression"]]
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressed by more than {threshold:.0%}")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change that counts as a regression")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.baseline, load(args.current), args.threshold) else 1)
+
+
+if __name__ == "__main__":
+    main()
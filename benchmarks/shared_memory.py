@@ -0,0 +1,106 @@
+"""RSS and PSS per worker with per-process frames vs the shared frame store.
+
+Each worker is a spawned process with its own DataLoader. Like a uvicorn
+worker serving its first requests, it loads every ticker once and reads every
+column. All workers stay alive until each has measured itself, so PSS splits
+the shared pages between them::
+
+    python -m benchmarks.shared_memory --tickers 10 --rows 100000 --workers 1 4 16
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from stock_analysis.columnar import write_columnar
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.shared_store import SharedFrameStore
+from .datasets import synthetic_ohlcv
+
+
+def memory_mb() -> dict:
+    """This process's RSS and PSS (None where /proc has no smaps_rollup)."""
+    out = {"rss": None, "pss": None}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key = line.split(":")[0].lower()
+                if key in out:
+                    out[key] = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        out["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return out
+
+
+def worker(data_dir: str, shared_dir: str, tickers: list, loaded, done, results):
+    shared = SharedFrameStore(shared_dir) if shared_dir else None
+    loader = DataLoader(os.path.join(data_dir, "public"), os.path.join(data_dir, "users"), cache_bytes=1 << 40,
+                        shared=shared)
+    before = memory_mb()
+    for stock in tickers:
+        df = loader.load_data(stock)
+        for column in df.columns:
+            np.asarray(df[column]).view(np.uint8).sum()
+    loaded.wait()
+    after = memory_mb()
+    results.put({"rss": after["rss"], "pss": after["pss"], "rss_data": after["rss"] - before["rss"]})
+    done.wait()
+
+
+def run(tickers: int, rows: int, worker_counts: list):
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    workdir = tempfile.mkdtemp(prefix="shared-bench-", dir=base)
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        public = os.path.join(workdir, "public")
+        os.makedirs(public)
+        names = [f"T{i:03d}" for i in range(tickers)]
+        for i, name in enumerate(names):
+            write_columnar(synthetic_ohlcv(rows, seed=i), os.path.join(public, f"{name}.cols"))
+        for mode in ("private", "shared"):
+            for n in worker_counts:
+                shared_dir = os.path.join(workdir, f"frames-{n}") if mode == "shared" else None
+                loaded, done, queue = ctx.Barrier(n), ctx.Barrier(n + 1), ctx.Queue()
+                procs = [ctx.Process(target=worker, args=(workdir, shared_dir, names, loaded, done, queue))
+                         for _ in range(n)]
+                for p in procs:
+                    p.start()
+                reports = [queue.get() for _ in range(n)]
+                done.wait()
+                for p in procs:
+                    p.join()
+                pss = [r["pss"] for r in reports]
+                results.append({
+                    "mode": mode,
+                    "workers": n,
+                    "rss_mb": float(np.mean([r["rss"] for r in reports])),
+                    "rss_data_mb": float(np.mean([r["rss_data"] for r in reports])),
+                    "pss_mb": float(np.mean(pss)) if None not in pss else None,
+                    "total_pss_mb": float(np.sum(pss)) if None not in pss else None,
+                })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    frame_mb = args.tickers * args.rows * 48 / 2 ** 20
+    print(f"{args.tickers} tickers x {args.rows} rows = {frame_mb:.1f} MB of columns")
+    print(f"{'mode':<8} {'workers':>7} {'RSS MB':>8} {'data RSS MB':>11} {'PSS MB':>8} {'total PSS MB':>12}")
+    for r in run(args.tickers, args.rows, args.workers):
+        pss = f"{r['pss_mb']:>8.1f} {r['total_pss_mb']:>12.1f}" if r["pss_mb"] is not None else f"{'-':>8} {'-':>12}"
+        print(f"{r['mode']:<8} {r['workers']:>7} {r['rss_mb']:>8.1f} {r['rss_data_mb']:>11.1f} {pss}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""The whole benchmark suite in one run, saved as JSON and checked against a baseline.
+
+Runs benchmarks.micro and benchmarks.api_load with the parameters of a size
+preset (any of them can be overridden) and writes every result to one file.
+With ``--baseline`` the run is compared with an earlier one and the exit
+status is 1 if anything regressed, so it can gate a CI job. Only compare
+runs from the same machine; on shared or throttled ones whole runs can
+drift by 20% or more, so raise ``--threshold`` there::
+
+    python -m benchmarks.suite --size small --out baseline.json
+    python -m benchmarks.suite --size small --out current.json --baseline baseline.json
+"""
+import argparse
+import sys
+
+from . import api_load, micro
+from .results import check, load, save
+
+# small: a few minutes on a laptop; large: up to 10M-row tickers and 1000-ticker directories
+SIZES = {
+    "small": {"rows": [1_000, 100_000], "tickers": [1, 100], "ticker_rows": 2_520, "repeat": 5,
+              "load_tickers": [1, 100], "load_rows": [2_520], "clients": 8, "requests": 100, "upload_rows": 10_000},
+    "medium": {"rows": [1_000, 100_000, 1_000_000], "tickers": [1, 100, 1000], "ticker_rows": 2_520, "repeat": 5,
+               "load_tickers": [1, 100], "load_rows": [10_000, 100_000], "clients": 16, "requests": 400,
+               "upload_rows": 100_000},
+    "large": {"rows": [1_000, 100_000, 1_000_000, 10_000_000], "tickers": [1, 100, 1000], "ticker_rows": 10_000,
+              "repeat": 3, "load_tickers": [1, 1000], "load_rows": [10_000, 1_000_000], "clients": 32,
+              "requests": 1000, "upload_rows": 1_000_000},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--skip", nargs="+", choices=["micro", "load"], default=[])
+    parser.add_argument("--out", required=True, help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with this earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change that counts as a regression")
+    overrides = parser.add_argument_group("overrides of the size preset")
+    for name, value in SIZES["small"].items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(value, list):
+            overrides.add_argument(flag, type=int, nargs="+")
+        else:
+            overrides.add_argument(flag, type=int)
+    overrides.add_argument("--scenarios", nargs="+", choices=api_load.SCENARIOS, default=api_load.SCENARIOS)
+    args = parser.parse_args()
+    params = {name: getattr(args, name) if getattr(args, name) is not None else value
+              for name, value in SIZES[args.size].items()}
+    params.update(size=args.size, scenarios=args.scenarios)
+
+    results = {}
+    if "micro" not in args.skip:
+        results.update(micro.run(params["rows"], params["tickers"], params["ticker_rows"], params["repeat"]))
+    if "load" not in args.skip:
+        results.update(api_load.run(params["scenarios"], params["load_tickers"], params["load_rows"],
+                                    params["clients"], params["requests"], params["upload_rows"]))
+    save(args.out, "suite", params, results)
+    if "micro" not in args.skip:
+        micro.print_results({k: v for k, v in results.items() if not k.startswith("http/")})
+    if "load" not in args.skip:
+        api_load.print_results({k: v for k, v in results.items() if k.startswith("http/")})
+    if args.baseline:
+        print()
+        sys.exit(0 if check(args.baseline, load(args.out), args.threshold) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Peak memory and time of storing an uploaded CSV, streamed vs read whole.
+
+Each mode runs in a fresh spawned process so its peak RSS is its own::
+
+    python -m benchmarks.upload --rows 5000000
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from stock_analysis.columnar import write_columnar
+from stock_analysis.data_loader import DataLoader
+from .datasets import synthetic_ohlcv
+from .shared_memory import memory_mb
+
+
+def peak_mb() -> float:
+    """This process's peak RSS; ru_maxrss would include the parent's peak, as it survives exec."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ingest(mode: str, workdir: str, csv_path: str, results):
+    loader = DataLoader(os.path.join(workdir, "public"), os.path.join(workdir, "users"))
+    base = memory_mb()["rss"]
+    start = time.perf_counter()
+    if mode == "streamed":
+        with open(csv_path, "rb") as f:
+            loader.save_user_file("bench", "UPLOAD.csv", f)
+    else:
+        # What the upload handler did before: whole body in memory, then one parse
+        with open(csv_path, "rb") as f:
+            content = f.read()
+        df = loader._prepare(pd.read_csv(io.BytesIO(content)))
+        write_columnar(df, os.path.join(workdir, "whole.cols"))
+    seconds = time.perf_counter() - start
+    peak = peak_mb()
+    results.put({"mode": mode, "seconds": seconds, "peak_mb": peak, "growth_mb": peak - base})
+
+
+def run(rows: int):
+    workdir = tempfile.mkdtemp(prefix="upload-bench-")
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        csv_path = os.path.join(workdir, "upload.csv")
+        synthetic_ohlcv(rows, freq="min").to_csv(csv_path, index=False)
+        size_mb = os.path.getsize(csv_path) / 2 ** 20
+        results = []
+        for mode in ("whole", "streamed"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=ingest, args=(mode, workdir, csv_path, queue))
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return size_mb, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+    size_mb, results = run(args.rows)
+    print(f"{args.rows} rows, {size_mb:.1f} MB of CSV")
+    print(f"{'mode':<9} {'seconds':>8} {'peak RSS MB':>12} {'growth MB':>10}")
+    for r in results:
+        print(f"{r['mode']:<9} {r['seconds']:>8.2f} {r['peak_mb']:>12.1f} {r['growth_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,51 @@
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Depends, status
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Depends, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from stock_analysis.data_loader import DataLoader
-from stock_analysis.indicators import TechnicalIndicators
-from stock_analysis.models import User, UserCreate, Token, UserInDB, ForgotPasswordRequest, ResetPasswordRequest
-from stock_analysis.auth import UserManager, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
+from stock_analysis.engine import IndicatorEngine
+from stock_analysis.analysis import analyze, filter_dates, records_json
+from stock_analysis.resample import parse_interval
+from stock_analysis.backtest import STRATEGIES, run_for_ticker
+from stock_analysis.batch import BatchAnalyzer
+from stock_analysis.shared_store import SharedFrameStore, default_directory, fcntl
+from stock_analysis.precompute import PrecomputedStore, Precomputer
+from stock_analysis.live import LiveFeed, Subscriber
+from stock_analysis.http_cache import ResponseCache, etag_matches, make_etag
+from stock_analysis.panel import PanelStore, as_of, beta, correlation, nan_to_none, screen, trailing
+from stock_analysis.sweep import MAX_COMBINATIONS, PARAMETERS, build_grids, run_sweep, to_json_columns
+from stock_analysis.metrics import REGISTRY, RequestTimings, profiled, profiling, stage
+from stock_analysis.serialize import iter_csv, iter_ndjson, iter_arrow, ARROW_MEDIA_TYPE, pa
+from stock_analysis.models import User, UserCreate, Token, UserInDB, ForgotPasswordRequest, ResetPasswordRequest, BatchAnalyzeRequest, AppendBarsRequest, SweepRequest, BacktestRequest, BatchBacktestRequest, ScreenerRequest, IndicatorParams
+from stock_analysis.auth import UserManager, run_in_hash_pool, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
 from jose import JWTError, jwt
+from pydantic import ValidationError
+from contextlib import asynccontextmanager
 from datetime import timedelta
 import pandas as pd
 import numpy as np
+import asyncio
 import json
 import os
 import io
+import time
 import requests
 from stock_analysis.email_utils import send_reset_email
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precomputer.start()
+    live_feed.start()
+    yield
+    await live_feed.stop()
+    precomputer.stop()
+    batch_analyzer.shutdown()
+    if shared_store is not None:
+        shared_store.release_all()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +55,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    """Per-stage timings as a Server-Timing header; ?profile=1 returns a cProfile breakdown instead."""
+    timings, token = RequestTimings.start(profile=request.query_params.get("profile") == "1")
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        RequestTimings.finish(token)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    REGISTRY.observe("http_request_duration_seconds", elapsed, endpoint=getattr(route, "path", "unmatched"),
+                     method=request.method, status=str(response.status_code))
+    if timings.profile and timings.profile_stats is not None:
+        return JSONResponse({
+            "status_code": response.status_code,
+            "total_ms": elapsed * 1e3,
+            "stages": [{"stage": name, "ms": seconds * 1e3, "bytes": nbytes}
+                       for name, seconds, nbytes in timings.stages],
+            "profile": timings.profile_report(),
+        })
+    server_timing = timings.server_timing()
+    response.headers["Server-Timing"] = (server_timing + ", " if server_timing else "") + f"total;dur={elapsed * 1e3:.3f}"
+    return response
+
 # Authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 user_manager = UserManager()
@@ -49,7 +102,60 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise credentials_exception
     return user
 
-data_loader = DataLoader(public_data_dir="./data/public", users_data_dir="./data/users")
+# Frames shared by every uvicorn and batch worker through memory-mapped files.
+# Off unless SHARED_CACHE_DIR names a directory (tmpfs keeps them in memory)
+# or is "auto", for one under /dev/shm belonging to ./data. The store holds up
+# to SHARED_CACHE_BYTES and is left in place when the processes exit.
+shared_dir = os.getenv("SHARED_CACHE_DIR", "") if fcntl is not None else ""
+if shared_dir == "auto":
+    shared_dir = default_directory("./data")
+shared_bytes = int(os.getenv("SHARED_CACHE_BYTES", 1024 * 1024 * 1024))
+shared_store = SharedFrameStore(shared_dir, shared_bytes) if shared_dir else None
+data_loader = DataLoader(
+    public_data_dir="./data/public",
+    users_data_dir="./data/users",
+    cache_bytes=int(os.getenv("FRAME_CACHE_BYTES", 256 * 1024 * 1024)),
+    shared=shared_store,
+)
+indicator_engine = IndicatorEngine(max_bytes=int(os.getenv("INDICATOR_CACHE_BYTES", 128 * 1024 * 1024)))
+batch_analyzer = BatchAnalyzer(
+    public_data_dir="./data/public",
+    users_data_dir="./data/users",
+    workers=int(os.getenv("BATCH_WORKERS", 0)) or None,
+    shared_dir=shared_dir or None,
+    shared_bytes=shared_bytes,
+)
+panel_store = PanelStore(data_loader)
+# Compressed bodies of recent responses, keyed by ETag
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_BYTES", 64 * 1024 * 1024)))
+# Responses are per user and their data can change at any moment: browsers may
+# keep them but must revalidate, which costs a 304 when nothing changed
+CACHE_CONTROL = "private, no-cache"
+
+def indicator_specs(ma_window, rsi_window, ema_span, bb_window, bb_std, atr_window,
+                    sma_window, std_window, macd_fast, macd_slow, macd_signal):
+    """Indicator requests in the order their columns appear in responses."""
+    return [
+        ("ma", {"window": ma_window}),
+        ("rsi", {"window": rsi_window}),
+        ("ema", {"span": ema_span}),
+        ("bollinger", {"window": bb_window, "num_std": bb_std}),
+        ("macd", {"fast": macd_fast, "slow": macd_slow, "signal": macd_signal}),
+        ("atr", {"window": atr_window}),
+        ("sma", {"window": sma_window}),
+        ("std", {"window": std_window}),
+    ]
+
+def split_list(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+# Default-parameter frames of public tickers, kept current in the background
+precomputed_store = PrecomputedStore("./data/public")
+precomputer = Precomputer(data_loader, precomputed_store, indicator_specs(**IndicatorParams().model_dump()),
+                          interval=float(os.getenv("PRECOMPUTE_INTERVAL", 5.0)))
+
+# New bars pushed to WebSocket subscribers; files are checked every LIVE_POLL_INTERVAL seconds
+live_feed = LiveFeed(data_loader, indicator_engine, interval=float(os.getenv("LIVE_POLL_INTERVAL", 1.0)))
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -58,7 +164,7 @@ async def register(user: UserCreate):
     try:
         if user_manager.get_user(user.username):
             raise HTTPException(status_code=400, detail="Username already registered")
-        created_user = user_manager.create_user(user)
+        created_user = await run_in_hash_pool(user_manager.create_user, user)
         return User(username=created_user.username, email=created_user.email, disabled=created_user.disabled)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -96,7 +202,7 @@ async def reset_password(request: ResetPasswordRequest):
         raise HTTPException(status_code=400, detail="Invalid or expired reset code")
     
     try:
-        user_manager.reset_password(request.email, request.new_password)
+        await run_in_hash_pool(user_manager.reset_password, request.email, request.new_password)
         return {"message": "Password reset successfully"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -104,7 +210,7 @@ async def reset_password(request: ResetPasswordRequest):
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     user = user_manager.get_user(form_data.username)
-    if not user or not user_manager.verify_password(form_data.password, user.hashed_password):
+    if not user or not await run_in_hash_pool(user_manager.verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -121,14 +227,66 @@ async def read_root():
     """Serve the main dashboard page."""
     return FileResponse("static/index.html")
 
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding, Authorization"}
+
+def not_modified(request: Request, etag: str):
+    """A 304 if the client already has the response tagged ``etag``, else None."""
+    # A profiled request must do the work it is asked to measure
+    if not profiling() and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+def cached_response(request: Request, etag: str, media_type: str, produce, headers: dict = None) -> Response:
+    """The response tagged ``etag`` from the response cache, or ``produce()`` stored into it on the way out.
+
+    ``produce`` returns the whole body (str or bytes) or an iterable of chunks to stream.
+    A profiled request bypasses the cache and builds the whole body inside the
+    endpoint, where the profiler can see it.
+    """
+    headers = {**cache_headers(etag), **(headers or {})}
+    if profiling():
+        chunks = produce()
+        if not isinstance(chunks, (str, bytes)):
+            chunks = b"".join(c.encode("utf-8") if isinstance(c, str) else c for c in chunks)
+        return Response(chunks, media_type=media_type, headers=headers)
+    compressed = accepts_gzip(request)
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    body = response_cache.get(etag)
+    if body is not None:
+        return Response(body if compressed else response_cache.decompress(body), media_type=media_type,
+                        headers=headers)
+    chunks = produce()
+    if not isinstance(chunks, (str, bytes)):
+        return StreamingResponse(response_cache.tee(etag, chunks, compressed), media_type=media_type,
+                                 headers=headers)
+    with stage("compress") as s:
+        body = b"".join(response_cache.tee(etag, [chunks], compressed))
+        s.nbytes = len(body)
+    return Response(body, media_type=media_type, headers=headers)
+
+def normalize_date(value: str):
+    """The same instant for equivalent spellings of a date, for cache keys; 400 if it isn't a date."""
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value).isoformat()
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
 @app.get("/api/stocks")
-def get_stocks(current_user: User = Depends(get_current_user)):
+@profiled
+def get_stocks(request: Request, current_user: User = Depends(get_current_user)):
     """Return available stock options for the current user."""
     stocks = data_loader.get_available_tickers(current_user.username)
-    return {"stocks": stocks}
+    etag = make_etag("stocks", current_user.username, stocks)
+    return not_modified(request, etag) or JSONResponse({"stocks": stocks}, headers=cache_headers(etag))
 
 @app.get("/api/analyze")
+@profiled
 def analyze_stock(
+    request: Request,
     stock: str = Query(..., description="Stock name"),
     ma_window: int = Query(30, ge=1, le=200),
     rsi_window: int = Query(14, ge=1, le=100),
@@ -143,52 +301,267 @@ def analyze_stock(
     macd_signal: int = Query(9, ge=1, le=100),
     start_date: str = Query(None),
     end_date: str = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson|arrow)$"),
+    indicators: str = Query(None, description="Comma-separated indicator families to compute, e.g. ma,rsi"),
+    columns: str = Query(None, description="Comma-separated columns to return; the date is always included"),
+    max_points: int = Query(None, ge=3, description="Downsample to at most this many rows"),
+    interval: str = Query(None, pattern="^[1-9][0-9]*(m|h|D|W|M)$",
+                          description="Resample bars first, e.g. 5m, 1h, 1D, 1W, 1M"),
     current_user: User = Depends(get_current_user)
 ):
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=501, detail="Arrow output requires pyarrow")
+    specs = indicator_specs(ma_window, rsi_window, ema_span, bb_window, bb_std, atr_window,
+                            sma_window, std_window, macd_fast, macd_slow, macd_signal)
+    if indicators is not None:
+        selected = split_list(indicators)
+        unknown = [name for name in selected if name not in dict(specs)]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown indicator(s): {', '.join(unknown)}")
+        specs = [spec for spec in specs if spec[0] in selected]
+    selected_columns = split_list(columns) if columns is not None else None
     try:
-        df = data_loader.load_data(stock, current_user.username)
-    except Exception as e:
+        version = data_loader.resolve(stock, current_user.username)
+    except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    etag = make_etag("analyze", current_user.username, version, stock, specs, normalize_date(start_date),
+                     normalize_date(end_date), selected_columns, max_points,
+                     parse_interval(interval) if interval else None, format)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
 
-    date_col = next((c for c in df.columns if c.lower() == 'date'), None)
-
-    if date_col:
-        df[date_col] = pd.to_datetime(df[date_col])
-        if start_date:
-            df = df[df[date_col] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df[date_col] <= pd.to_datetime(end_date)]
-        df.sort_values(date_col, inplace=True)
-        df['Date'] = df[date_col].dt.strftime('%Y-%m-%d')
-
-    df = TechnicalIndicators.add_ma(df, window=ma_window)
-    df = TechnicalIndicators.add_rsi(df, window=rsi_window)
-    df = TechnicalIndicators.add_ema(df, span=ema_span)
-    df = TechnicalIndicators.add_bollinger_bands(df, window=bb_window, num_std=bb_std)
-    df = TechnicalIndicators.add_macd(df, fast=macd_fast, slow=macd_slow, signal=macd_signal)
-    df = TechnicalIndicators.add_atr(df, window=atr_window)
-    df = TechnicalIndicators.add_sma(df, window=sma_window)
-    df = TechnicalIndicators.add_std(df, window=std_window)
-
-    df = df.replace([np.inf, -np.inf], np.nan).fillna(value=np.nan)
-    data_records = json.loads(df.to_json(orient='records'))
-    
-    return {"stock": stock, "data": data_records}
+    def compute():
+        try:
+            return analyze(data_loader, indicator_engine, stock, current_user.username, specs, start_date, end_date,
+                           columns=selected_columns, max_points=max_points,
+                           precomputed=precomputed_store, interval=interval)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    if format == "ndjson":
+        return cached_response(request, etag, "application/x-ndjson", lambda: iter_ndjson(compute()))
+    if format == "arrow":
+        return cached_response(request, etag, ARROW_MEDIA_TYPE, lambda: iter_arrow(compute()))
+
+    def serialize():
+        df = compute()
+        # Already-serialized body: no dict round trip through json.loads and back
+        with stage("serialize") as s:
+            body = records_json(stock, df)
+            s.nbytes = len(body)
+        return body
+
+    return cached_response(request, etag, "application/json", serialize)
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest, current_user: User = Depends(get_current_user)):
+    """Analyze many tickers with one parameter set, streaming one JSON line per ticker as it finishes."""
+    stocks = request.tickers
+    if stocks is None:
+        stocks = data_loader.get_available_tickers(current_user.username)
+    specs = indicator_specs(**request.params.model_dump())
+    return StreamingResponse(
+        batch_analyzer.stream(list(dict.fromkeys(stocks)), current_user.username, specs,
+                              request.start_date, request.end_date),
+        media_type="application/x-ndjson",
+    )
+
+@app.post("/api/sweep")
+@profiled
+def sweep(request: SweepRequest, current_user: User = Depends(get_current_user)):
+    """Summary statistics for every combination of the swept indicator parameters."""
+    normalize_date(request.start_date)
+    normalize_date(request.end_date)
+    try:
+        df, _ = data_loader.load_versioned(request.stock, current_user.username)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    df = filter_dates(df, request.start_date, request.end_date)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    close = close[~np.isnan(close)]
+    try:
+        grids = build_grids({name: getattr(request, name).expand(MAX_COMBINATIONS)
+                             for name in PARAMETERS if getattr(request, name) is not None})
+        with stage("sweep"):
+            results = run_sweep(close, grids, request.rsi_lower, request.rsi_upper)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "stock": request.stock,
+        "rows": int(len(close)),
+        "buy_hold_return": float(close[-1] / close[0] - 1),
+        "results": {family: to_json_columns(result) for family, result in results.items()},
+    }
+
+@app.post("/api/backtest")
+@profiled
+def run_backtest(request: BacktestRequest, current_user: User = Depends(get_current_user)):
+    """Backtest one indicator rule on one ticker, with fees, slippage and the equity curve."""
+    if request.strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown strategy {request.strategy}")
+    try:
+        data_loader.resolve(request.stock, current_user.username)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        with stage("backtest"):
+            return run_for_ticker(data_loader, indicator_engine, request.stock, current_user.username,
+                                  request.strategy, request.params, request.fee_bps, request.slippage_bps,
+                                  request.start_date, request.end_date, request.include_equity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/backtest/batch")
+async def run_backtest_batch(request: BatchBacktestRequest, current_user: User = Depends(get_current_user)):
+    """Backtest one rule across many tickers in parallel, streaming one JSON line per ticker."""
+    if request.strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown strategy {request.strategy}")
+    stocks = request.tickers
+    if stocks is None:
+        stocks = data_loader.get_available_tickers(current_user.username)
+    return StreamingResponse(
+        batch_analyzer.stream_backtests(list(dict.fromkeys(stocks)), current_user.username, request.strategy,
+                                        request.params, request.fee_bps, request.slippage_bps,
+                                        request.start_date, request.end_date),
+        media_type="application/x-ndjson",
+    )
+
+def panel_window(panel, window: int, end_date: str):
+    normalize_date(end_date)
+    try:
+        return trailing(panel, window, end_date)
+    except ValueError as e:
+        # Nothing on or before end_date: the query, not a ticker, is at fault
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/panel/correlation")
+@profiled
+def panel_correlation(
+    window: int = Query(60, ge=2, le=5000, description="Trailing number of dates"),
+    tickers: str = Query(None, description="Comma-separated tickers; all available when omitted"),
+    end_date: str = Query(None),
+    min_periods: int = Query(None, ge=2, description="Fewest shared returns for a pair; half the window by default"),
+    current_user: User = Depends(get_current_user)
+):
+    """Correlation matrix of daily returns across tickers over a trailing window."""
+    panel = panel_store.get(current_user.username)
+    try:
+        columns = panel.columns(split_list(tickers) if tickers is not None else None)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    returns, row = panel_window(panel, window, end_date)
+    with stage("correlation"):
+        matrix = correlation(returns[:, columns], min_periods or max(window // 2, 2))
+    return {
+        "tickers": [panel.tickers[j] for j in columns],
+        "as_of": as_of(panel, row),
+        "window": window,
+        "matrix": nan_to_none(matrix),
+    }
+
+@app.get("/api/panel/beta")
+@profiled
+def panel_beta(
+    benchmark: str = Query(..., description="Ticker to regress against"),
+    window: int = Query(60, ge=2, le=5000, description="Trailing number of dates"),
+    tickers: str = Query(None, description="Comma-separated tickers; all available when omitted"),
+    end_date: str = Query(None),
+    min_periods: int = Query(None, ge=2, description="Fewest shared returns; half the window by default"),
+    current_user: User = Depends(get_current_user)
+):
+    """Beta and correlation of each ticker's daily returns against a benchmark ticker."""
+    panel = panel_store.get(current_user.username)
+    try:
+        columns = panel.columns(split_list(tickers) if tickers is not None else None)
+        bench = panel.columns([benchmark])[0]
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    returns, row = panel_window(panel, window, end_date)
+    with stage("beta"):
+        result = beta(returns[:, columns], returns[:, bench], min_periods or max(window // 2, 2))
+    return {
+        "benchmark": benchmark,
+        "as_of": as_of(panel, row),
+        "window": window,
+        "tickers": [panel.tickers[j] for j in columns],
+        "beta": nan_to_none(result["beta"]),
+        "correlation": nan_to_none(result["correlation"]),
+        "observations": result["observations"].tolist(),
+    }
+
+@app.post("/api/screener")
+@profiled
+def screener(request: ScreenerRequest, current_user: User = Depends(get_current_user)):
+    """Tickers whose latest indicator values pass every filter, e.g. RSI_14 < 30 and Close > Upper_BB_20."""
+    panel = panel_store.get(current_user.username)
+    try:
+        with stage("screen"):
+            matches = screen(panel, [f.model_dump() for f in request.filters], request.tickers, request.columns,
+                             request.bb_std, (request.macd_fast, request.macd_slow, request.macd_signal))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "evaluated": len(request.tickers) if request.tickers is not None else len(panel.tickers),
+        "skipped": panel.skipped,
+        "matches": matches,
+    }
 
 @app.post("/api/upload-csv")
 async def upload_csv(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
+    """Store an OHLCV CSV as one of the user's tickers; a file that fails validation is a 400."""
     try:
-        content = await file.read()
-        saved_name = data_loader.save_user_file(current_user.username, file.filename, content)
+        # Starlette has already spooled the body to a temporary file; parse it off the event loop
+        await file.seek(0)
+        saved_name = await run_in_threadpool(data_loader.save_user_file, current_user.username, file.filename,
+                                             file.file)
+        live_feed.notify()
         return {"message": "Success", "ticker": saved_name}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").lower().split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip() == "gzip":
+            # "gzip;q=0" is an explicit refusal
+            q = params.replace(" ", "")
+            return not (q.startswith("q=") and q[2:].strip("0.") == "")
+    return False
+
+@app.post("/api/stocks/{stock}/bars")
+@profiled
+def append_bars(stock: str, request: AppendBarsRequest, current_user: User = Depends(get_current_user)):
+    """Append bars to a ticker; bars whose date already exists replace that row.
+
+    Bars are checked like an upload (all OHLCV columns, numbers, strictly
+    increasing dates after the last stored one); a bad one is a 400 and
+    nothing is written.
+    """
+    try:
+        data_loader.resolve(stock, current_user.username)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        result = data_loader.append_bars(stock, pd.DataFrame(request.bars), current_user.username)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    live_feed.notify()
+    return {"ticker": stock, **result}
+
 @app.get("/api/export-csv")
+@profiled
 def export_csv(
+    request: Request,
     stock: str = Query(...),
     ma_window: int = Query(30), rsi_window: int = Query(14),
     ema_span: int = Query(14), bb_window: int = Query(20),
@@ -200,35 +573,112 @@ def export_csv(
     current_user: User = Depends(get_current_user)
 ):
     try:
-        df = data_loader.load_data(stock, current_user.username)
-        date_col = next((c for c in df.columns if c.lower() == 'date'), None)
-        if date_col and (start_date or end_date):
-            df[date_col] = pd.to_datetime(df[date_col])
-            if start_date: df = df[df[date_col] >= pd.to_datetime(start_date)]
-            if end_date: df = df[df[date_col] <= pd.to_datetime(end_date)]
-
-        df = TechnicalIndicators.add_ma(df, window=ma_window)
-        df = TechnicalIndicators.add_rsi(df, window=rsi_window)
-        df = TechnicalIndicators.add_ema(df, span=ema_span)
-        df = TechnicalIndicators.add_bollinger_bands(df, window=bb_window, num_std=bb_std)
-        df = TechnicalIndicators.add_macd(df, fast=macd_fast, slow=macd_slow, signal=macd_signal)
-        df = TechnicalIndicators.add_atr(df, window=atr_window)
-        df = TechnicalIndicators.add_sma(df, window=sma_window)
-        df = TechnicalIndicators.add_std(df, window=std_window)
-        
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-        
+        version = data_loader.resolve(stock, current_user.username)
+        specs = indicator_specs(ma_window, rsi_window, ema_span, bb_window, bb_std, atr_window,
+                                sma_window, std_window, macd_fast, macd_slow, macd_signal)
+        etag = make_etag("export-csv", current_user.username, version, stock, specs, normalize_date(start_date),
+                         normalize_date(end_date))
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        def produce():
+            df, loaded = data_loader.load_versioned(stock, current_user.username)
+            # Full history first (shared with /api/analyze), so a range starts warmed up
+            df = indicator_engine.apply(df, specs, version=(loaded, None, None))
+            return iter_csv(filter_dates(df, start_date, end_date))
+
         filename = f"{stock}_processed.csv"
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return cached_response(request, etag, "text/csv", produce,
+                               headers={"Content-Disposition": f"attachment; filename={filename}"})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def live_subscription(message: dict):
+    """``(stock, specs)`` for a subscribe message; ValueError if it's malformed."""
+    stock = message.get("stock")
+    if not isinstance(stock, str) or not stock:
+        raise ValueError("subscribe needs a stock")
+    params = message.get("params") or {}
+    if not isinstance(params, dict):
+        raise ValueError("params must be an object")
+    try:
+        params = IndicatorParams(**params)
+    except ValidationError as e:
+        raise ValueError(str(e))
+    specs = indicator_specs(**params.model_dump())
+    selected = message.get("indicators")
+    if isinstance(selected, str):
+        selected = split_list(selected)
+    if selected is not None:
+        if not isinstance(selected, list) or not all(isinstance(name, str) for name in selected):
+            raise ValueError("indicators must be a list of names")
+        unknown = [name for name in selected if name not in dict(specs)]
+        if unknown:
+            raise ValueError(f"Unknown indicator(s): {', '.join(map(str, unknown))}")
+        specs = [spec for spec in specs if spec[0] in selected]
+    return stock, specs
+
+@app.websocket("/ws/live")
+async def live_updates(websocket: WebSocket, token: str = Query(None)):
+    """Push new bars, with indicator values, for the tickers a client subscribes to.
+
+    Authenticate with ``?token=<access token>``, then send
+    ``{"action": "subscribe", "stock": ..., "params": {...}, "indicators": [...]}``
+    (params and indicators as for /api/analyze) and
+    ``{"action": "unsubscribe", "id": ...}``. The server sends ``subscribed``
+    (with the subscription ``id`` and the last date covered), ``bars`` (new
+    rows shaped like /api/analyze rows), ``reset`` (reload the history; with
+    a null id, for every subscription) and ``error`` messages.
+    """
+    try:
+        user = await get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = Subscriber(user.username)
+
+    async def write():
+        while True:
+            await websocket.send_text(await subscriber.queue.get())
+
+    writer = asyncio.create_task(write())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                action = message.get("action") if isinstance(message, dict) else None
+                if action == "subscribe":
+                    stock, specs = live_subscription(message)
+                    sub_id, channel = await live_feed.subscribe(subscriber, stock, specs)
+                    subscriber.send(json.dumps({
+                        "type": "subscribed", "id": sub_id, "stock": stock,
+                        "columns": ["Date"] + [c for c in channel.base if c.lower() != "date"]
+                                   + list(indicator_engine.plan(specs)),
+                        "last_date": channel.last_date(),
+                    }))
+                elif action == "unsubscribe":
+                    if not isinstance(message.get("id"), int):
+                        raise ValueError("unsubscribe needs an id")
+                    live_feed.unsubscribe(subscriber, message["id"])
+                else:
+                    raise ValueError(f"Unknown action {action!r}")
+            except ValueError as e:
+                subscriber.send(json.dumps({"type": "error", "detail": str(e)}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writer.cancel()
+        live_feed.unsubscribe(subscriber)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text-format latency histograms per endpoint, stage and indicator."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -6,6 +6,9 @@ let stockData = null;
 let currentPage = 1;
 let currentChartType = 'candle';
 let AUTH_TOKEN = localStorage.getItem('token');
+let liveSocket = null;
+let liveSubscription = null;
+let liveKey = null;
 
 const API_BASE_URL = window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1'
     ? ''
@@ -67,6 +70,7 @@ async function authFetch(url, options = {}) {
 function logout() {
     localStorage.removeItem('token');
     AUTH_TOKEN = null;
+    if (liveSocket) liveSocket.close();
     showAuth(true);
 }
 
@@ -447,9 +451,56 @@ async function fetchData() {
         stockData = await res.json();
         renderChart();
         renderMiniChart();
+        subscribeLive(stock, end);
     } catch (e) { console.error("Fetch Error:", e); }
 }
 
+// New bars arrive over a WebSocket instead of re-downloading the history
+function subscribeLive(stock, end) {
+    if (!AUTH_TOKEN || !('WebSocket' in window)) return;
+    const key = end ? null : JSON.stringify({ stock, ...parameterValues });
+    if (key === liveKey && liveSocket) return;
+    liveKey = key;
+    const send = () => {
+        if (liveSubscription) {
+            liveSocket.send(JSON.stringify({ action: 'unsubscribe', id: liveSubscription.id }));
+            liveSubscription = null;
+        }
+        // A range with an end date gets no new bars
+        if (liveKey) liveSocket.send(JSON.stringify({ action: 'subscribe', stock, params: { ...parameterValues } }));
+    };
+    if (liveSocket && liveSocket.readyState === WebSocket.OPEN) return send();
+    if (liveSocket) { liveSocket.onopen = send; return; }
+    if (!liveKey) return;
+    const base = API_BASE_URL || window.location.origin;
+    liveSocket = new WebSocket(`${base.replace(/^http/, 'ws')}/ws/live?token=${encodeURIComponent(AUTH_TOKEN)}`);
+    liveSocket.onopen = send;
+    liveSocket.onmessage = (event) => handleLiveMessage(JSON.parse(event.data));
+    liveSocket.onclose = () => { liveSocket = null; liveSubscription = null; liveKey = null; };
+}
+
+function handleLiveMessage(msg) {
+    if (msg.type === 'subscribed') {
+        if (liveSubscription) liveSocket.send(JSON.stringify({ action: 'unsubscribe', id: liveSubscription.id }));
+        liveSubscription = msg;
+        const rows = stockData && stockData.data;
+        // Bars added between loading the history and subscribing
+        if (rows && rows.length && rows[rows.length - 1].Date !== msg.last_date) fetchData();
+    } else if (msg.type === 'bars' && liveSubscription && msg.id === liveSubscription.id) {
+        const rows = stockData.data;
+        msg.data.forEach(row => {
+            if (rows.length && rows[rows.length - 1].Date === row.Date) rows[rows.length - 1] = row;
+            else rows.push(row);
+        });
+        renderChart();
+        renderMiniChart();
+    } else if (msg.type === 'reset' && (msg.id === null || (liveSubscription && msg.id === liveSubscription.id))) {
+        fetchData();
+    } else if (msg.type === 'error') {
+        console.warn("Live updates:", msg.detail);
+    }
+}
+
 function renderChart() {
     if (!stockData || !stockData.data) return;
     const ctx = getEl('stockChart').getContext('2d');
@@ -1,2 +1,3 @@
 from .data_loader import DataLoader
 from .indicators import TechnicalIndicators
+from .engine import IndicatorEngine
@@ -0,0 +1,111 @@
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import DataLoader
+from .downsample import downsample
+from .engine import IndicatorEngine
+from .metrics import stage
+from .precompute import PrecomputedStore
+from .resample import date_format, parse_interval
+
+
+def date_column(df: pd.DataFrame) -> Optional[str]:
+    return next((c for c in df.columns if c.lower() == 'date'), None)
+
+
+def date_bounds(df: pd.DataFrame, start_date: str = None, end_date: str = None) -> Tuple[int, int]:
+    """Rows ``[lo, hi)`` of ``df`` dated from ``start_date`` through ``end_date``.
+
+    DataLoader frames are sorted by date, so this is a binary search.
+    """
+    date_col = date_column(df)
+    if date_col is None or (not start_date and not end_date):
+        return 0, len(df)
+    values = df[date_col].to_numpy()
+    if values.dtype.kind != "M":
+        # Timezone-aware dates: no plain datetime64 array to search
+        mask = np.ones(len(df), dtype=bool)
+        if start_date:
+            mask &= (df[date_col] >= pd.to_datetime(start_date)).to_numpy()
+        if end_date:
+            mask &= (df[date_col] <= pd.to_datetime(end_date)).to_numpy()
+        rows = np.flatnonzero(mask)
+        return (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, 0)
+    lo = np.searchsorted(values, pd.Timestamp(start_date).to_datetime64().astype(values.dtype), "left") \
+        if start_date else 0
+    # NaT sorts last and matches no range
+    hi = np.searchsorted(values, pd.Timestamp(end_date).to_datetime64().astype(values.dtype), "right") \
+        if end_date else np.searchsorted(values, np.datetime64("NaT"), "left")
+    return int(lo), int(max(hi, lo))
+
+
+def filter_dates(df: pd.DataFrame, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """Rows of a date-sorted frame from ``start_date`` through ``end_date``, as a slice (no copy)."""
+    lo, hi = date_bounds(df, start_date, end_date)
+    return df if (lo, hi) == (0, len(df)) else df.iloc[lo:hi]
+
+
+def analyze(loader: DataLoader, engine: IndicatorEngine, stock: str, username: str,
+            specs: List[Tuple[str, Dict]], start_date: str = None, end_date: str = None,
+            columns: Optional[Sequence[str]] = None, max_points: int = None,
+            precomputed: Optional[PrecomputedStore] = None, interval: str = None) -> pd.DataFrame:
+    """Load ``stock`` and return the indicator frame served by /api/analyze.
+
+    Indicators are computed over the full history and then sliced to the
+    date range, so values at the start of a range are warmed up rather than
+    NaN. ``columns`` limits the returned columns (the date is always kept)
+    and skips indicators that produce none of them; ``max_points``
+    downsamples the result. An unknown column raises KeyError. ``interval``
+    (e.g. ``1W``) aggregates the bars before indicators are computed.
+    Native-interval requests are served from ``precomputed`` when it holds
+    every spec.
+    """
+    served = None
+    if precomputed is not None and interval is None:
+        with stage("precomputed"):
+            served = precomputed.frame(loader, stock, username, specs)
+    if served is not None:
+        df, version = served
+    elif interval is not None:
+        df, version = loader.load_resampled(stock, username, interval)
+    else:
+        df, version = loader.load_versioned(stock, username)
+    date_col = date_column(df)
+    if columns is not None:
+        wanted = set(columns)
+        specs = [spec for spec in specs if wanted & set(engine.plan([spec]))]
+        available = set(df.columns) | set(engine.plan(specs))
+        unknown = [c for c in columns if c not in available and c != 'Date']
+        if unknown:
+            raise KeyError(f"Unknown column(s): {', '.join(unknown)}")
+    if served is None:
+        parent = None
+        lineage = loader.parent_version(version)
+        if lineage:
+            parent_version, appended = lineage
+            parent = ((parent_version, None, None), len(df) - appended)
+        df = engine.apply(df, specs, version=(version, None, None), parent=parent)
+    with stage("filter"):
+        lo, hi = date_bounds(df, start_date, end_date)
+        fmt = date_format(parse_interval(interval)) if interval is not None else '%Y-%m-%d'
+        labels = loader.date_labels(version, df[date_col], fmt) if date_col else None
+        df = df.iloc[lo:hi]
+    if columns is not None:
+        keep = [date_col] if date_col else []
+        df = df[keep + [c for c in dict.fromkeys(columns) if c in df.columns and c != date_col]]
+    if date_col:
+        with stage("format_dates"):
+            df['Date'] = labels[lo:hi]
+    if max_points:
+        with stage("downsample"):
+            df = downsample(df, max_points)
+    with stage("cleanup"):
+        return df.replace([np.inf, -np.inf], np.nan)
+
+
+def records_json(stock: str, df: pd.DataFrame) -> str:
+    """``{"stock": ..., "data": [...]}`` serialized without an intermediate dict."""
+    return f'{{"stock": {json.dumps(stock)}, "data": {df.to_json(orient="records")}}}'
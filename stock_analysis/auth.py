@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import asyncio
+import functools
 import json
 import os
+import sqlite3
+import threading
 from .models import User, UserInDB, UserCreate
 
 # Secret key for JWT encoding/decoding
@@ -13,48 +18,103 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so hashing runs here instead of on the event loop;
+# the bound keeps a login burst from taking every core
+hash_pool = ThreadPoolExecutor(max_workers=int(os.getenv("BCRYPT_THREADS", min(4, os.cpu_count() or 1))),
+                               thread_name_prefix="bcrypt")
+
+async def run_in_hash_pool(func, *args, **kwargs):
+    """Await a blocking UserManager call (hashing, verification, writes) on the hash pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_pool, functools.partial(func, *args, **kwargs))
+
 class UserManager:
-    def __init__(self, db_file="users.json"):
+    """Users in SQLite (WAL mode) with unique username and email indexes.
+
+    A legacy ``users.json`` is imported on first use and renamed to
+    ``users.json.migrated``.
+    """
+    def __init__(self, db_file="users.db", legacy_json_file="users.json"):
         self.db_file = db_file
-        self.users_db = {}
+        self.legacy_json_file = legacy_json_file
         self.reset_codes = {} # Store {email: {"code": code, "expires": datetime}}
-        self._load_users()
-
-    def _load_users(self):
-        if os.path.exists(self.db_file):
-            try:
-                with open(self.db_file, "r") as f:
-                    data = json.load(f)
-                    self.users_db = {u["username"]: UserInDB(**u) for u in data}
-            except json.JSONDecodeError:
-                self.users_db = {}
-        else:
-            self.users_db = {}
-
-    def _save_users(self):
-        with open(self.db_file, "w") as f:
-            data = [u.dict() for u in self.users_db.values()]
-            json.dump(data, f, indent=4)
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sync endpoints and the hash pool use several
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "username TEXT PRIMARY KEY, "
+            "email TEXT UNIQUE, "
+            "hashed_password TEXT NOT NULL, "
+            "disabled INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._migrate_json()
+
+    def _migrate_json(self):
+        if not self.legacy_json_file or not os.path.exists(self.legacy_json_file):
+            return
+        try:
+            with open(self.legacy_json_file, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Another worker migrated it first, or there's nothing to import
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, email, hashed_password, disabled) VALUES (?, ?, ?, ?)",
+                [(u["username"], u.get("email"), u["hashed_password"], int(bool(u.get("disabled")))) for u in data],
+            )
+        try:
+            os.replace(self.legacy_json_file, self.legacy_json_file + ".migrated")
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _to_user(row) -> Optional[UserInDB]:
+        if row is None:
+            return None
+        return UserInDB(username=row["username"], email=row["email"],
+                        hashed_password=row["hashed_password"], disabled=bool(row["disabled"]))
 
     def get_user(self, username: str) -> Optional[UserInDB]:
-        return self.users_db.get(username)
+        row = self._connect().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return self._to_user(row)
 
     def get_user_by_email(self, email: str) -> Optional[UserInDB]:
-        for user in self.users_db.values():
-            if user.email == email:
-                return user
-        return None
+        row = self._connect().execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return self._to_user(row)
 
     def create_user(self, user: UserCreate) -> UserInDB:
-        if user.username in self.users_db:
+        if self.get_user(user.username):
             raise ValueError("User already exists")
-        for u in self.users_db.values():
-            if u.email == user.email:
-                raise ValueError("Email already registered")
+        if self.get_user_by_email(user.email):
+            raise ValueError("Email already registered")
         hashed_password = pwd_context.hash(user.password)
         db_user = UserInDB(username=user.username, email=user.email, hashed_password=hashed_password, disabled=False)
-        self.users_db[user.username] = db_user
-        self._save_users()
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT INTO users (username, email, hashed_password, disabled) VALUES (?, ?, ?, 0)",
+                             (db_user.username, db_user.email, db_user.hashed_password))
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent registration
+            if self.get_user(user.username):
+                raise ValueError("User already exists")
+            raise ValueError("Email already registered")
         return db_user
 
     def verify_password(self, plain_password, hashed_password):
@@ -86,8 +146,9 @@ class UserManager:
         user = self.get_user_by_email(email)
         if not user:
             raise ValueError("User not found")
-        user.hashed_password = self.get_password_hash(new_password)
-        self._save_users()
+        hashed_password = self.get_password_hash(new_password)
+        with self._connect() as conn:
+            conn.execute("UPDATE users SET hashed_password = ? WHERE email = ?", (hashed_password, email))
         if email in self.reset_codes:
             del self.reset_codes[email]
 
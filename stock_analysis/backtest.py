@@ -0,0 +1,190 @@
+"""Array-based backtests of indicator rules.
+
+A strategy turns indicator columns (computed through the IndicatorEngine, so
+they share its cache with /api/analyze) into a long/flat position per bar.
+The position decided at bar t's close is held over bar t + 1. Changing the
+position costs ``fee_bps + slippage_bps`` of equity, charged at the close
+where the trade happens::
+
+    equity[t] = equity[t-1] * (1 + position[t-1] * r[t]) * (1 - cost * |position[t] - position[t-1]|)
+"""
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .analysis import date_bounds
+from .data_loader import DataLoader
+from .engine import IndicatorEngine
+from .kernels import as_float_array
+
+TRADING_DAYS = 252
+
+
+def positions_from_events(enter: np.ndarray, exit_: np.ndarray) -> np.ndarray:
+    """Long from an ``enter`` row until the next ``exit_`` row (per column for 2-D input)."""
+    events = np.where(enter, 1, np.where(exit_, -1, 0)).astype(np.int8)
+    rows = np.arange(events.shape[0]).reshape((-1,) + (1,) * (events.ndim - 1))
+    last = np.maximum.accumulate(np.where(events != 0, rows, -1), axis=0)
+    latest = np.take_along_axis(events, np.maximum(last, 0), axis=0)
+    return (latest == 1) & (last >= 0)
+
+
+def _above(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return a > b
+
+
+def _ma_cross(fast: int = 20, slow: int = 50):
+    specs = [("ma", {"window": int(fast)}), ("ma", {"window": int(slow)})]
+    return specs, lambda c: _above(c[f"MA_{int(fast)}"], c[f"MA_{int(slow)}"])
+
+
+def _ema_cross(fast: int = 12, slow: int = 26):
+    specs = [("ema", {"span": int(fast)}), ("ema", {"span": int(slow)})]
+    return specs, lambda c: _above(c[f"EMA_{int(fast)}"], c[f"EMA_{int(slow)}"])
+
+
+def _rsi(window: int = 14, lower: float = 30.0, upper: float = 70.0):
+    column = f"RSI_{int(window)}"
+
+    def positions(c):
+        with np.errstate(invalid="ignore"):
+            return positions_from_events(c[column] < lower, c[column] > upper)
+    return [("rsi", {"window": int(window)})], positions
+
+
+def _bollinger(window: int = 20, num_std: float = 2.0):
+    # Breakout: enter on a close above the upper band, exit below the middle band
+    w = int(window)
+
+    def positions(c):
+        with np.errstate(invalid="ignore"):
+            return positions_from_events(c["Close"] > c[f"Upper_BB_{w}"], c["Close"] < c[f"SMA_{w}"])
+    return [("bollinger", {"window": w, "num_std": float(num_std)})], positions
+
+
+def _macd(fast: int = 12, slow: int = 26, signal: int = 9):
+    specs = [("macd", {"fast": int(fast), "slow": int(slow), "signal": int(signal)})]
+    return specs, lambda c: _above(c["MACD"], c["MACD_Signal"])
+
+
+# name -> builder returning (indicator specs, positions from computed columns)
+STRATEGIES: Dict[str, Callable[..., Tuple[List[Tuple[str, Dict]], Callable]]] = {
+    "ma_cross": _ma_cross,
+    "ema_cross": _ema_cross,
+    "rsi": _rsi,
+    "bollinger": _bollinger,
+    "macd": _macd,
+}
+
+
+def strategy_positions(df: pd.DataFrame, engine: IndicatorEngine, strategy: str, params: Dict,
+                       version: Hashable = None) -> np.ndarray:
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}")
+    try:
+        specs, rule = STRATEGIES[strategy](**params)
+    except TypeError as e:
+        raise ValueError(f"Bad parameters for {strategy}: {e}")
+    columns = engine.compute(df, specs, version)
+    columns["Close"] = df["Close"].to_numpy(dtype=np.float64)
+    return rule(columns)
+
+
+def simulate(close, positions, fee_bps: float = 0.0, slippage_bps: float = 0.0,
+             periods_per_year: float = TRADING_DAYS) -> Dict:
+    """Equity curve and statistics for long/flat ``positions`` on ``close``."""
+    close = as_float_array(close)
+    held = np.asarray(positions, dtype=np.float64)
+    n = close.shape[0]
+    returns = np.zeros(n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(close[1:], close[:-1], out=returns[1:])
+    returns[1:] -= 1.0
+    returns[~np.isfinite(returns)] = 0.0
+
+    previous = np.concatenate(([0.0], held[:-1]))
+    turnover = np.abs(held - previous)
+    cost = (fee_bps + slippage_bps) / 1e4
+    factor = (1.0 + previous * returns) * (1.0 - cost * turnover)
+    equity = np.cumprod(factor)
+
+    peak = np.maximum.accumulate(equity)
+    drawdown = equity / peak - 1.0
+    step_returns = factor - 1.0
+    std = step_returns.std(ddof=1) if n > 2 else np.nan
+    sharpe = step_returns.mean() / std * np.sqrt(periods_per_year) if std and np.isfinite(std) else None
+    years = n / periods_per_year
+
+    # Per-trade results: log growth summed over each holding span, exit costs included
+    entries = (held > 0) & (previous == 0)
+    trade_id = np.cumsum(entries)
+    in_trade = (held > 0) | (previous > 0)
+    log_factor = np.log(factor)
+    trade_log = np.bincount(trade_id[in_trade], weights=log_factor[in_trade], minlength=trade_id[-1] + 1)[1:] \
+        if n else np.array([])
+    trades = int(entries.sum())
+    return {
+        "equity": equity,
+        "total_return": float(equity[-1] - 1.0) if n else 0.0,
+        "cagr": float(equity[-1] ** (1.0 / years) - 1.0) if n and years > 0 and equity[-1] > 0 else None,
+        "volatility": float(std * np.sqrt(periods_per_year)) if std and np.isfinite(std) else None,
+        "sharpe": float(sharpe) if sharpe is not None else None,
+        "max_drawdown": float(drawdown.min()) if n else 0.0,
+        "trades": trades,
+        "win_rate": float((trade_log > 0).mean()) if trades else None,
+        "exposure": float(held.mean()) if n else 0.0,
+        "buy_hold_return": float(close[-1] / close[0] - 1.0) if n else 0.0,
+    }
+
+
+def bars_per_year(dates: pd.Series) -> float:
+    """Bars per year implied by the date column, or the trading-day default."""
+    if dates is None or len(dates) < 2:
+        return TRADING_DAYS
+    span_days = (dates.iloc[-1] - dates.iloc[0]).total_seconds() / 86400
+    if span_days <= 0:
+        return TRADING_DAYS
+    return (len(dates) - 1) / (span_days / 365.25)
+
+
+def backtest(df: pd.DataFrame, engine: IndicatorEngine, strategy: str, params: Dict = None,
+             fee_bps: float = 0.0, slippage_bps: float = 0.0, version: Hashable = None,
+             start_date: str = None, end_date: str = None) -> Dict:
+    """Run ``strategy`` over ``df`` (a DataLoader frame) and return its statistics and equity curve.
+
+    Indicators see the whole of ``df``, so a date range starts with warmed-up
+    signals; only the bars from ``start_date`` through ``end_date`` are traded.
+    """
+    positions = strategy_positions(df, engine, strategy, params or {}, version)
+    lo, hi = date_bounds(df, start_date, end_date)
+    if (lo, hi) != (0, len(df)):
+        df, positions = df.iloc[lo:hi], positions[lo:hi]
+    date_col = next((c for c in df.columns if c.lower() == 'date'), None)
+    dates = df[date_col] if date_col else None
+    result = simulate(df["Close"].to_numpy(dtype=np.float64), positions, fee_bps, slippage_bps,
+                      bars_per_year(dates))
+    result["positions"] = positions
+    result["dates"] = dates
+    return result
+
+
+def run_for_ticker(loader: DataLoader, engine: IndicatorEngine, stock: str, username: Optional[str],
+                   strategy: str, params: Dict = None, fee_bps: float = 0.0, slippage_bps: float = 0.0,
+                   start_date: str = None, end_date: str = None, include_equity: bool = False) -> Dict:
+    """Backtest one ticker and return a JSON-ready summary (optionally with the equity curve)."""
+    df, version = loader.load_versioned(stock, username)
+    # Same key as /api/analyze's full-history columns, so the two share them
+    result = backtest(df, engine, strategy, params, fee_bps, slippage_bps, version=(version, None, None),
+                      start_date=start_date, end_date=end_date)
+    summary = {"stock": stock, "strategy": strategy, "rows": int(len(result["equity"]))}
+    summary.update({k: v for k, v in result.items() if k not in ("equity", "positions", "dates")})
+    if include_equity:
+        dates = result["dates"]
+        summary["equity_curve"] = {
+            "Date": dates.dt.strftime('%Y-%m-%d').tolist() if dates is not None else None,
+            "equity": result["equity"].tolist(),
+            "position": result["positions"].astype(np.int8).tolist(),
+        }
+    return summary
@@ -0,0 +1,129 @@
+"""Multi-ticker analysis on a process pool.
+
+Each worker process keeps its own DataLoader and IndicatorEngine, so frames and
+indicator columns stay cached in the worker between batches. Workers return
+finished JSON lines; the parent only relays them.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .analysis import analyze, records_json
+from .backtest import run_for_ticker
+from .data_loader import DataLoader
+from .engine import IndicatorEngine
+from .precompute import PrecomputedStore
+from .shared_store import SharedFrameStore
+
+_loader: Optional[DataLoader] = None
+_engine: Optional[IndicatorEngine] = None
+_precomputed: Optional[PrecomputedStore] = None
+
+
+def _init_worker(public_data_dir: str, users_data_dir: str, cache_bytes: int, engine_bytes: int,
+                 shared_dir: Optional[str], shared_bytes: int):
+    global _loader, _engine, _precomputed
+    shared = SharedFrameStore(shared_dir, shared_bytes) if shared_dir else None
+    _loader = DataLoader(public_data_dir, users_data_dir, cache_bytes=cache_bytes, shared=shared)
+    _engine = IndicatorEngine(max_bytes=engine_bytes)
+    _precomputed = PrecomputedStore(public_data_dir)
+
+
+def error_line(stock: str, error: str) -> str:
+    return json.dumps({"stock": stock, "error": error})
+
+
+def analyze_ticker(stock: str, username: str, specs: List[Tuple[str, Dict]],
+                   start_date: str = None, end_date: str = None) -> str:
+    """Runs in a worker; a failure becomes an error line rather than an exception."""
+    try:
+        df = analyze(_loader, _engine, stock, username, specs, start_date, end_date, precomputed=_precomputed)
+        return records_json(stock, df)
+    except Exception as e:
+        return error_line(stock, str(e))
+
+
+def backtest_ticker(stock: str, username: str, strategy: str, params: Dict, fee_bps: float,
+                    slippage_bps: float, start_date: str = None, end_date: str = None) -> str:
+    try:
+        summary = run_for_ticker(_loader, _engine, stock, username, strategy, params, fee_bps, slippage_bps,
+                                 start_date, end_date)
+        return json.dumps(summary)
+    except Exception as e:
+        return error_line(stock, str(e))
+
+
+class BatchAnalyzer:
+    def __init__(self, public_data_dir: str = "./data/public", users_data_dir: str = "./data/users",
+                 workers: int = None, cache_bytes: int = 64 * 1024 * 1024,
+                 engine_bytes: int = 32 * 1024 * 1024, shared_dir: str = None,
+                 shared_bytes: int = 1024 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        # Workers map frames from the shared store at ``shared_dir`` when one is given
+        self._initargs = (public_data_dir, users_data_dir, cache_bytes, engine_bytes, shared_dir, shared_bytes)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Started on first use; spawn avoids forking the server's threads
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=self._initargs,
+                )
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def stream(self, stocks: List[str], username: str, specs: List[Tuple[str, Dict]],
+               start_date: str = None, end_date: str = None) -> AsyncIterator[str]:
+        """Yield one NDJSON line of analysis per ticker, in completion order."""
+        return self._stream(analyze_ticker, stocks, username, specs, start_date, end_date)
+
+    def stream_backtests(self, stocks: List[str], username: str, strategy: str, params: Dict,
+                         fee_bps: float = 0.0, slippage_bps: float = 0.0, start_date: str = None,
+                         end_date: str = None) -> AsyncIterator[str]:
+        """Yield one NDJSON line of backtest statistics per ticker, in completion order."""
+        return self._stream(backtest_ticker, stocks, username, strategy, params, fee_bps, slippage_bps,
+                            start_date, end_date)
+
+    async def _stream(self, func, stocks: List[str], *args) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        pending = {}
+        for stock in stocks:
+            future = loop.run_in_executor(pool, func, stock, *args)
+            pending[future] = stock
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    stock = pending.pop(future)
+                    try:
+                        line = future.result()
+                    except Exception as e:
+                        # A crashed worker breaks the pool; start a fresh one next time
+                        self._discard_pool(pool)
+                        line = error_line(stock, str(e) or type(e).__name__)
+                    yield line + "\n"
+        finally:
+            # Client went away or the batch failed: drop work that hasn't started
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+# From pandas 3.0 copy-on-write is always on, so a shallow copy can't write
+# through to a cached frame. Older versions get a deep copy instead of
+# switching the option on for the whole process.
+SHALLOW_COPIES_SAFE = int(pd.__version__.split(".")[0]) >= 3
+
+
+def hand_out(df: pd.DataFrame) -> pd.DataFrame:
+    """A copy of a cached frame that callers may modify freely."""
+    return df.copy(deep=not SHALLOW_COPIES_SAFE)
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class FrameCache:
+    """LRU cache of parsed frames bounded by a total byte budget.
+
+    Entries are keyed by file path and carry the file signature (mtime, size)
+    they were parsed from, so a changed file is a miss rather than a stale hit.
+    ``on_remove(path, signature)`` is called whenever an entry is dropped,
+    after the cache's lock is released.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 on_remove: Optional[Callable[[str, Hashable], None]] = None):
+        self.max_bytes = max_bytes
+        self.on_remove = on_remove
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Hashable, pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, signature: Hashable) -> Optional[pd.DataFrame]:
+        removed = []
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != signature:
+                if entry is not None:
+                    removed.append(self._remove(path))
+                self.misses += 1
+                df = None
+            else:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                df = hand_out(entry[1])
+        self._notify(removed)
+        return df
+
+    def put(self, path: str, signature: Hashable, df: pd.DataFrame) -> pd.DataFrame:
+        nbytes = frame_nbytes(df)
+        removed = []
+        with self._lock:
+            if path in self._entries:
+                # Re-putting the same version keeps whatever on_remove would release
+                old = self._remove(path)
+                if old[1] != signature:
+                    removed.append(old)
+            if nbytes <= self.max_bytes:
+                self._entries[path] = (signature, df, nbytes)
+                self.current_bytes += nbytes
+                while self.current_bytes > self.max_bytes:
+                    removed.append(self._remove(next(iter(self._entries))))
+                    self.evictions += 1
+            else:
+                removed.append((path, signature))
+        self._notify(removed)
+        return hand_out(df)
+
+    def invalidate(self, path: str):
+        with self._lock:
+            removed = [self._remove(path)] if path in self._entries else []
+        self._notify(removed)
+
+    def clear(self):
+        with self._lock:
+            removed = [self._remove(path) for path in list(self._entries)]
+        self._notify(removed)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, path: str) -> Tuple[str, Hashable]:
+        signature, _, nbytes = self._entries.pop(path)
+        self.current_bytes -= nbytes
+        return path, signature
+
+    def _notify(self, removed):
+        # Outside the lock: on_remove may block (the shared store takes file locks)
+        if self.on_remove is not None:
+            for path, signature in removed:
+                self.on_remove(path, signature)
@@ -0,0 +1,230 @@
+"""Binary columnar storage for ticker frames.
+
+A ``.cols`` file is an 8 byte magic, an 8 byte little-endian header length, a
+JSON header and then one raw little-endian buffer per column, each aligned to
+64 bytes so it can be memory-mapped and viewed as a NumPy array directly::
+
+    {"rows": 753, "columns": [{"name": "Close", "dtype": "<f8", "offset": 192, "nbytes": 6024}, ...], "meta": {}}
+
+Timezone-aware dates are stored as UTC with the zone in the column's ``tz``
+field and converted back on read. Text columns are fixed-width unicode; a
+column's ``missing`` field points at a one-byte-per-row buffer flagging the
+rows that were missing (NaN/None), which read back as missing rather than as
+the strings "nan" or "None".
+"""
+import contextlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNAR_SUFFIX = ".cols"
+MAGIC = b"SACOLS01"
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _column_array(series: pd.Series) -> Tuple[np.ndarray, Optional[str], Optional[np.ndarray]]:
+    """``(values, timezone, missing-row flags)`` to store for ``series``."""
+    tz = None
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        tz = str(series.dt.tz)
+        series = series.dt.tz_convert(None)
+    missing = None
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series) \
+            or pd.api.types.is_datetime64_dtype(series):
+        arr = series.to_numpy()
+    else:
+        missing = np.ascontiguousarray(series.isna().to_numpy(dtype=bool))
+        arr = series.astype(str).to_numpy(dtype=str)
+        arr[missing] = ""
+    return np.ascontiguousarray(arr.astype(arr.dtype.newbyteorder("<"), copy=False)), tz, missing
+
+
+def _column_entry(name: str, dtype: np.dtype, nbytes: int, tz: Optional[str], rows: Optional[int]) -> Dict:
+    """Header entry for a column; ``rows`` is None unless it has a missing-row buffer."""
+    col = {"name": name, "dtype": dtype.str, "offset": 0, "nbytes": int(nbytes)}
+    if tz is not None:
+        col["tz"] = tz
+    if rows is not None:
+        col["missing"] = {"offset": 0, "nbytes": int(rows)}
+    return col
+
+
+def _buffers(columns: List[Dict]) -> Iterator[Dict]:
+    """Every buffer in file order: each column's values, then its missing-row flags if any."""
+    for col in columns:
+        yield col
+        if "missing" in col:
+            yield col["missing"]
+
+
+def _header(rows: int, columns: List[Dict], meta: Optional[Dict]) -> bytes:
+    """Header bytes for ``columns`` (name, dtype, nbytes); fills in each buffer's offset."""
+    header = {"rows": int(rows), "columns": columns, "meta": meta or {}}
+    # Offsets depend on the header size, which depends on the offsets; size the
+    # header with generous placeholders first.
+    for buf in _buffers(columns):
+        buf["offset"] = 1 << 62
+    data_start = _align(16 + len(json.dumps(header).encode("utf-8")))
+    offset = data_start
+    for buf in _buffers(columns):
+        buf["offset"] = offset
+        offset = _align(offset + buf["nbytes"])
+    return json.dumps(header).encode("utf-8")
+
+
+def column_values(col: Dict, read: Callable[[int, np.dtype, int], np.ndarray]):
+    """Values of the header entry ``col``; ``read(offset, dtype, count)`` returns a buffer of the file."""
+    dtype = np.dtype(col["dtype"])
+    values = read(col["offset"], dtype, col["nbytes"] // dtype.itemsize)
+    if "tz" in col:
+        return pd.Series(values, copy=False).dt.tz_localize("UTC").dt.tz_convert(col["tz"]).array
+    if "missing" in col:
+        missing = read(col["missing"]["offset"], np.dtype(bool), col["missing"]["nbytes"])
+        if missing.any():
+            values = values.astype(object)
+            values[missing] = None
+    return values
+
+
+@contextlib.contextmanager
+def _atomic(path: str) -> Iterator[BinaryIO]:
+    """A file that replaces ``path`` only once fully written."""
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_header(f: BinaryIO, header_bytes: bytes):
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(header_bytes)))
+    f.write(header_bytes)
+
+
+def write_columnar(df: pd.DataFrame, path: str, meta: Optional[Dict] = None):
+    """Write ``df`` to ``path`` atomically (temp file + rename)."""
+    arrays = [(str(name), *_column_array(df[name])) for name in df.columns]
+    columns = [_column_entry(name, arr.dtype, arr.nbytes, tz, None if missing is None else len(df))
+               for name, arr, tz, missing in arrays]
+    header_bytes = _header(len(df), columns, meta)
+    with _atomic(path) as f:
+        _write_header(f, header_bytes)
+        for col, (_, arr, _, missing) in zip(columns, arrays):
+            f.write(b"\0" * (col["offset"] - f.tell()))
+            f.write(arr.tobytes())
+            if missing is not None:
+                f.write(b"\0" * (col["missing"]["offset"] - f.tell()))
+                f.write(missing.tobytes())
+
+
+class ColumnarWriter:
+    """Builds a ``.cols`` file from row chunks without holding all the rows.
+
+    Each column is appended to its own spill file as chunks arrive; close()
+    lays the spills out behind the header and renames the result into place.
+    Chunks must all have the same columns and dtypes.
+    """
+
+    def __init__(self, path: str, block_bytes: int = 16 * 1024 * 1024):
+        self.path = path
+        self.rows = 0
+        self.block_bytes = block_bytes
+        self._spill_dir = tempfile.mkdtemp(prefix=".spill-", dir=os.path.dirname(os.path.abspath(path)))
+        # (name, dtype, timezone, values spill, missing-row spill or None)
+        self._columns: List[Tuple[str, np.dtype, Optional[str], BinaryIO, Optional[BinaryIO]]] = []
+
+    def append(self, chunk: pd.DataFrame):
+        arrays = [(str(name), *_column_array(chunk[name])) for name in chunk.columns]
+        if not self._columns and not self.rows:
+            for i, (name, arr, tz, missing) in enumerate(arrays):
+                spill = open(os.path.join(self._spill_dir, str(i)), "w+b")
+                missing_spill = None if missing is None else open(os.path.join(self._spill_dir, f"{i}.missing"), "w+b")
+                self._columns.append((name, arr.dtype, tz, spill, missing_spill))
+        if [(name, arr.dtype, tz) for name, arr, tz, _ in arrays] != \
+                [(name, dtype, tz) for name, dtype, tz, _, _ in self._columns]:
+            raise ValueError("Chunk columns or dtypes differ from the first chunk")
+        for (_, arr, _, missing), (_, _, _, spill, missing_spill) in zip(arrays, self._columns):
+            spill.write(arr.tobytes())
+            if missing_spill is not None:
+                missing_spill.write(missing.tobytes())
+        self.rows += len(chunk)
+
+    def close(self, dtypes: Optional[Dict[str, np.dtype]] = None, meta: Optional[Dict] = None):
+        """Write the file; ``dtypes`` converts columns (e.g. float64 to int64) on the way."""
+        try:
+            targets = [np.dtype((dtypes or {}).get(name, dtype)).newbyteorder("<")
+                       for name, dtype, _, _, _ in self._columns]
+            columns = [_column_entry(name, target, self.rows * target.itemsize, tz,
+                                     None if missing_spill is None else self.rows)
+                       for (name, _, tz, _, missing_spill), target in zip(self._columns, targets)]
+            header_bytes = _header(self.rows, columns, meta)
+            with _atomic(self.path) as f:
+                _write_header(f, header_bytes)
+                for col, (_, dtype, _, spill, missing_spill), target in zip(columns, self._columns, targets):
+                    f.write(b"\0" * (col["offset"] - f.tell()))
+                    self._copy(spill, f, dtype, target)
+                    if missing_spill is not None:
+                        f.write(b"\0" * (col["missing"]["offset"] - f.tell()))
+                        self._copy(missing_spill, f, np.dtype(bool), np.dtype(bool))
+        finally:
+            self.abort()
+
+    def _copy(self, spill: BinaryIO, f: BinaryIO, dtype: np.dtype, target: np.dtype):
+        spill.seek(0)
+        step = max(self.block_bytes // dtype.itemsize, 1) * dtype.itemsize
+        while True:
+            block = spill.read(step)
+            if not block:
+                break
+            values = np.frombuffer(block, dtype=dtype)
+            f.write(values.astype(target, copy=False).tobytes())
+
+    def abort(self):
+        """Drop the spill files; ``path`` is left untouched."""
+        for _, _, _, spill, missing_spill in self._columns:
+            spill.close()
+            if missing_spill is not None:
+                missing_spill.close()
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+
+def read_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar ticker file")
+        (length,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(length))
+
+
+def read_columnar(path: str, mmap: bool = False) -> pd.DataFrame:
+    """Load a ``.cols`` file; with ``mmap=True`` columns are read-only views of the file."""
+    header = read_header(path)
+    with contextlib.ExitStack() as stack:
+        if mmap and header["rows"]:
+            buf = np.memmap(path, dtype=np.uint8, mode="r")
+
+            def read(offset, dtype, count):
+                return np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        else:
+            f = stack.enter_context(open(path, "rb"))
+
+            def read(offset, dtype, count):
+                f.seek(offset)
+                return np.fromfile(f, dtype=dtype, count=count)
+        return pd.DataFrame({col["name"]: column_values(col, read) for col in header["columns"]}, copy=False)
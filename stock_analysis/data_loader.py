@@ -1,70 +1,447 @@
+import numpy as np
 import pandas as pd
+import io
 import os
-from typing import List, Dict
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from .cache import FrameCache
+from .columnar import COLUMNAR_SUFFIX, ColumnarWriter, read_columnar, write_columnar
+from .metrics import stage
+from .resample import ResampleCache, parse_interval
+from .shared_store import SharedFrameStore
+
+REQUIRED_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
 
 class DataLoader:
-    def __init__(self, public_data_dir: str = "./data/public", users_data_dir: str = "./data/users"):
+    def __init__(self, public_data_dir: str = "./data/public", users_data_dir: str = "./data/users",
+                 cache_bytes: int = 256 * 1024 * 1024, revalidate_seconds: float = 1.0,
+                 shared: SharedFrameStore = None, labels_bytes: int = 64 * 1024 * 1024,
+                 resample_bytes: int = 128 * 1024 * 1024):
         self.public_data_dir = public_data_dir
         self.users_data_dir = users_data_dir
+        # With a shared store, frames are mapped from it rather than held per process
+        self.shared = shared
+        self.cache = FrameCache(cache_bytes, on_remove=self._release if shared is not None else None)
+        # Within this interval a ticker's resolved path and signature are reused
+        # without stat-ing the file again.
+        self.revalidate_seconds = revalidate_seconds
+        self._resolved: Dict[Tuple[Optional[str], str], Tuple[str, Tuple[int, int], float]] = {}
+        self._resolved_lock = threading.Lock()
+        # version -> (parent version, rows appended) for versions that only
+        # appended rows, so indicator results can be extended
+        self._lineage: "OrderedDict[Tuple, Tuple[Tuple, int]]" = OrderedDict()
+        self._append_lock = threading.Lock()
+        # version -> (formatted dates, bytes); sliced per request instead of re-formatted
+        self.labels_bytes = labels_bytes
+        self._labels: "OrderedDict[Tuple, Tuple[pd.api.extensions.ExtensionArray, int]]" = OrderedDict()
+        self._labels_bytes_used = 0
+        self.resampled = ResampleCache(resample_bytes)
+        # directory -> (mtime_ns, tickers, checked at)
+        self._listings: Dict[str, Tuple[int, List[str], float]] = {}
 
     def _get_tickers_from_dir(self, directory: str) -> List[str]:
+        # Listings are reused while the directory's mtime (which every create,
+        # delete and rename bumps) is unchanged, re-checked like resolved paths
+        now = time.monotonic()
+        with self._resolved_lock:
+            cached = self._listings.get(directory)
+        if cached and now - cached[2] < self.revalidate_seconds:
+            return cached[1]
+        st = self._stat(directory)
+        if st is None:
+            return []
+        if cached and cached[0] == st.st_mtime_ns:
+            tickers = cached[1]
+        else:
+            tickers = self._list_tickers(directory)
+        with self._resolved_lock:
+            self._listings[directory] = (st.st_mtime_ns, tickers, now)
+        return tickers
+
+    @staticmethod
+    def _list_tickers(directory: str) -> List[str]:
         tickers = []
-        if not os.path.exists(directory):
-            return tickers
         for file in os.listdir(directory):
-            if file.endswith("_raw.csv"):
+            if file.endswith(COLUMNAR_SUFFIX):
+                tickers.append(file[:-len(COLUMNAR_SUFFIX)])
+            elif file.endswith("_raw.csv"):
                 tickers.append(file.replace("_raw.csv", ""))
             elif file.endswith(".csv") and not "processed" in file:
                 tickers.append(file.replace(".csv", ""))
-        return tickers
+        # A converted CSV and its columnar copy are the same ticker
+        return list(set(tickers))
 
     def get_available_tickers(self, username: str = None) -> List[str]:
         public_tickers = self._get_tickers_from_dir(self.public_data_dir)
         user_tickers = []
         if username:
-            user_dir = os.path.join(self.users_data_dir, username)
-            if os.path.exists(user_dir):
-                user_tickers = self._get_tickers_from_dir(user_dir)
-        
+            user_tickers = self._get_tickers_from_dir(os.path.join(self.users_data_dir, username))
+
         # Combine unique tickers
         return sorted(list(set(public_tickers + user_tickers)))
 
-    def load_data(self, stock_name: str, username: str = None) -> pd.DataFrame:
-        # Check user directory first if username is provided
-        file_path = None
-        
+    def _candidate_dirs(self, username: str = None) -> List[str]:
+        # User directory first if username is provided, then the public directory
+        directories = []
         if username:
-            user_dir = os.path.join(self.users_data_dir, username)
-            potential_paths = [
-                os.path.join(user_dir, f"{stock_name}_raw.csv"),
-                os.path.join(user_dir, f"{stock_name}.csv")
-            ]
-            for p in potential_paths:
-                if os.path.exists(p):
-                    file_path = p
-                    break
-        
-        # If not found in user dir, check public dir
-        if not file_path:
-            potential_paths = [
-                os.path.join(self.public_data_dir, f"{stock_name}_raw.csv"),
-                os.path.join(self.public_data_dir, f"{stock_name}.csv")
-            ]
-            for p in potential_paths:
-                if os.path.exists(p):
-                    file_path = p
-                    break
-        
-        if not file_path:
-             raise ValueError(f"Stock {stock_name} not found.")
-
-        df = pd.read_csv(file_path)
+            directories.append(os.path.join(self.users_data_dir, username))
+        directories.append(self.public_data_dir)
+        return directories
+
+    @staticmethod
+    def _stat(path: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def resolve(self, stock_name: str, username: str = None) -> Tuple[str, Tuple[int, int]]:
+        """Return the absolute path of a ticker file and its (mtime_ns, size) signature.
+
+        The columnar copy is preferred unless the CSV next to it is newer, in
+        which case the CSV is returned and converted on load.
+        """
+        key = (username, stock_name)
+        now = time.monotonic()
+        with self._resolved_lock:
+            cached = self._resolved.get(key)
+        if cached and now - cached[2] < self.revalidate_seconds:
+            return cached[0], cached[1]
+
+        for directory in self._candidate_dirs(username):
+            columnar_path = os.path.join(directory, f"{stock_name}{COLUMNAR_SUFFIX}")
+            columnar_st = self._stat(columnar_path)
+            chosen = (columnar_path, columnar_st) if columnar_st else None
+            for p in (os.path.join(directory, f"{stock_name}_raw.csv"),
+                      os.path.join(directory, f"{stock_name}.csv")):
+                st = self._stat(p)
+                if st is None:
+                    continue
+                if columnar_st is None or st.st_mtime_ns > columnar_st.st_mtime_ns:
+                    chosen = (p, st)
+                break
+            if chosen:
+                path = os.path.abspath(chosen[0])
+                signature = (chosen[1].st_mtime_ns, chosen[1].st_size)
+                self._remember(key, path, signature, now)
+                return path, signature
+
+        raise ValueError(f"Stock {stock_name} not found.")
+
+    def _remember(self, key, path: str, signature: Tuple[int, int], now: float = None):
+        with self._resolved_lock:
+            self._resolved[key] = (path, signature, time.monotonic() if now is None else now)
+
+    def load_data(self, stock_name: str, username: str = None) -> pd.DataFrame:
+        return self.load_versioned(stock_name, username)[0]
+
+    def load_versioned(self, stock_name: str, username: str = None) -> Tuple[pd.DataFrame, Tuple]:
+        """Like load_data, but also return a (path, signature) token identifying the rows."""
+        with stage("lookup"):
+            file_path, signature = self.resolve(stock_name, username)
+            df = self.cache.get(file_path, signature)
+        if df is not None:
+            return df, (file_path, signature)
+        if self.shared is not None:
+            with stage("attach_shared"):
+                try:
+                    df = self.shared.attach((file_path, signature))
+                except OSError:
+                    # Store unusable (lock, index or full tmpfs): this process keeps its own copy
+                    df = None
+            if df is not None:
+                return self.cache.put(file_path, signature, df), (file_path, signature)
+        if file_path.endswith(COLUMNAR_SUFFIX):
+            with stage("read_columnar", nbytes=signature[1]):
+                df = read_columnar(file_path)
+            return self._keep(file_path, signature, df, username, stock_name), (file_path, signature)
+
+        # Lazily convert the CSV so later loads skip the text parse
+        df = self._read_csv(file_path, nbytes=signature[1])
+        columnar_path = os.path.join(os.path.dirname(file_path), f"{stock_name}{COLUMNAR_SUFFIX}")
+        try:
+            with stage("write_columnar"):
+                write_columnar(df, columnar_path)
+        except OSError:
+            return self._keep(file_path, signature, df, username, stock_name), (file_path, signature)
+        self.cache.invalidate(file_path)
+        st = os.stat(columnar_path)
+        signature = (st.st_mtime_ns, st.st_size)
+        self._remember((username, stock_name), columnar_path, signature)
+        return self._keep(columnar_path, signature, df, username, stock_name), (columnar_path, signature)
+
+    def _keep(self, path: str, signature: Tuple[int, int], df: pd.DataFrame, username: Optional[str],
+              stock_name: str) -> pd.DataFrame:
+        if self.shared is not None:
+            # Label the entry with the user only when it's their own file
+            owner = username if username and os.path.dirname(path) == os.path.abspath(
+                os.path.join(self.users_data_dir, username)) else None
+            with stage("publish_shared"):
+                try:
+                    df = self.shared.publish((path, signature), df, owner, stock_name)
+                except OSError:
+                    pass
+        return self.cache.put(path, signature, df)
+
+    def _release(self, path: str, signature: Tuple[int, int]):
+        try:
+            self.shared.release((path, signature))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        date_col = next((c for c in df.columns if c.lower() == 'date'), None)
+        if date_col:
+            df[date_col] = pd.to_datetime(df[date_col])
+            df = df.sort_values(date_col, kind="mergesort", ignore_index=True)
         return df
 
-    def save_user_file(self, username: str, filename: str, content: bytes):
+    def _read_csv(self, file_path, nbytes: int = None) -> pd.DataFrame:
+        with stage("parse_csv", nbytes=nbytes):
+            df = pd.read_csv(file_path)
+        with stage("prepare"):
+            return self._prepare(df)
+
+    def load_resampled(self, stock_name: str, username: str = None, interval: str = "1D") -> Tuple[pd.DataFrame, Tuple]:
+        """Like load_versioned, with the bars aggregated to ``interval`` (see ``resample``)."""
+        canonical = parse_interval(interval)
+        df, version = self.load_versioned(stock_name, username)
+        date_col = next((c for c in df.columns if c.lower() == 'date'), None)
+        if date_col is None:
+            raise ValueError(f"Stock {stock_name} has no date column")
+        with stage("resample"):
+            return self.resampled.get(df, version, date_col, canonical), (version, canonical)
+
+    def date_labels(self, version: Tuple, dates: pd.Series, fmt: str = '%Y-%m-%d') -> pd.api.extensions.ExtensionArray:
+        """``fmt`` strings of ``dates``, the date column of the frame loaded as ``version``."""
+        key = (version, fmt)
+        with self._resolved_lock:
+            cached = self._labels.get(key)
+            if cached is not None:
+                self._labels.move_to_end(key)
+                return cached[0]
+        labels = dates.dt.strftime(fmt).array
+        nbytes = int(pd.Series(labels, copy=False).memory_usage(index=False, deep=True))
+        if nbytes <= self.labels_bytes:
+            with self._resolved_lock:
+                if key not in self._labels:
+                    self._labels[key] = (labels, nbytes)
+                    self._labels_bytes_used += nbytes
+                while self._labels_bytes_used > self.labels_bytes:
+                    _, (_, evicted) = self._labels.popitem(last=False)
+                    self._labels_bytes_used -= evicted
+        return labels
+
+    def _forget_listing(self, directory: str):
+        with self._resolved_lock:
+            self._listings.pop(directory, None)
+
+    def invalidate(self, username: str = None):
+        """Forget resolved paths and listings so the next load re-stats the files."""
+        with self._resolved_lock:
+            for key in [k for k in self._resolved if k[0] == username]:
+                del self._resolved[key]
+            self._listings.pop(os.path.join(self.users_data_dir, username) if username else self.public_data_dir,
+                               None)
+
+    def parent_version(self, version: Tuple) -> Optional[Tuple[Tuple, int]]:
+        """``(parent version, rows appended)`` if ``version`` came from a pure append."""
+        with self._resolved_lock:
+            return self._lineage.get(version)
+
+    def append_bars(self, stock_name: str, bars: pd.DataFrame, username: str = None) -> Dict[str, int]:
+        """Add ``bars`` to a ticker, replacing existing rows with the same date.
+
+        The result is written atomically to the user's directory (the public
+        one without a username), so appending to a public ticker gives the
+        user their own copy.
+        """
+        with self._append_lock:
+            df, version = self.load_versioned(stock_name, username)
+            date_col = next((c for c in df.columns if c.lower() == 'date'), None)
+            if date_col is None:
+                raise ValueError(f"Stock {stock_name} has no date column")
+            bars = bars.rename(columns={c: date_col for c in bars.columns if c.lower() == 'date'})
+            if date_col not in bars.columns:
+                raise ValueError("Bars need a date column")
+            unknown = [c for c in bars.columns if c not in df.columns]
+            if unknown:
+                raise ValueError(f"Unknown column(s): {', '.join(map(str, unknown))}")
+            bars = self._checked_bars(df, bars.reset_index(drop=True), date_col)
+            bars = self._prepare(bars.reindex(columns=df.columns))
+
+            appended = len(bars)
+            replaced = 0
+            if len(df) and len(bars) and bars[date_col].iloc[0] <= df[date_col].iloc[-1]:
+                replaced = int(df[date_col].isin(bars[date_col]).sum())
+                appended -= replaced
+                combined = pd.concat([df, bars], ignore_index=True)
+                combined = combined.drop_duplicates(subset=date_col, keep='last')
+                combined = combined.sort_values(date_col, kind="mergesort", ignore_index=True)
+            else:
+                combined = pd.concat([df, bars], ignore_index=True)
+
+            directory = os.path.join(self.users_data_dir, username) if username else self.public_data_dir
+            os.makedirs(directory, exist_ok=True)
+            file_path = os.path.abspath(os.path.join(directory, f"{stock_name}{COLUMNAR_SUFFIX}"))
+            write_columnar(combined, file_path)
+            self._forget_listing(directory)
+            st = os.stat(file_path)
+            signature = (st.st_mtime_ns, st.st_size)
+            self._remember((username, stock_name), file_path, signature)
+            with self._resolved_lock:
+                # Users reading the same file see the new rows at once too
+                for key, (path, _, checked) in list(self._resolved.items()):
+                    if path == file_path:
+                        self._resolved[key] = (path, signature, checked)
+            new_version = (file_path, signature)
+            if replaced == 0 and appended:
+                # Only rows after the old last date were added
+                with self._resolved_lock:
+                    self._lineage[new_version] = (version, appended)
+                    while len(self._lineage) > 1024:
+                        self._lineage.popitem(last=False)
+            self._keep(file_path, signature, combined, username, stock_name)
+            return {"rows": len(combined), "appended": appended, "replaced": replaced}
+
+    def _checked_bars(self, df: pd.DataFrame, bars: pd.DataFrame, date_col: str) -> pd.DataFrame:
+        """``bars`` validated like an upload before they are appended to ``df``; ValueError if they don't pass.
+
+        Every bar needs a date and all price and volume columns the ticker
+        has, as numbers. Dates must be strictly increasing. A bar may replace
+        the row with its date; any other bar must come after the last stored
+        date.
+        """
+        missing = [c for c in REQUIRED_COLUMNS if c in df.columns and c not in bars.columns]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        bars = bars.copy()
+        numeric = [c for c in bars.columns if c != date_col and pd.api.types.is_numeric_dtype(df[c])]
+        self._numeric(bars, numeric, 1, unit="Bar")
+        required = [c for c in REQUIRED_COLUMNS if c in bars.columns]
+        absent = bars[required].isna().to_numpy()
+        if absent.any():
+            row, col = np.argwhere(absent)[0]
+            raise ValueError(f"Bar {row + 1}: {required[col]} is missing")
+        dates = self._dates(bars[date_col], 1, unit="Bar")
+        if dates.dtype != df[date_col].dtype:
+            try:
+                dates = dates.astype(df[date_col].dtype)
+            except (TypeError, ValueError):
+                raise ValueError(f"Bar dates must be like the stored ones ({df[date_col].dtype})")
+        unordered = (dates.iloc[1:].to_numpy() <= dates.iloc[:-1].to_numpy())
+        if unordered.any():
+            raise ValueError(f"Bar {int(np.argmax(unordered)) + 2}: dates must be strictly increasing")
+        if len(df):
+            last = df[date_col].iloc[-1]
+            early = ((dates <= last) & ~dates.isin(df[date_col])).to_numpy()
+            if early.any():
+                raise ValueError(f"Bar {int(np.argmax(early)) + 1}: date must be after {last} "
+                                 f"unless it replaces a stored bar")
+        bars[date_col] = dates
+        for c in numeric:
+            # Integer columns (Volume) stay integers when the bars allow it
+            if df[c].dtype.kind in "iu" and (bars[c] == np.round(bars[c])).all():
+                bars[c] = bars[c].astype(df[c].dtype)
+        return bars
+
+    def save_user_file(self, username: str, filename: str, content, chunk_rows: int = 100_000) -> str:
+        """Validate an uploaded OHLCV CSV and store it as the user's ticker.
+
+        ``content`` is bytes or a binary file object. Rows are parsed and
+        checked ``chunk_rows`` at a time and spilled to disk, so memory does
+        not grow with the file. The ticker is replaced atomically and only
+        once the whole file has passed; a bad file raises ValueError and
+        leaves the previous data in place.
+        """
+        ticker = os.path.basename(filename or "").replace(".csv", "").replace("_raw", "")
+        if not ticker or ticker.startswith("."):
+            raise ValueError(f"Bad file name {filename!r}")
         user_dir = os.path.join(self.users_data_dir, username)
         os.makedirs(user_dir, exist_ok=True)
-        file_path = os.path.join(user_dir, filename)
-        with open(file_path, "wb") as f:
-            f.write(content)
-        return filename.replace(".csv", "").replace("_raw", "")
+        # Uploads are stored only in columnar form; parsing happens once, here
+        file_path = os.path.abspath(os.path.join(user_dir, f"{ticker}{COLUMNAR_SUFFIX}"))
+        source = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+        writer = ColumnarWriter(file_path)
+        try:
+            with stage("ingest_csv", nbytes=len(content) if isinstance(content, (bytes, bytearray)) else None):
+                integral = self._ingest_csv(source, writer, chunk_rows)
+            writer.close(dtypes={c: np.int64 for c, is_int in integral.items() if is_int})
+        except BaseException:
+            writer.abort()
+            raise
+        st = os.stat(file_path)
+        self.cache.invalidate(file_path)
+        self._forget_listing(user_dir)
+        self._remember((username, ticker), file_path, (st.st_mtime_ns, st.st_size))
+        return ticker
+
+    @staticmethod
+    def _numeric(frame: pd.DataFrame, columns, first_row: int, unit: str = "Row") -> Dict[str, bool]:
+        """Convert ``columns`` of ``frame`` to float64 in place; a value that isn't a number raises ValueError.
+
+        Returns which columns held only integers. Rows are numbered from ``first_row``.
+        """
+        integral = {}
+        for c in columns:
+            values = frame[c]
+            if values.dtype.kind not in "iuf":
+                numeric = pd.to_numeric(values, errors="coerce")
+                bad = numeric.isna() & values.notna()
+                if bad.any():
+                    row = first_row + int(np.argmax(bad.to_numpy()))
+                    raise ValueError(f"{unit} {row}: {c} is not a number ({values[bad].iloc[0]!r})")
+                values = numeric
+            integral[c] = values.dtype.kind in "iu"
+            frame[c] = values.astype(np.float64)
+        return integral
+
+    @staticmethod
+    def _dates(values: pd.Series, first_row: int, unit: str = "Row") -> pd.Series:
+        """``values`` parsed as dates; an unparseable or missing one raises ValueError."""
+        dates = pd.to_datetime(values, errors="coerce")
+        if dates.isna().any():
+            row = first_row + int(np.argmax(dates.isna().to_numpy()))
+            raise ValueError(f"{unit} {row}: bad date {values[dates.isna()].iloc[0]!r}")
+        return dates
+
+    @staticmethod
+    def _ingest_csv(source, writer: ColumnarWriter, chunk_rows: int) -> Dict[str, bool]:
+        """Stream validated chunks of ``source`` into ``writer``; returns which columns held only integers."""
+        date_col = None
+        date_dtype = None
+        last_date = None
+        integral: Dict[str, bool] = {}
+        for chunk in pd.read_csv(source, chunksize=chunk_rows):
+            first_row = writer.rows + 1
+            if date_col is None:
+                date_col = next((c for c in chunk.columns if str(c).lower() == 'date'), None)
+                missing = ([] if date_col else ["Date"]) + [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+                if missing:
+                    raise ValueError(f"Missing column(s): {', '.join(missing)}")
+            for c, is_int in DataLoader._numeric(chunk, [c for c in chunk.columns if c != date_col],
+                                                 first_row).items():
+                integral[c] = integral.get(c, True) and is_int
+            dates = DataLoader._dates(chunk[date_col], first_row)
+            if date_dtype is None:
+                date_dtype = dates.dtype
+            elif dates.dtype != date_dtype:
+                dates = dates.astype(date_dtype)
+            naive = dates.dt.tz_convert(None) if isinstance(date_dtype, pd.DatetimeTZDtype) else dates
+            ticks = naive.to_numpy().view(np.int64)
+            if last_date is not None and len(ticks):
+                ticks = np.concatenate(([last_date], ticks))
+            steps = np.diff(ticks)
+            if (steps <= 0).any():
+                row = first_row + int(np.argmax(steps <= 0)) + (last_date is None)
+                raise ValueError(f"Row {row}: dates must be strictly increasing")
+            if len(ticks):
+                last_date = ticks[-1]
+            chunk[date_col] = dates
+            writer.append(chunk)
+        if date_col is None or writer.rows == 0:
+            raise ValueError("The file has no rows")
+        return integral
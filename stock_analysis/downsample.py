@@ -0,0 +1,91 @@
+"""Server-side downsampling for charts.
+
+Rows are split into ``max_points`` buckets the way Largest-Triangle-Three-
+Buckets splits them: the first and last rows are buckets of their own and the
+rows in between are divided evenly. Every column gets one value per bucket:
+
+* Open/High/Low/Close/Volume aggregate the bucket (first, max, min, last, sum),
+  so candles keep their true range;
+* other numeric columns (the indicator lines) take the point LTTB selects;
+* anything else, including the date, takes the bucket's first row.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+PRICE_AGGREGATES: Dict[str, str] = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+}
+
+
+def bucket_starts(n: int, max_points: int) -> np.ndarray:
+    """Start row of each of the ``max_points`` buckets covering ``n`` rows."""
+    inner = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    return np.concatenate(([0], inner))
+
+
+def lttb_indices(y: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Row picked by LTTB in every bucket, for each column of 2-D ``y``.
+
+    NaN rows lose to any finite row so leading NaN windows don't hide the
+    line's start; a bucket that is all NaN picks its first row.
+    """
+    n, k = y.shape
+    ends = np.append(starts[1:], n)
+    picks = np.empty((len(starts), k), dtype=np.int64)
+    picks[0] = 0
+    picks[-1] = n - 1
+    cols = np.arange(k)
+    for b in range(1, len(starts) - 1):
+        lo, hi = starts[b], ends[b]
+        prev = picks[b - 1]
+        prev_x, prev_y = prev.astype(np.float64), y[prev, cols]
+        next_lo, next_hi = starts[b + 1], ends[b + 1]
+        avg_x = (next_lo + next_hi - 1) / 2.0
+        following = y[next_lo:next_hi]
+        valid = ~np.isnan(following)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg_y = np.where(valid, following, 0.0).sum(axis=0) / valid.sum(axis=0)
+        x = np.arange(lo, hi, dtype=np.float64)[:, None]
+        area = np.abs((prev_x - avg_x) * (y[lo:hi] - prev_y) - (prev_x - x) * (avg_y - prev_y))
+        finite = np.isfinite(y[lo:hi])
+        area = np.where(np.isnan(area), np.where(finite, 0.0, -1.0), area)
+        picks[b] = lo + area.argmax(axis=0)
+    return picks
+
+
+def downsample(df: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """Reduce ``df`` to at most ``max_points`` rows (``max_points`` >= 3)."""
+    n = len(df)
+    if n <= max_points:
+        return df
+    starts = bucket_starts(n, max_points)
+    out = {}
+    lines = [c for c in df.columns
+             if c not in PRICE_AGGREGATES and pd.api.types.is_numeric_dtype(df[c])
+             and not pd.api.types.is_bool_dtype(df[c])]
+    if lines:
+        y = df[lines].to_numpy(dtype=np.float64)
+        picks = lttb_indices(y, starts)
+        picked = np.take_along_axis(y, picks, axis=0)
+    for c in df.columns:
+        values = df[c].to_numpy()
+        how = PRICE_AGGREGATES.get(c)
+        if c in lines:
+            out[c] = picked[:, lines.index(c)]
+        elif how == "max":
+            out[c] = np.fmax.reduceat(values, starts)
+        elif how == "min":
+            out[c] = np.fmin.reduceat(values, starts)
+        elif how == "sum":
+            out[c] = np.add.reduceat(values, starts)
+        elif how == "last":
+            out[c] = values[np.append(starts[1:], n) - 1]
+        else:
+            out[c] = values[starts]
+    return pd.DataFrame(out, columns=df.columns)
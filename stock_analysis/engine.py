@@ -0,0 +1,331 @@
+"""Memoized indicator computation.
+
+Every indicator is described as a small graph of nodes. A node is a tuple
+``(kind, *args)`` where any tuple argument is itself a node, e.g. the
+Bollinger upper band is::
+
+    ("band", ("mean", ("column", "Close"), 20), ("std", ("column", "Close"), 20), 2.0)
+
+Nodes are evaluated once per request (so ``MA_20`` and ``SMA_20`` share one
+rolling mean) and cached across requests under ``(data version, node)``.
+
+When a version only appends rows to a parent version, cached parent results
+are extended: each node recomputes just the new tail from the rows it looks
+back over (rolling windows, diffs) or from its last value (EMA).
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import kernels
+from .metrics import stage
+
+Node = Tuple
+
+CLOSE = ("column", "Close")
+HIGH = ("column", "High")
+LOW = ("column", "Low")
+
+
+def _band(mid: np.ndarray, std: np.ndarray, num_std: float) -> np.ndarray:
+    return mid + std * num_std
+
+
+NODE_FUNCS: Dict[str, Callable[..., np.ndarray]] = {
+    "mean": kernels.rolling_mean,
+    "std": kernels.rolling_std,
+    "ema": kernels.ewm_mean,
+    "diff": kernels.diff,
+    "gain": kernels.gains,
+    "loss": kernels.losses,
+    "rsi": kernels.rsi_from_averages,
+    "true_range": kernels.true_range,
+    "band": _band,
+    "sub": np.subtract,
+}
+
+
+def _ma_nodes(window: int = 30) -> Dict[str, Node]:
+    return {f"MA_{window}": ("mean", CLOSE, window)}
+
+
+def _sma_nodes(window: int = 20) -> Dict[str, Node]:
+    return {f"SMA_{window}": ("mean", CLOSE, window)}
+
+
+def _std_nodes(window: int = 20) -> Dict[str, Node]:
+    return {f"STD_{window}": ("std", CLOSE, window)}
+
+
+def _ema_nodes(span: int = 14) -> Dict[str, Node]:
+    return {f"EMA_{span}": ("ema", CLOSE, span)}
+
+
+def _rsi_nodes(window: int = 14) -> Dict[str, Node]:
+    delta = ("diff", CLOSE)
+    return {f"RSI_{window}": ("rsi", ("mean", ("gain", delta), window), ("mean", ("loss", delta), window))}
+
+
+def _macd_nodes(fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, Node]:
+    macd = ("sub", ("ema", CLOSE, fast), ("ema", CLOSE, slow))
+    return {"MACD": macd, "MACD_Signal": ("ema", macd, signal)}
+
+
+def _atr_nodes(window: int = 14) -> Dict[str, Node]:
+    return {f"ATR_{window}": ("mean", ("true_range", HIGH, LOW, CLOSE), window)}
+
+
+def _bollinger_nodes(window: int = 20, num_std: float = 2.0) -> Dict[str, Node]:
+    mid = ("mean", CLOSE, window)
+    std = ("std", CLOSE, window)
+    return {
+        f"SMA_{window}": mid,
+        f"STD_{window}": std,
+        f"Upper_BB_{window}": ("band", mid, std, num_std),
+        f"Lower_BB_{window}": ("band", mid, std, -num_std),
+    }
+
+
+# Earlier input rows each node needs to compute a new output row; nodes not
+# listed are elementwise. "ema" carries its last value instead.
+LOOKBACK: Dict[str, Callable[[Node], int]] = {
+    "mean": lambda node: node[2] - 1,
+    "std": lambda node: node[2] - 1,
+    "diff": lambda node: 1,
+    "true_range": lambda node: 1,
+}
+
+
+INDICATORS: Dict[str, Callable[..., Dict[str, Node]]] = {
+    "ma": _ma_nodes,
+    "rsi": _rsi_nodes,
+    "ema": _ema_nodes,
+    "bollinger": _bollinger_nodes,
+    "macd": _macd_nodes,
+    "atr": _atr_nodes,
+    "sma": _sma_nodes,
+    "std": _std_nodes,
+}
+
+
+class IndicatorEngine:
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self._cache: "OrderedDict[Tuple[Hashable, Node], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def plan(specs: List[Tuple[str, Dict]]) -> Dict[str, Node]:
+        """Map output column names to nodes; a column requested twice is computed once."""
+        columns: Dict[str, Node] = {}
+        for name, params in specs:
+            if name not in INDICATORS:
+                raise ValueError(f"Unknown indicator {name}")
+            for column, node in INDICATORS[name](**params).items():
+                columns.setdefault(column, node)
+        return columns
+
+    def compute(self, df: pd.DataFrame, specs: List[Tuple[str, Dict]], version: Hashable = None,
+                parent: Tuple[Hashable, int] = None) -> Dict[str, np.ndarray]:
+        """Evaluate ``specs`` against ``df``.
+
+        ``version`` identifies the exact rows of ``df``; without one nothing is
+        shared across calls. ``parent`` is ``(version, rows)`` of an earlier
+        version whose rows are the first ``rows`` rows of ``df``.
+        """
+        self.plan(specs)
+        memo: Dict[Node, np.ndarray] = {}
+        out: Dict[str, np.ndarray] = {}
+        for name, params in specs:
+            # Shared nodes are charged to the first indicator that needs them
+            with stage(f"indicator.{name}"):
+                for column, node in INDICATORS[name](**params).items():
+                    if column not in out:
+                        out[column] = self._evaluate(node, df, version, memo, parent)
+        return out
+
+    def apply(self, df: pd.DataFrame, specs: List[Tuple[str, Dict]], version: Hashable = None,
+              parent: Tuple[Hashable, int] = None) -> pd.DataFrame:
+        return df.assign(**self.compute(df, specs, version, parent))
+
+    def _evaluate(self, node: Node, df: pd.DataFrame, version: Hashable, memo: Dict[Node, np.ndarray],
+                  parent: Tuple[Hashable, int] = None) -> np.ndarray:
+        if node in memo:
+            return memo[node]
+        if node[0] == "column":
+            result = df[node[1]].to_numpy(dtype=np.float64)
+        else:
+            result = self._lookup(version, node)
+            if result is None:
+                args = [self._evaluate(a, df, version, memo, parent) if isinstance(a, tuple) else a
+                        for a in node[1:]]
+                result = self._extend(node, args, parent) if parent is not None else None
+                if result is None:
+                    result = NODE_FUNCS[node[0]](*args)
+                result.flags.writeable = False
+                self._store(version, node, result)
+        memo[node] = result
+        return result
+
+    def _extend(self, node: Node, args: List, parent: Tuple[Hashable, int]) -> Optional[np.ndarray]:
+        """Parent's cached result for ``node`` plus the new tail, or None to recompute in full."""
+        parent_version, rows = parent
+        with self._lock:
+            previous = self._cache.get((parent_version, node))
+        if previous is None or previous.shape[0] != rows or rows == 0:
+            return None
+        if node[0] == "ema":
+            values = args[0]
+            observed = np.flatnonzero(~np.isnan(values[:rows]))
+            if not len(observed):
+                return None
+            # Resume at the last observation so a NaN gap since then decays its weight
+            last = observed[-1]
+            tail = kernels.ewm_mean(values[last + 1:], *args[1:], seed=previous[last])[rows - last - 1:]
+        else:
+            lookback = LOOKBACK[node[0]](node) if node[0] in LOOKBACK else 0
+            if lookback > rows:
+                return None
+            start = rows - lookback
+            tail = NODE_FUNCS[node[0]](*[a[start:] if isinstance(a, np.ndarray) else a for a in args])[lookback:]
+        with self._lock:
+            self.extensions += 1
+        return np.concatenate((previous, tail))
+
+    def _lookup(self, version: Hashable, node: Node):
+        if version is None:
+            return None
+        with self._lock:
+            result = self._cache.get((version, node))
+            if result is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end((version, node))
+            self.hits += 1
+            return result
+
+    def _store(self, version: Hashable, node: Node, result: np.ndarray):
+        if version is None or result.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            key = (version, node)
+            if key in self._cache:
+                return
+            self._cache[key] = result
+            self.current_bytes += result.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "extensions": self.extensions,
+            }
+
+
+class IndicatorState:
+    """Indicator values for a growing frame, advanced as new rows arrive.
+
+    Only the trailing rows each node's consumers look back over (and each
+    EMA's last value) are retained, so an update costs time in proportion to
+    the new rows and the windows, not the history.
+    """
+
+    def __init__(self, df: pd.DataFrame, specs: List[Tuple[str, Dict]], engine: IndicatorEngine = None,
+                 version: Hashable = None):
+        self.columns = IndicatorEngine.plan(specs)
+        self.rows = len(df)
+        # Rows of each node's output to keep
+        self.keep: Dict[Node, int] = {}
+        for node in self.columns.values():
+            self._plan_keep(node)
+        memo: Dict[Node, np.ndarray] = {}
+        engine = engine or IndicatorEngine(max_bytes=0)
+        # Every retained node, not just outputs: a cached output skips its inputs
+        for node in self.keep:
+            engine._evaluate(node, df, version, memo)
+        self.tails = {node: self._trim(memo[node], keep) for node, keep in self.keep.items()}
+        # Per EMA: its input's NaN rows since the last observation
+        self.gaps = {node: self._gap(memo[node[1]], 0) for node in self.keep if node[0] == "ema"}
+
+    @staticmethod
+    def _gap(values: np.ndarray, before: int) -> int:
+        """Trailing NaN rows of ``values``, which follow ``before`` trailing NaN rows."""
+        observed = np.flatnonzero(~np.isnan(values))
+        return before + len(values) if not len(observed) else len(values) - 1 - int(observed[-1])
+
+    def _plan_keep(self, node: Node):
+        self.keep.setdefault(node, 0)
+        if node[0] == "column":
+            return
+        lookback = LOOKBACK[node[0]](node) if node[0] in LOOKBACK else 0
+        if node[0] == "ema":
+            # Its own last value seeds the next run (gaps tracks the input's NaN run)
+            self.keep[node] = max(self.keep[node], 1)
+            lookback = 0
+        for arg in node[1:]:
+            if isinstance(arg, tuple):
+                self._plan_keep(arg)
+                self.keep[arg] = max(self.keep[arg], lookback)
+
+    @staticmethod
+    def _trim(values: np.ndarray, keep: int) -> np.ndarray:
+        return values[max(len(values) - keep, 0):].copy()
+
+    def update(self, rows: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Indicator values of ``rows``, appended after the rows seen so far."""
+        memo: Dict[Node, np.ndarray] = {}
+        out = {column: self._advance(node, rows, memo) for column, node in self.columns.items()}
+        for node, gap in self.gaps.items():
+            self.gaps[node] = self._gap(memo[node[1]], gap)
+        for node, keep in self.keep.items():
+            self.tails[node] = self._trim(np.concatenate((self.tails[node], memo[node])), keep)
+        self.rows += len(rows)
+        return out
+
+    def _advance(self, node: Node, rows: pd.DataFrame, memo: Dict[Node, np.ndarray]) -> np.ndarray:
+        if node in memo:
+            return memo[node]
+        if node[0] == "column":
+            result = rows[node[1]].to_numpy(dtype=np.float64)
+        elif node[0] == "ema":
+            values = self._advance(node[1], rows, memo)
+            previous, gap = self.tails[node], self.gaps[node]
+            if not len(previous) or np.isnan(previous[-1]):
+                # No value yet: nothing before these rows counts
+                result = kernels.ewm_mean(values, *node[2:])
+            else:
+                # Continue from the last observation, across the NaN rows since
+                result = kernels.ewm_mean(np.concatenate((np.full(gap, np.nan), values)), *node[2:],
+                                          seed=previous[-1])[gap:]
+        else:
+            lookback = LOOKBACK[node[0]](node) if node[0] in LOOKBACK else 0
+            args = []
+            start = 0
+            for arg in node[1:]:
+                if isinstance(arg, tuple):
+                    history = self.tails[arg][max(len(self.tails[arg]) - lookback, 0):]
+                    start = len(history)
+                    arg = np.concatenate((history, self._advance(arg, rows, memo)))
+                args.append(arg)
+            result = NODE_FUNCS[node[0]](*args)[start:]
+        memo[node] = result
+        return result
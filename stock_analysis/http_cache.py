@@ -0,0 +1,134 @@
+"""ETags and a compressed response cache.
+
+An ETag is a hash of everything a response depends on: the data file version
+(path and signature), the normalized query and the user. It is the same in
+every worker and across restarts, so a client's ``If-None-Match`` can be
+answered with a 304 before anything is loaded or computed.
+
+ResponseCache keeps the gzip-compressed body under its ETag. A repeat
+request is served straight from it; clients that don't accept gzip get it
+decompressed, which is still much cheaper than recomputing and serializing.
+"""
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional
+
+GZIP_LEVEL = 1
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag for ``parts`` (anything JSON-serializable; other values by ``str``).
+
+    Weak because the same entity is sent gzip-compressed or not.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return f'W/"{hashlib.sha1(payload.encode("utf-8")).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Gzip-compressed response bodies per ETag, LRU-bounded by compressed bytes."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # A single body may take at most this share of the cache
+        self.max_entry_bytes = max_bytes // 4
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return body
+
+    def put(self, etag: str, body: bytes):
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if etag in self._entries:
+                return
+            self._entries[etag] = body
+            self.current_bytes += len(body)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def tee(self, etag: str, chunks: Iterable, compressed: bool) -> Iterator[bytes]:
+        """Pass ``chunks`` through (gzip-compressed if ``compressed``) and store the compressed body.
+
+        The body is stored only if the stream runs to the end within the
+        per-entry limit, so a disconnected client leaves nothing half-written.
+        """
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        parts = []
+        size = 0
+        storing = True
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            if not (compressed or storing):
+                yield data
+                continue
+            packed = compressor.compress(data)
+            if storing:
+                size += len(packed)
+                if size > self.max_entry_bytes:
+                    # Too big to keep; identity responses also stop compressing
+                    storing = False
+                    parts = []
+                else:
+                    parts.append(packed)
+            if not compressed:
+                yield data
+            elif packed:
+                yield packed
+        if compressed or storing:
+            tail = compressor.flush()
+            if compressed:
+                yield tail
+            # zlib holds back most of its output until the flush, so check again
+            if storing and size + len(tail) <= self.max_entry_bytes:
+                parts.append(tail)
+                self.put(etag, b"".join(parts))
+
+    @staticmethod
+    def decompress(body: bytes) -> bytes:
+        return zlib.decompress(body, 31)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
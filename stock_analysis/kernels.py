@@ -0,0 +1,363 @@
+"""NumPy kernels behind the technical indicators.
+
+All kernels take and return contiguous float64 arrays and follow the pandas
+semantics the indicators were originally written against: ``rolling(window)``
+with ``min_periods=window`` (any NaN in the window gives NaN), sample standard
+deviation (ddof=1) and ``ewm(span, adjust=False)``. Rolling kernels accept 2-D
+input and work down axis 0.
+"""
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba is optional; the NumPy paths are used without it
+    numba = None
+
+# Window sums come from cumulative sums that restart every block and are taken
+# relative to each block's mean, so rounding error depends on the block and
+# its local spread rather than on the length and level of the whole series.
+MIN_BLOCK = 512
+
+
+def as_float_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _check_window(window: int):
+    if window < 1:
+        raise ValueError("window must be >= 1")
+
+
+def _window_counts(flags: np.ndarray, window: int) -> np.ndarray:
+    counts = np.cumsum(flags, axis=0, dtype=np.int32 if flags.shape[0] < 2 ** 31 else np.int64)
+    out = counts[window - 1:]
+    out[1:] -= counts[:-window]
+    return out
+
+
+def _window_sums(x: np.ndarray, window: int, missing, with_squares: bool):
+    """Rolling sums of ``x - origin`` (and their squares) for windows ending at i.
+
+    Returns the sums as arrays over the padded, blocked row range, the per-block
+    origins and the block length. Each window's sums are relative to the origin
+    of the block its last row falls in; entries before window - 1 and windows
+    containing NaN are left for the caller to mask.
+    """
+    n = x.shape[0]
+    trailing = x.shape[1:]
+    block = max(8 * window, MIN_BLOCK)
+    nblocks = -(-n // block)
+    padded_shape = (nblocks * block,) + trailing
+    blocked_shape = (nblocks, block) + trailing
+
+    y = np.empty(padded_shape)
+    y[:n] = x
+    if missing is not None:
+        y[:n][missing] = 0.0
+    # Padding repeats the last row; it only feeds the last block's origin
+    y[n:] = y[n - 1]
+    blocks = y.reshape(blocked_shape)
+    origin = blocks.mean(axis=1)
+    origin[~np.isfinite(origin)] = 0.0
+    blocks -= origin[:, None]
+    if missing is not None:
+        y[:n][missing] = 0.0
+
+    # Squares first: the plain cumulative sum then overwrites ``blocks`` in place
+    prefixes = []
+    if with_squares:
+        prefixes.append(np.cumsum(np.square(blocks), axis=1).reshape(padded_shape))
+    prefixes.insert(0, np.cumsum(blocks, axis=1, out=blocks).reshape(padded_shape))
+
+    # Window (s, e] relative to e's block: windows that start in an earlier
+    # block (or right on a boundary) need the rest of that block added and
+    # moved onto e's origin
+    offsets = np.concatenate(([0], np.arange(block - window + 1, block)))
+    starts = (np.arange(nblocks)[:, None] * block + offsets).ravel()
+    prev = starts[(starts >= 1) & (starts <= n - window)] - 1
+    ends = prev + window
+    tail_block, head_block = prev // block, ends // block
+    tail_len = (head_block * block - prev - 1).reshape((-1,) + (1,) * len(trailing))
+    shift = origin[tail_block] - origin[head_block]
+    totals = [p[tail_block * block + block - 1] for p in prefixes]
+
+    sums = []
+    for i, p in enumerate(prefixes):
+        window_sum = np.empty(padded_shape)
+        window_sum[:window - 1] = 0.0
+        window_sum[n:] = 0.0
+        window_sum[window - 1] = p[window - 1]
+        np.subtract(p[window:n], p[:n - window], out=window_sum[window:n])
+        # The plain difference subtracted p[prev], which belongs to the tail block
+        if i == 0:
+            window_sum[ends] += totals[0] + tail_len * shift
+        else:
+            tail = totals[0] - prefixes[0][prev]
+            window_sum[ends] += totals[1] + 2 * shift * tail + tail_len * shift * shift
+        sums.append(window_sum)
+    return sums, origin, block
+
+
+def _add_block_origin(values: np.ndarray, origin: np.ndarray, block: int):
+    values.reshape((origin.shape[0], block) + origin.shape[1:])[...] += origin[:, None]
+
+
+def _constant_windows(x: np.ndarray, window: int):
+    """Mask of windows (ending at window - 1 onwards) whose values are all equal, or None."""
+    if window == 1:
+        return np.ones(x.shape, dtype=bool)
+    changed = np.not_equal(x[1:], x[:-1])
+    if changed.all():
+        return None
+    # Only the last window - 1 entries need to match their predecessor
+    return _window_counts(~changed, window - 1) == window - 1
+
+
+def _nan_mask(x: np.ndarray):
+    missing = np.isnan(x)
+    return missing if missing.any() else None
+
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    _check_window(window)
+    x = as_float_array(values)
+    n = x.shape[0]
+    if n < window:
+        return np.full(x.shape, np.nan)
+    missing = _nan_mask(x)
+    (sums,), origin, block = _window_sums(x, window, missing, with_squares=False)
+    sums /= window
+    _add_block_origin(sums, origin, block)
+    mean = sums[:n]
+    # Windows of identical values get the value itself rather than a rounded sum
+    constant = _constant_windows(x, window)
+    if constant is not None:
+        np.copyto(mean[window - 1:], x[window - 1:], where=constant)
+    if missing is not None:
+        np.copyto(mean[window - 1:], np.nan, where=_window_counts(missing, window) > 0)
+    mean[:window - 1] = np.nan
+    return mean
+
+
+def rolling_var(values, window: int, ddof: int = 1) -> np.ndarray:
+    _check_window(window)
+    x = as_float_array(values)
+    n = x.shape[0]
+    if n < window or window - ddof <= 0:
+        return np.full(x.shape, np.nan)
+    missing = _nan_mask(x)
+    (s1, s2), _, _ = _window_sums(x, window, missing, with_squares=True)
+    s1 *= s1
+    s1 /= window
+    np.subtract(s2, s1, out=s2)
+    s2 /= window - ddof
+    var = np.maximum(s2[:n], 0.0, out=s2[:n])
+    constant = _constant_windows(x, window)
+    if constant is not None:
+        np.copyto(var[window - 1:], 0.0, where=constant)
+    if missing is not None:
+        np.copyto(var[window - 1:], np.nan, where=_window_counts(missing, window) > 0)
+    var[:window - 1] = np.nan
+    return var
+
+
+def rolling_std(values, window: int, ddof: int = 1) -> np.ndarray:
+    return np.sqrt(rolling_var(values, window, ddof))
+
+
+def _window_sums_many(x: np.ndarray, windows: np.ndarray, with_squares: bool):
+    """Sums of ``x - origin`` over every window ending at each row, one column per window."""
+    n = x.shape[0]
+    origin = x.mean() if n else 0.0
+    centered = x - origin
+    prefixes = [np.concatenate(([0.0], np.cumsum(centered)))]
+    if with_squares:
+        prefixes.append(np.concatenate(([0.0], np.cumsum(np.square(centered)))))
+    ends = np.arange(1, n + 1)[:, None]
+    starts = ends - windows[None, :]
+    valid = starts >= 0
+    starts = np.maximum(starts, 0)
+    sums = [p[ends] - p[starts] for p in prefixes]
+    return sums, origin, valid
+
+
+def rolling_mean_many(values, windows) -> np.ndarray:
+    """``rolling_mean`` for several windows at once: column j uses ``windows[j]``.
+
+    Built from a single cumulative sum, so ``values`` must be NaN-free 1-D data.
+    """
+    x = as_float_array(values)
+    windows = np.asarray(windows, dtype=np.int64)
+    if np.any(windows < 1):
+        raise ValueError("window must be >= 1")
+    (sums,), origin, valid = _window_sums_many(x, windows, with_squares=False)
+    mean = sums / windows + origin
+    mean[~valid] = np.nan
+    return mean
+
+
+def rolling_std_many(values, windows, ddof: int = 1) -> np.ndarray:
+    """``rolling_std`` for several windows at once; see ``rolling_mean_many``."""
+    x = as_float_array(values)
+    windows = np.asarray(windows, dtype=np.int64)
+    if np.any(windows < 1):
+        raise ValueError("window must be >= 1")
+    (s1, s2), _, valid = _window_sums_many(x, windows, with_squares=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (s2 - s1 * s1 / windows) / (windows - ddof)
+    np.maximum(var, 0.0, out=var)
+    var[~valid | (windows - ddof <= 0)[None, :]] = np.nan
+    return np.sqrt(var, out=var)
+
+
+def _ewm_loop(x: np.ndarray, alpha: float, out: np.ndarray):
+    # pandas' ewm(adjust=False, ignore_na=False) recurrence: across a NaN gap
+    # the old value's weight keeps decaying while the new one's stays alpha,
+    # except at com == 1 (alpha 0.5), where pandas gives the new value what
+    # the old one lost (its irregular-interval rule)
+    beta = 1.0 - alpha
+    renormalize = alpha == 0.5
+    weighted = x[0]
+    old_wt = 1.0
+    new_wt = alpha
+    out[0] = weighted
+    for i in range(1, x.shape[0]):
+        cur = x[i]
+        if weighted == weighted:
+            old_wt *= beta
+            if renormalize:
+                new_wt = 1.0 - old_wt
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+
+
+if numba is not None:
+    _ewm_loop = numba.njit(cache=True, nogil=True)(_ewm_loop)
+
+
+def _ewm_scan(x: np.ndarray, alpha, seed) -> np.ndarray:
+    """Vectorised ``y[t] = (1 - alpha) * y[t-1] + alpha * x[t]`` for NaN-free ``x``.
+
+    Within a block, y is beta**t times a cumulative sum of x * beta**-k, so
+    blocks are sized to keep beta**-k finite. ``alpha`` may be an array that
+    broadcasts against the trailing axes of ``x``.
+    """
+    alpha = np.asarray(alpha, dtype=np.float64)
+    beta = np.maximum(1.0 - alpha, 1e-300)
+    block = int(min(max(500.0 / -np.log(np.min(beta)), 1), 1 << 16)) if np.max(beta) < 1 else 1 << 16
+    steps = np.arange(block, dtype=np.float64).reshape((-1,) + (1,) * (x.ndim - 1))
+    grow = beta ** -steps
+    shrink = beta ** steps
+    out = np.empty(x.shape)
+    prev = seed
+    for start in range(0, x.shape[0], block):
+        m = min(block, x.shape[0] - start)
+        chunk = out[start:start + m]
+        np.multiply(x[start:start + m], grow[:m], out=chunk)
+        np.cumsum(chunk, axis=0, out=chunk)
+        chunk *= alpha
+        chunk += beta * prev
+        chunk *= shrink[:m]
+        prev = chunk[-1]
+    return out
+
+
+def ewm_mean(values, span: float = None, alpha: float = None, seed=None) -> np.ndarray:
+    """``ewm(span, adjust=False).mean()``.
+
+    ``seed`` continues an earlier run: it is the smoothed value just before
+    ``values[0]``. 2-D input may use one alpha per column and may only contain
+    NaN before each column's first value.
+    """
+    x = as_float_array(values)
+    if alpha is None:
+        if span is None or np.any(np.asarray(span) < 1):
+            raise ValueError("span must be >= 1")
+        alpha = 2.0 / (np.asarray(span, dtype=np.float64) + 1.0)
+    if seed is not None:
+        x = np.concatenate((np.reshape(as_float_array(seed), (1,) + x.shape[1:]), x))
+        return ewm_mean(x, alpha=alpha)[1:]
+
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] == 0:
+        return out
+    if x.ndim > 1:
+        missing = np.isnan(x)
+        leading = None
+        if missing.any():
+            # Columns may start late (leading NaN): backfill with their first
+            # value, which the recurrence then just carries, and blank it again
+            has_value = ~missing.all(axis=0)
+            first = np.where(has_value, np.argmax(~missing, axis=0), x.shape[0])
+            leading = np.arange(x.shape[0]).reshape((-1,) + (1,) * (x.ndim - 1)) < first
+            if (missing & ~leading).any():
+                raise ValueError("2-D ewm_mean allows NaN only before each column's first value")
+            first_values = np.take_along_axis(x, np.minimum(first, x.shape[0] - 1)[None], axis=0)
+            x = np.where(leading, first_values, x)
+        out[0] = x[0]
+        out[1:] = _ewm_scan(x[1:], alpha, x[0])
+        if leading is not None:
+            out[leading] = np.nan
+        return out
+
+    valid = np.flatnonzero(~np.isnan(x))
+    if valid.size == 0:
+        return out
+    first = valid[0]
+    if numba is not None or np.isnan(x[first:]).any():
+        _ewm_loop(x[first:], float(alpha), out[first:])
+    else:
+        out[first] = x[first]
+        out[first + 1:] = _ewm_scan(x[first + 1:], alpha, x[first])
+    return out
+
+
+def diff(values) -> np.ndarray:
+    x = as_float_array(values)
+    out = np.empty(x.shape)
+    out[:1] = np.nan
+    np.subtract(x[1:], x[:-1], out=out[1:])
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high = as_float_array(high)
+    low = as_float_array(low)
+    prev_close = np.empty(high.shape)
+    prev_close[:1] = np.nan
+    prev_close[1:] = as_float_array(close)[:-1]
+    # fmax skips NaN like DataFrame.max(axis=1) does
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+def gains(delta: np.ndarray) -> np.ndarray:
+    # fmax maps the leading NaN to 0 like Series.where(delta > 0, 0) does
+    return np.fmax(delta, 0.0)
+
+
+def losses(delta: np.ndarray) -> np.ndarray:
+    return np.fmax(np.negative(delta), 0.0)
+
+
+def rsi_from_averages(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.divide(avg_gain, avg_loss)
+    rs += 1
+    np.divide(100, rs, out=rs)
+    return np.subtract(100, rs, out=rs)
+
+
+def rsi_many(values, windows) -> np.ndarray:
+    """``rsi`` for several windows at once; see ``rolling_mean_many``."""
+    delta = diff(values)
+    return rsi_from_averages(rolling_mean_many(gains(delta), windows), rolling_mean_many(losses(delta), windows))
+
+
+def rsi(values, window: int) -> np.ndarray:
+    delta = diff(values)
+    return rsi_from_averages(rolling_mean(gains(delta), window), rolling_mean(losses(delta), window))
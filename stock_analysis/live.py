@@ -0,0 +1,362 @@
+"""Live indicator updates pushed to subscribers.
+
+A client subscribes to a ticker with an indicator parameter set. Every
+(ticker file, parameter set) pair is a channel with one IndicatorState, so
+however many clients watch it, new rows are computed and serialized once;
+each subscriber only prefixes its subscription id.
+
+LiveFeed polls the watched tickers every ``interval`` seconds, and at once
+when notify() is called (after an append or upload). When a ticker's file
+changed by appending rows, only those rows are sent, with their indicator
+values, shaped like /api/analyze rows. Appending to a public ticker gives the
+user their own copy; their subscriptions follow it to the new file. Any other
+change (rows replaced or removed, a new upload) sends ``reset`` instead and
+the client reloads the history.
+
+Every connection has a bounded queue. A client that falls behind has its
+backlog dropped and gets one ``reset`` without an id, meaning all of its
+subscriptions, so one slow socket never holds up the others.
+
+A channel that fails to update starts over from its file with a ``reset``;
+if that fails too, its subscriptions end with an ``error``. Either way the
+error is logged and kept in ``errors``, and polling goes on.
+"""
+import asyncio
+import copy
+import itertools
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .analysis import date_column
+from .data_loader import DataLoader
+from .engine import IndicatorEngine, IndicatorState
+from .precompute import spec_key
+
+Version = Tuple[str, Tuple[int, int]]
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One connection: its outgoing messages and subscriptions (id -> channel)."""
+
+    def __init__(self, username: str, queue_size: int = 256):
+        self.username = username
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(queue_size)
+        self.subscriptions: Dict[int, "Channel"] = {}
+        self.dropped = 0
+        self._ids = itertools.count(1)
+
+    def send(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Lagging: what's queued is stale anyway, start over from a reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.dropped += 1
+            # No id: every subscription
+            self.queue.put_nowait('{"id": null, "type": "reset"}')
+
+
+Recipient = Tuple[Subscriber, int]
+
+
+def with_id(sub_id: int, body: str) -> str:
+    return f'{{"id": {sub_id}, {body}'
+
+
+def reset_body(stock: str) -> str:
+    return f'"type": "reset", "stock": {json.dumps(stock)}}}'
+
+
+def error_body(detail: str) -> str:
+    return f'"type": "error", "detail": {json.dumps(detail)}}}'
+
+
+def bars_body(stock: str, rows: pd.DataFrame, values: Dict[str, np.ndarray]) -> str:
+    frame = rows.assign(**values).replace([np.inf, -np.inf], np.nan)
+    date_col = date_column(frame)
+    if date_col:
+        frame = frame.assign(**{date_col: frame[date_col].dt.strftime('%Y-%m-%d')}) \
+            .rename(columns={date_col: "Date"})
+    return f'"type": "bars", "stock": {json.dumps(stock)}, "data": {frame.to_json(orient="records")}}}'
+
+
+class Channel:
+    """Subscriptions to one ticker file and parameter set, and its running indicator state."""
+
+    def __init__(self, key: Tuple, stock: str, specs: List[Tuple[str, Dict]], version: Version,
+                 df: Optional[pd.DataFrame], engine: IndicatorEngine = None):
+        self.key = key
+        self.stock = stock
+        self.specs = specs
+        self.subscribers: Set[Recipient] = set()
+        if df is not None:
+            self.reset(version, df, engine)
+
+    def reset(self, version: Version, df: pd.DataFrame, engine: IndicatorEngine = None):
+        self.version = version
+        self.base = [str(c) for c in df.columns]
+        self.state = IndicatorState(df, self.specs, engine, (version, None, None))
+        self.last_row = df.iloc[-1:].reset_index(drop=True)
+
+    def fork(self, key: Tuple) -> "Channel":
+        """A channel for another file that starts where this one is."""
+        channel = Channel(key, self.stock, self.specs, self.version, None)
+        channel.version, channel.base, channel.last_row = self.version, self.base, self.last_row
+        channel.state = copy.deepcopy(self.state)
+        return channel
+
+    def last_date(self) -> Optional[str]:
+        """Date of the last row covered, formatted like the rows sent."""
+        date_col = date_column(self.last_row)
+        if date_col is None or self.last_row.empty:
+            return None
+        return self.last_row[date_col].dt.strftime('%Y-%m-%d').iloc[0]
+
+    def advance(self, version: Version, df: pd.DataFrame, appended: Optional[int],
+                engine: IndicatorEngine = None) -> str:
+        """The message body for the change from the current version to ``version`` (``df``)."""
+        rows = self.state.rows
+        if appended is None and len(df) > rows and [str(c) for c in df.columns] == self.base \
+                and df.iloc[rows - 1:rows].reset_index(drop=True).equals(self.last_row):
+            # Not recorded as an append, but it looks like one: same last known row
+            appended = len(df) - rows
+        values = None
+        if appended and len(df) - appended == rows:
+            new_rows = df.iloc[rows:]
+            values = self.state.update(new_rows)
+        if values is None:
+            self.reset(version, df, engine)
+            return reset_body(self.stock)
+        self.version = version
+        self.last_row = df.iloc[-1:].reset_index(drop=True)
+        return bars_body(self.stock, new_rows, values)
+
+
+class LiveFeed:
+    def __init__(self, loader: DataLoader, engine: IndicatorEngine = None, interval: float = 1.0):
+        self.loader = loader
+        self.engine = engine
+        self.interval = interval
+        self.updates = 0
+        self.messages = 0
+        # ticker (or "poll") -> last error updating it
+        self.errors: Dict[str, str] = {}
+        # (file path, spec keys) -> channel
+        self._channels: Dict[Tuple[str, Tuple[str, ...]], Channel] = {}
+        # Guards the channel table and channels' subscribers; polling runs on a worker thread
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _channel(self, username: str, stock: str, specs: List[Tuple[str, Dict]]) -> Channel:
+        version = self.loader.resolve(stock, username)
+        keys = tuple(spec_key(name, params) for name, params in specs)
+        with self._lock:
+            channel = self._channels.get((version[0], keys))
+        if channel is not None:
+            return channel
+        df, version = self.loader.load_versioned(stock, username)
+        # Loading may have converted a CSV, so key by the file actually loaded
+        channel = Channel((version[0], keys), stock, specs, version, df, self.engine)
+        with self._lock:
+            return self._channels.setdefault(channel.key, channel)
+
+    async def subscribe(self, subscriber: Subscriber, stock: str,
+                        specs: List[Tuple[str, Dict]]) -> Tuple[int, Channel]:
+        """Subscribe to ``stock`` with ``specs``; returns the subscription id. ValueError if there's no such ticker."""
+        channel = await asyncio.to_thread(self._channel, subscriber.username, stock, specs)
+        sub_id = next(subscriber._ids)
+        with self._lock:
+            # It may have lost its last subscriber (and its place) in the meantime
+            channel = self._channels.setdefault(channel.key, channel)
+            channel.subscribers.add((subscriber, sub_id))
+        subscriber.subscriptions[sub_id] = channel
+        return sub_id, channel
+
+    def unsubscribe(self, subscriber: Subscriber, sub_id: int = None):
+        """End one of ``subscriber``'s subscriptions, or all of them."""
+        ids = [sub_id] if sub_id is not None else list(subscriber.subscriptions)
+        with self._lock:
+            for sub_id in ids:
+                channel = subscriber.subscriptions.pop(sub_id, None)
+                if channel is not None:
+                    channel.subscribers.discard((subscriber, sub_id))
+
+    def _move(self, channel: Channel, version: Version, username: str) -> Tuple[Channel, str]:
+        """The channel for ``channel``'s ticker and specs in another file, and the message to move with."""
+        key = (version[0], channel.key[1])
+        with self._lock:
+            target = self._channels.get(key)
+        if target is not None:
+            return target, reset_body(channel.stock)
+        df, version = self.loader.load_versioned(channel.stock, username)
+        lineage = self.loader.parent_version(version)
+        target = channel.fork((version[0], key[1]))
+        # A user's copy of a public ticker with rows appended continues from it
+        body = target.advance(version, df, lineage[1] if lineage and lineage[0] == channel.version else None,
+                              self.engine)
+        with self._lock:
+            existing = self._channels.setdefault(target.key, target)
+        return existing, body if existing is target else reset_body(channel.stock)
+
+    def poll(self) -> Tuple[List[Tuple[Recipient, Optional[Channel]]], List[Tuple[List[Recipient], str]]]:
+        """Advance every channel whose ticker changed.
+
+        Returns the subscriptions that moved to another channel (None: the
+        ticker is gone) and the messages to send, as (recipients, body).
+        """
+        with self._lock:
+            channels = [(c, list(c.subscribers)) for c in self._channels.values()]
+        moves, messages = [], []
+        resolved: Dict[Tuple[str, str], Optional[Version]] = {}
+        for channel, recipients in channels:
+            groups: Dict[Optional[Version], List[Recipient]] = {}
+            for recipient in recipients:
+                key = (channel.stock, recipient[0].username)
+                if key not in resolved:
+                    try:
+                        resolved[key] = self.loader.resolve(*key)
+                    except ValueError:
+                        resolved[key] = None
+                    except Exception as e:
+                        # Can't tell now (e.g. a file system error); try again next poll
+                        self._failed(channel.stock, e)
+                        resolved[key] = channel.version
+                groups.setdefault(resolved[key], []).append(recipient)
+            for version, group in groups.items():
+                try:
+                    moved, target, body = self._update(channel, version, group)
+                except Exception as e:
+                    # One bad file or state must not stop the others (or the feed)
+                    self._failed(channel.stock, e)
+                    moved, target, body = self._recover(channel, group)
+                if body is None:
+                    continue
+                if moved:
+                    with self._lock:
+                        channel.subscribers.difference_update(group)
+                        if target is not None:
+                            target.subscribers.update(group)
+                    moves.extend((recipient, target) for recipient in group)
+                messages.append((group, body))
+        with self._lock:
+            for key in [k for k, c in self._channels.items() if not c.subscribers]:
+                del self._channels[key]
+        return moves, messages
+
+    def _update(self, channel: Channel, version: Optional[Version],
+                group: List[Recipient]) -> Tuple[bool, Optional[Channel], Optional[str]]:
+        """What ``group``, whose users now resolve the ticker to ``version``, gets from ``channel``.
+
+        Returns whether they move to another channel, that channel (None: the
+        ticker is gone) and the message body (None: nothing changed).
+        """
+        if version is not None and version[0] == channel.version[0]:
+            if version == channel.version:
+                return False, channel, None
+            df, loaded = self.loader.load_versioned(channel.stock, group[0][0].username)
+            if loaded[0] != channel.version[0]:
+                return False, channel, None
+            lineage = self.loader.parent_version(loaded)
+            appended = lineage[1] if lineage and lineage[0] == channel.version else None
+            body = channel.advance(loaded, df, appended, self.engine)
+            self.updates += 1
+            self.errors.pop(channel.stock, None)
+            return False, channel, body
+        if version is None:
+            return True, None, error_body(f"Stock {channel.stock} not found.")
+        target, body = self._move(channel, version, group[0][0].username)
+        return True, target, body
+
+    def _recover(self, channel: Channel, group: List[Recipient]) -> Tuple[bool, Optional[Channel], str]:
+        """After a failed update: start ``channel`` over from the file, or end ``group``'s subscriptions."""
+        try:
+            df, version = self.loader.load_versioned(channel.stock, group[0][0].username)
+            if version[0] == channel.version[0]:
+                channel.reset(version, df, self.engine)
+                return False, channel, reset_body(channel.stock)
+        except Exception as e:
+            self._failed(channel.stock, e)
+        return True, None, error_body(f"Live updates for {channel.stock} failed: {self.errors.get(channel.stock)}")
+
+    def _failed(self, stock: str, error: Exception):
+        self.errors[stock] = str(error) or type(error).__name__
+        logger.warning("Live update of %s failed", stock, exc_info=error)
+
+    def deliver(self, moves: List[Tuple[Recipient, Optional[Channel]]], messages: List[Tuple[List[Recipient], str]]):
+        """Apply ``poll``'s results on the event loop, which owns the subscribers."""
+        for (subscriber, sub_id), target in moves:
+            if sub_id not in subscriber.subscriptions:
+                # Unsubscribed while the poll ran
+                if target is not None:
+                    with self._lock:
+                        target.subscribers.discard((subscriber, sub_id))
+            elif target is None:
+                del subscriber.subscriptions[sub_id]
+            else:
+                subscriber.subscriptions[sub_id] = target
+        for recipients, body in messages:
+            for subscriber, sub_id in recipients:
+                subscriber.send(with_id(sub_id, body))
+            self.messages += len(recipients)
+
+    def notify(self):
+        """Poll now rather than at the next interval; safe from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # The loop closed since stop(); nothing is polling
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._channels:
+                try:
+                    self.deliver(*await asyncio.to_thread(self.poll))
+                except Exception as e:
+                    # Whatever went wrong, keep polling
+                    self.errors["poll"] = str(e) or type(e).__name__
+                    logger.warning("Live feed poll failed", exc_info=e)
+
+    def start(self):
+        """Start polling on the running event loop."""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = self._wake = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "channels": len(self._channels),
+                "subscriptions": sum(len(c.subscribers) for c in self._channels.values()),
+                "updates": self.updates,
+                "messages": self.messages,
+                "errors": dict(self.errors),
+            }
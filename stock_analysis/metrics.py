@@ -0,0 +1,198 @@
+"""Per-request stage timings and Prometheus-style metrics.
+
+Code marks its stages with ``with stage("parse_csv") as s: ...`` (setting
+``s.nbytes`` when the stage moves a known number of bytes). Inside a
+request (see ``RequestTimings.start``) each stage's wall time and byte count is
+recorded for the ``Server-Timing`` header and fed into the process-wide
+histograms served at ``/metrics``; outside a request ``stage`` does nothing.
+"""
+import contextvars
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Histograms and counters rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, Dict[Labels, List]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = labels + extra
+        if not pairs:
+            return ""
+        escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, (counts, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(self.buckets + (float("inf"),), counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{self._format_labels(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total!r}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{self._format_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("http_request_duration_seconds", "Request latency by endpoint, up to the response headers.")
+REGISTRY.describe("stage_duration_seconds", "Wall time of each request stage.")
+REGISTRY.describe("indicator_duration_seconds", "Wall time computing each indicator family.")
+REGISTRY.describe("stage_bytes_total", "Bytes read or produced by each request stage.")
+
+
+class RequestTimings:
+    """Stages recorded during one request, in the order they finished."""
+
+    def __init__(self, profile: bool = False):
+        self.stages: List[Tuple[str, float, Optional[int]]] = []
+        self.profile = profile
+        self.profile_stats: Optional[pstats.Stats] = None
+
+    @classmethod
+    def start(cls, profile: bool = False) -> Tuple["RequestTimings", contextvars.Token]:
+        timings = cls(profile)
+        return timings, _current.set(timings)
+
+    @staticmethod
+    def finish(token: contextvars.Token):
+        _current.reset(token)
+
+    def record(self, name: str, seconds: float, nbytes: Optional[int] = None):
+        self.stages.append((name, seconds, nbytes))
+        if name.startswith("indicator."):
+            REGISTRY.observe("indicator_duration_seconds", seconds, indicator=name[len("indicator."):])
+        else:
+            REGISTRY.observe("stage_duration_seconds", seconds, stage=name)
+        if nbytes is not None:
+            REGISTRY.inc("stage_bytes_total", nbytes, stage=name)
+
+    def totals(self) -> Dict[str, Tuple[float, Optional[int]]]:
+        """Seconds and bytes per stage name, summed over repeats."""
+        out: Dict[str, Tuple[float, Optional[int]]] = {}
+        for name, seconds, nbytes in self.stages:
+            prev_seconds, prev_bytes = out.get(name, (0.0, None))
+            if nbytes is not None:
+                prev_bytes = (prev_bytes or 0) + nbytes
+            out[name] = (prev_seconds + seconds, prev_bytes)
+        return out
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, (seconds, nbytes) in self.totals().items():
+            part = f"{name};dur={seconds * 1e3:.3f}"
+            if nbytes is not None:
+                part += f';desc="{nbytes} bytes"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def profile_report(self, limit: int = 40) -> Optional[str]:
+        if self.profile_stats is None:
+            return None
+        out = io.StringIO()
+        self.profile_stats.stream = out
+        self.profile_stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def profiling() -> bool:
+    """Whether the current request asked for a cProfile breakdown."""
+    timings = _current.get()
+    return timings is not None and timings.profile
+
+
+class Stage:
+    __slots__ = ("nbytes",)
+
+    def __init__(self, nbytes: Optional[int] = None):
+        self.nbytes = nbytes
+
+
+@contextmanager
+def stage(name: str, nbytes: Optional[int] = None):
+    timings = _current.get()
+    current_stage = Stage(nbytes)
+    if timings is None:
+        yield current_stage
+        return
+    start = time.perf_counter()
+    try:
+        yield current_stage
+    finally:
+        timings.record(name, time.perf_counter() - start, current_stage.nbytes)
+
+
+def profiled(func: Callable) -> Callable:
+    """Run a (sync) endpoint under cProfile when the request asked for it.
+
+    Sync endpoints run on a worker thread, which a profiler started by the
+    middleware would not see, so profiling happens around the call itself.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is None or not timings.profile:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            timings.profile_stats = pstats.Stats(profiler)
+    return wrapper
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 
 class Token(BaseModel):
     access_token: str
@@ -28,3 +28,97 @@ class ResetPasswordRequest(BaseModel):
     email: str
     code: str
     new_password: str
+
+class IndicatorParams(BaseModel):
+    ma_window: int = Field(30, ge=1, le=200)
+    rsi_window: int = Field(14, ge=1, le=100)
+    ema_span: int = Field(14, ge=1, le=200)
+    bb_window: int = Field(20, ge=1, le=200)
+    bb_std: float = Field(2.0, ge=0.1, le=10.0)
+    atr_window: int = Field(14, ge=1, le=100)
+    sma_window: int = Field(20, ge=1, le=200)
+    std_window: int = Field(20, ge=1, le=200)
+    macd_fast: int = Field(12, ge=1, le=100)
+    macd_slow: int = Field(26, ge=1, le=100)
+    macd_signal: int = Field(9, ge=1, le=100)
+
+class BatchAnalyzeRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # None means every ticker available to the user
+    params: IndicatorParams = IndicatorParams()
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+class AppendBarsRequest(BaseModel):
+    bars: List[Dict[str, Any]] = Field(..., min_length=1)
+
+class ParamRange(BaseModel):
+    """Either explicit ``values`` or an inclusive ``start``..``stop`` range."""
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: float = Field(1, gt=0)
+    values: Optional[List[float]] = None
+
+    def expand(self, limit: int) -> List[float]:
+        if self.values is not None:
+            values = self.values
+        elif self.start is None:
+            raise ValueError("A range needs values or a start")
+        elif self.stop is None:
+            values = [self.start]
+        else:
+            count = int((self.stop - self.start) / self.step + 1e-9) + 1
+            if count > limit:
+                raise ValueError(f"Range has {count} values (max {limit})")
+            values = [round(self.start + i * self.step, 10) for i in range(max(count, 0))]
+        if len(values) > limit:
+            raise ValueError(f"Range has {len(values)} values (max {limit})")
+        return values
+
+class SweepRequest(BaseModel):
+    stock: str
+    ma_window: Optional[ParamRange] = None
+    rsi_window: Optional[ParamRange] = None
+    bb_window: Optional[ParamRange] = None
+    bb_std: Optional[ParamRange] = None
+    macd_fast: Optional[ParamRange] = None
+    macd_slow: Optional[ParamRange] = None
+    macd_signal: Optional[ParamRange] = None
+    rsi_lower: float = Field(30.0, ge=0, le=100)
+    rsi_upper: float = Field(70.0, ge=0, le=100)
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+class BacktestRequest(BaseModel):
+    stock: str
+    strategy: str
+    params: Dict[str, float] = {}
+    fee_bps: float = Field(0.0, ge=0, le=1000)
+    slippage_bps: float = Field(0.0, ge=0, le=1000)
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    include_equity: bool = True
+
+class BatchBacktestRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # None means every ticker available to the user
+    strategy: str
+    params: Dict[str, float] = {}
+    fee_bps: float = Field(0.0, ge=0, le=1000)
+    slippage_bps: float = Field(0.0, ge=0, le=1000)
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+class ScreenFilter(BaseModel):
+    """``column op value``, or ``column op other`` to compare two columns."""
+    column: str
+    op: str = Field(..., pattern="^(<|<=|>|>=|==|!=)$")
+    value: Optional[float] = None
+    other: Optional[str] = None
+
+class ScreenerRequest(BaseModel):
+    filters: List[ScreenFilter] = Field(..., min_length=1)
+    tickers: Optional[List[str]] = None  # None means every ticker available to the user
+    columns: List[str] = []  # extra columns to report for each match
+    bb_std: float = Field(2.0, ge=0.1, le=10.0)
+    macd_fast: int = Field(12, ge=1, le=100)
+    macd_slow: int = Field(26, ge=1, le=100)
+    macd_signal: int = Field(9, ge=1, le=100)
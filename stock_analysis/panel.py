@@ -0,0 +1,406 @@
+"""Date-aligned price panels across all of a user's tickers.
+
+A panel keeps every ticker's bars as columns of 2-D float arrays, in two
+layouts:
+
+* aligned: rows are the union of all tickers' dates, NaN where a ticker has
+  no bar. Returns (each from the ticker's previous own bar) use it, so
+  correlations and betas compare the same days.
+* tail-aligned: each ticker's own bars, right-aligned so the last row holds
+  every ticker's latest bar and shorter histories are NaN-padded on top.
+  Screener indicators run on it with the IndicatorEngine's node graphs, so
+  they match the values /api/analyze returns.
+
+Layouts are built lazily per field. Panels are cached per user and rebuilt
+incrementally: only tickers whose file version changed are reloaded, and
+when the shape is unchanged only their columns are rewritten.
+"""
+import contextlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .analysis import date_column
+from .data_loader import DataLoader
+from .engine import INDICATORS, LOOKBACK, NODE_FUNCS, Node
+from .metrics import stage
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+# Column prefix -> (indicator family, its window parameter)
+_PREFIXES = {
+    "MA": ("ma", "window"),
+    "SMA": ("sma", "window"),
+    "STD": ("std", "window"),
+    "EMA": ("ema", "span"),
+    "RSI": ("rsi", "window"),
+    "ATR": ("atr", "window"),
+    "Upper_BB": ("bollinger", "window"),
+    "Lower_BB": ("bollinger", "window"),
+}
+_COLUMN = re.compile(r"^({})_(\d+)$".format("|".join(_PREFIXES)))
+
+
+def _series(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    date_col = date_column(df)
+    if date_col is None or "Close" not in df.columns:
+        raise ValueError("needs a date and a Close column")
+    out = {"dates": df[date_col].to_numpy(dtype="datetime64[ns]").view(np.int64)}
+    for field in FIELDS:
+        if field in df.columns:
+            out[field] = df[field].to_numpy(dtype=np.float64)
+    close = out["Close"]
+    returns = np.full(close.shape[0], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(close[1:], close[:-1], out=returns[1:])
+    out["Return"] = returns - 1.0
+    return out
+
+
+class Panel:
+    def __init__(self, tickers: List[str], versions: Dict[str, Tuple], series: Dict[str, Dict[str, np.ndarray]],
+                 skipped: Dict[str, str] = None, previous: "Panel" = None, changed: Sequence[str] = ()):
+        self.tickers = tickers
+        self.versions = versions
+        self.series = series
+        self.skipped = skipped or {}
+        self.index = {ticker: j for j, ticker in enumerate(tickers)}
+        if tickers:
+            self.dates = np.unique(np.concatenate([series[t]["dates"] for t in tickers]))
+        else:
+            self.dates = np.empty(0, dtype=np.int64)
+        self.last_dates = np.array([series[t]["dates"][-1] if len(series[t]["dates"]) else np.iinfo(np.int64).min
+                                    for t in tickers], dtype=np.int64)
+        self.tail_rows = max((len(series[t]["dates"]) for t in tickers), default=0)
+        self._aligned: Dict[str, np.ndarray] = {}
+        self._tail: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        # Layouts of a panel with the same columns and shape only need the changed
+        # columns rewritten. Only the arrays are kept, not the previous panel.
+        self._reuse = None
+        if previous is not None and previous.tickers == tickers:
+            with previous._lock:
+                self._reuse = {
+                    True: (dict(previous._aligned), np.array_equal(previous.dates, self.dates)),
+                    False: (dict(previous._tail), previous.tail_rows == self.tail_rows),
+                }
+            self._changed = [self.index[t] for t in changed]
+
+    def aligned(self, field: str) -> np.ndarray:
+        """(dates, tickers) array of ``field`` on the union of dates."""
+        with self._lock:
+            if field not in self._aligned:
+                self._aligned[field] = self._build(field, aligned=True)
+            return self._aligned[field]
+
+    def tail(self, field: str) -> np.ndarray:
+        """(rows, tickers) array of ``field``, each ticker's bars ending on the last row."""
+        with self._lock:
+            if field not in self._tail:
+                self._tail[field] = self._build(field, aligned=False)
+            return self._tail[field]
+
+    def _build(self, field: str, aligned: bool) -> np.ndarray:
+        rows = len(self.dates) if aligned else self.tail_rows
+        columns = range(len(self.tickers))
+        out = None
+        if self._reuse is not None:
+            layout, same_rows = self._reuse[aligned]
+            previous = layout.pop(field, None)
+            if previous is not None and same_rows:
+                out = previous.copy()
+                columns = self._changed
+        if out is None:
+            out = np.full((rows, len(self.tickers)), np.nan)
+        with stage("panel_layout"):
+            for j in columns:
+                s = self.series[self.tickers[j]]
+                out[:, j] = np.nan
+                if field not in s:
+                    continue
+                if aligned:
+                    out[np.searchsorted(self.dates, s["dates"]), j] = s[field]
+                else:
+                    out[rows - len(s[field]):, j] = s[field]
+        out.flags.writeable = False
+        return out
+
+    def columns(self, tickers: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Column indices of ``tickers`` (all of them when None)."""
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        missing = [t for t in tickers if t not in self.index]
+        if missing:
+            raise KeyError(f"Not in panel: {', '.join(missing)}")
+        return np.array([self.index[t] for t in tickers], dtype=np.int64)
+
+    def row_at(self, end_date: str = None) -> int:
+        """Number of aligned rows up to and including ``end_date``."""
+        if end_date is None:
+            return len(self.dates)
+        return int(np.searchsorted(self.dates, pd.Timestamp(end_date).value, side="right"))
+
+
+class PanelStore:
+    """Per-user panels, rebuilt when a ticker file is added, removed or changed.
+
+    Building a user's panel (which may load every one of their tickers) only
+    holds that user's lock, so other users' requests aren't held up; the
+    store-wide lock only guards the cache itself.
+    """
+
+    def __init__(self, loader: DataLoader, max_panels: int = 8):
+        self.loader = loader
+        self.max_panels = max_panels
+        self.builds = 0
+        self.reloads = 0
+        self._panels: "OrderedDict[Optional[str], Panel]" = OrderedDict()
+        # username -> [build lock, requests using it]; dropped when the last one is done
+        self._building: Dict[Optional[str], list] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _user_lock(self, username: Optional[str]) -> Iterator[None]:
+        with self._lock:
+            entry = self._building.setdefault(username, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._building[username]
+
+    def get(self, username: str = None) -> Panel:
+        with self._user_lock(username):
+            versions = {}
+            for ticker in self.loader.get_available_tickers(username):
+                try:
+                    versions[ticker] = self.loader.resolve(ticker, username)
+                except ValueError:
+                    continue
+            with self._lock:
+                previous = self._panels.get(username)
+                if previous is not None and previous.versions == versions:
+                    self._panels.move_to_end(username)
+                    return previous
+            panel = self._build(username, versions, previous)
+            with self._lock:
+                self._panels[username] = panel
+                self._panels.move_to_end(username)
+                while len(self._panels) > self.max_panels:
+                    self._panels.popitem(last=False)
+            return panel
+
+    def _build(self, username: Optional[str], versions: Dict[str, Tuple], previous: Optional[Panel]) -> Panel:
+        series, loaded, skipped, changed = {}, {}, {}, []
+        for ticker, version in versions.items():
+            if previous is not None and previous.versions.get(ticker) == version:
+                if ticker in previous.series:
+                    series[ticker] = previous.series[ticker]
+                else:
+                    skipped[ticker] = previous.skipped[ticker]
+                loaded[ticker] = version
+                continue
+            try:
+                # A CSV converted on load comes back under its columnar copy's version
+                df, version = self.loader.load_versioned(ticker, username)
+                series[ticker] = _series(df)
+            except ValueError as e:
+                skipped[ticker] = str(e)
+            loaded[ticker] = version
+            changed.append(ticker)
+        with self._lock:
+            self.reloads += len(changed)
+            self.builds += 1
+        tickers = sorted(series)
+        return Panel(tickers, loaded, series, skipped, previous,
+                     [t for t in changed if t in series])
+
+    def clear(self):
+        with self._lock:
+            self._panels.clear()
+
+
+def _pairwise(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Counts, covariances and variances for every (x column, y column) pair over rows where both are set."""
+    mx = ~np.isnan(x)
+    my = ~np.isnan(y)
+    x0 = np.where(mx, x, 0.0)
+    y0 = np.where(my, y, 0.0)
+    fx = mx.astype(np.float64)
+    fy = my.astype(np.float64)
+    n = fx.T @ fy
+    sx = x0.T @ fy
+    sy = fx.T @ y0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (x0.T @ y0 - sx * sy / n) / (n - 1)
+        var_x = np.maximum((x0 * x0).T @ fy - sx * sx / n, 0.0) / (n - 1)
+        var_y = np.maximum(fx.T @ (y0 * y0) - sy * sy / n, 0.0) / (n - 1)
+    return n, cov, var_x, var_y
+
+
+def correlation(returns: np.ndarray, min_periods: int = 2) -> np.ndarray:
+    """Pearson correlation matrix of the columns of ``returns``, pairwise over rows where both are set."""
+    n, cov, var_x, var_y = _pairwise(returns, returns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+    corr[n < max(min_periods, 2)] = np.nan
+    return corr
+
+
+def beta(returns: np.ndarray, benchmark: np.ndarray, min_periods: int = 2) -> Dict[str, np.ndarray]:
+    """Beta and correlation of each column of ``returns`` against the ``benchmark`` returns."""
+    n, cov, var_x, var_y = _pairwise(returns, benchmark.reshape(-1, 1))
+    n, cov, var_x, var_y = n[:, 0], cov[:, 0], var_x[:, 0], var_y[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = {"beta": cov / var_y, "correlation": np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)}
+    short = n < max(min_periods, 2)
+    for values in out.values():
+        values[short] = np.nan
+    out["observations"] = n.astype(np.int64)
+    return out
+
+
+def column_node(name: str, bb_std: float = 2.0, macd: Tuple[int, int, int] = (12, 26, 9)) -> Node:
+    """Node computing the /api/analyze column ``name``, e.g. ``RSI_14`` or ``Upper_BB_20``."""
+    if name in FIELDS:
+        return ("column", name)
+    if name in ("MACD", "MACD_Signal"):
+        return INDICATORS["macd"](*macd)[name]
+    match = _COLUMN.match(name)
+    if match is None:
+        raise KeyError(f"Unknown column {name}")
+    family, param = _PREFIXES[match.group(1)]
+    params = {param: int(match.group(2))}
+    if family == "bollinger":
+        params["num_std"] = bb_std
+    if params[param] < 1:
+        raise KeyError(f"Unknown column {name}")
+    return INDICATORS[family](**params)[name]
+
+
+def _history(node: Node) -> Optional[int]:
+    """Earlier rows the last value of ``node`` depends on, or None if it depends on all of them."""
+    if node[0] == "column":
+        return 0
+    if node[0] == "ema":
+        return None
+    own = LOOKBACK[node[0]](node) if node[0] in LOOKBACK else 0
+    deepest = 0
+    for arg in node[1:]:
+        if isinstance(arg, tuple):
+            depth = _history(arg)
+            if depth is None:
+                return None
+            deepest = max(deepest, depth)
+    return own + deepest
+
+
+def _evaluate(node: Node, sources: Dict[str, np.ndarray], memo: Dict[Node, np.ndarray]) -> np.ndarray:
+    if node in memo:
+        return memo[node]
+    if node[0] == "column":
+        result = sources[node[1]]
+    else:
+        args = [_evaluate(a, sources, memo) if isinstance(a, tuple) else a for a in node[1:]]
+        try:
+            result = NODE_FUNCS[node[0]](*args)
+        except ValueError:
+            # 2-D EMA takes only leading NaN; gaps inside a ticker's history go column by column
+            result = np.column_stack([NODE_FUNCS[node[0]](args[0][:, j], *args[1:])
+                                      for j in range(args[0].shape[1])])
+    memo[node] = result
+    return result
+
+
+def latest_values(panel: Panel, names: Sequence[str], columns: np.ndarray, bb_std: float = 2.0,
+                  macd: Tuple[int, int, int] = (12, 26, 9)) -> Dict[str, np.ndarray]:
+    """Each ticker's value of every column in ``names`` at its latest bar."""
+    nodes = {name: column_node(name, bb_std, macd) for name in names}
+    depths = [_history(node) for node in nodes.values()]
+    # Rolling indicators only need their windows; anything EMA-based needs the full history
+    rows = panel.tail_rows if None in depths else min(max(depths, default=0) + 1, panel.tail_rows)
+    sources = {}
+    for node in nodes.values():
+        for field in _fields(node):
+            if field not in sources:
+                sources[field] = panel.tail(field)[panel.tail_rows - rows:, columns]
+    memo: Dict[Node, np.ndarray] = {}
+    return {name: _evaluate(node, sources, memo)[-1] for name, node in nodes.items()}
+
+
+def _fields(node: Node) -> List[str]:
+    if node[0] == "column":
+        return [node[1]]
+    return [field for arg in node[1:] if isinstance(arg, tuple) for field in _fields(arg)]
+
+
+def screen(panel: Panel, filters: List[Dict], tickers: Optional[Sequence[str]] = None,
+           report: Sequence[str] = (), bb_std: float = 2.0,
+           macd: Tuple[int, int, int] = (12, 26, 9)) -> List[Dict]:
+    """Tickers whose latest values pass every filter.
+
+    A filter is ``{"column", "op", "value"}`` or ``{"column", "op", "other"}``
+    to compare two columns, e.g. ``{"column": "Close", "op": ">", "other":
+    "Upper_BB_20"}``. A NaN on either side fails the filter.
+    """
+    names = list(dict.fromkeys([f["column"] for f in filters] +
+                               [f["other"] for f in filters if f.get("other") is not None] + list(report)))
+    for f in filters:
+        if f["op"] not in OPERATORS:
+            raise ValueError(f"Unknown operator {f['op']}")
+        if (f.get("value") is None) == (f.get("other") is None):
+            raise ValueError(f"Filter on {f['column']} needs exactly one of value or other")
+    columns = panel.columns(tickers)
+    if len(columns) == 0 or panel.tail_rows == 0:
+        return []
+    values = latest_values(panel, names, columns, bb_std, macd)
+    keep = np.ones(len(columns), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for f in filters:
+            right = values[f["other"]] if f.get("other") is not None else f["value"]
+            keep &= OPERATORS[f["op"]](values[f["column"]], right)
+    dates = pd.to_datetime(panel.last_dates[columns]).strftime("%Y-%m-%d")
+    matches = []
+    for i in np.flatnonzero(keep):
+        row = {"stock": panel.tickers[columns[i]], "Date": dates[i]}
+        for name in names:
+            value = float(values[name][i])
+            row[name] = value if np.isfinite(value) else None
+        matches.append(row)
+    return matches
+
+
+def trailing(panel: Panel, window: int, end_date: str = None) -> Tuple[np.ndarray, int]:
+    """Aligned returns over the last ``window`` dates up to ``end_date``, and the row it ends on."""
+    end = panel.row_at(end_date)
+    if end == 0:
+        raise ValueError("No data on or before end_date")
+    returns = panel.aligned("Return")
+    return returns[max(end - window, 0):end], end - 1
+
+
+def as_of(panel: Panel, row: int) -> str:
+    return pd.Timestamp(panel.dates[row]).strftime("%Y-%m-%d")
+
+
+def nan_to_none(values: np.ndarray) -> list:
+    boxed = np.asarray(values, dtype=np.float64).astype(object)
+    boxed[~np.isfinite(np.asarray(values, dtype=np.float64))] = None
+    return boxed.tolist()
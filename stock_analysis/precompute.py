@@ -0,0 +1,231 @@
+"""Precomputed default-parameter indicator frames for public tickers.
+
+Public tickers are shared by every user, so their indicator frame for the
+default parameters is computed once and written next to the raw data as
+``{ticker}.precomputed`` (columnar format, which ticker listing ignores). The
+header records the source version it was computed from; a frame is only
+served while the ticker still resolves to that exact file and signature.
+
+A Precomputer thread builds missing or stale frames at startup and then, every
+``interval`` seconds, lists the public tickers again and compares each one's
+file signature with the one its frame was computed from. Nothing watches the
+files: an edited, appended or new ticker is recomputed on the first pass after
+it changes, so its frame can lag by up to one interval (plus the pass itself).
+Requests in between fall back to computing from the raw data.
+
+Every server worker runs a Precomputer, but only the one holding an exclusive
+``flock`` on ``.precompute.lock`` in the public directory does any passes; the
+others retry the lock each interval and take over if that worker exits.
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .columnar import read_columnar, read_header, write_columnar
+from .data_loader import DataLoader
+from .engine import IndicatorEngine
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+PRECOMPUTED_SUFFIX = ".precomputed"
+LOCK_FILE = ".precompute.lock"
+
+
+def spec_key(name: str, params: Dict) -> str:
+    # 20 and 20.0 are the same parameter
+    return json.dumps([name, {k: float(v) for k, v in params.items()}], sort_keys=True)
+
+
+class PrecomputedStore:
+    """Reads and writes precomputed frames; safe to share between threads."""
+
+    def __init__(self, public_data_dir: str = "./data/public"):
+        self.public_data_dir = public_data_dir
+        self.hits = 0
+        self.misses = 0
+        # ticker -> (file signature, meta, frame)
+        self._entries: Dict[str, Tuple[Tuple[int, int], Dict, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    def path(self, stock_name: str) -> str:
+        return os.path.join(self.public_data_dir, f"{stock_name}{PRECOMPUTED_SUFFIX}")
+
+    def _load(self, stock_name: str) -> Optional[Tuple[Dict, pd.DataFrame]]:
+        path = self.path(stock_name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(stock_name, None)
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(stock_name)
+        if entry is not None and entry[0] == signature:
+            return entry[1], entry[2]
+        try:
+            meta = read_header(path)["meta"]
+            df = read_columnar(path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._entries[stock_name] = (signature, meta, df)
+        return meta, df
+
+    def source(self, stock_name: str) -> Optional[Tuple]:
+        """Version of the data the stored frame was computed from."""
+        loaded = self._load(stock_name)
+        if loaded is None:
+            return None
+        path, signature = loaded[0]["source"]
+        return path, tuple(signature)
+
+    def frame(self, loader: DataLoader, stock_name: str, username: Optional[str],
+              specs: List[Tuple[str, Dict]]) -> Optional[Tuple[pd.DataFrame, Tuple]]:
+        """``(frame narrowed to specs, source version)``, or None if it can't serve them.
+
+        It can serve a request when the ticker resolves (for this user) to
+        the same file it was computed from and every spec was precomputed.
+        """
+        try:
+            version = loader.resolve(stock_name, username)
+        except ValueError:
+            return None
+        loaded = self._load(stock_name)
+        if loaded is None or (loaded[0]["source"][0], tuple(loaded[0]["source"][1])) != version:
+            self.misses += 1
+            return None
+        meta, df = loaded
+        if not {spec_key(name, params) for name, params in specs} <= set(meta["specs"]):
+            self.misses += 1
+            return None
+        self.hits += 1
+        columns = list(meta["base"]) + list(IndicatorEngine.plan(specs))
+        return df[columns], version
+
+    def write(self, stock_name: str, df: pd.DataFrame, version: Tuple, specs: List[Tuple[str, Dict]],
+              base: List[str]):
+        meta = {
+            "source": [version[0], list(version[1])],
+            "specs": [spec_key(name, params) for name, params in specs],
+            "base": base,
+        }
+        write_columnar(df, self.path(stock_name), meta)
+
+    def remove(self, stock_name: str):
+        try:
+            os.remove(self.path(stock_name))
+        except OSError:
+            pass
+        with self._lock:
+            self._entries.pop(stock_name, None)
+
+    def stored(self) -> List[str]:
+        if not os.path.isdir(self.public_data_dir):
+            return []
+        return [f[:-len(PRECOMPUTED_SUFFIX)] for f in os.listdir(self.public_data_dir)
+                if f.endswith(PRECOMPUTED_SUFFIX)]
+
+
+class Precomputer:
+    """Background thread keeping every public ticker's default frame current.
+
+    Passes only run while this process holds the precompute lock; without
+    fcntl (Windows) every process runs them.
+    """
+
+    def __init__(self, loader: DataLoader, store: PrecomputedStore, specs: List[Tuple[str, Dict]],
+                 interval: float = 5.0):
+        self.loader = loader
+        self.store = store
+        self.specs = specs
+        self.interval = interval
+        self.computed = 0
+        self.errors: Dict[str, str] = {}
+        self.lock_path = os.path.join(store.public_data_dir, LOCK_FILE)
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def leader(self) -> bool:
+        """Whether this process is the one running passes."""
+        return fcntl is None or self._lock_file is not None
+
+    def _acquire(self) -> bool:
+        """Take the precompute lock if no other process holds it; True if this process has it."""
+        if self.leader:
+            return True
+        os.makedirs(self.store.public_data_dir, exist_ok=True)
+        f = open(self.lock_path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def _release(self):
+        if self._lock_file is not None:
+            # Closing the file drops the flock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def refresh(self, stock_name: str) -> bool:
+        """Recompute ``stock_name`` if its stored frame is missing or stale; True if it was."""
+        if self.store.source(stock_name) == self.loader.resolve(stock_name):
+            return False
+        df, version = self.loader.load_versioned(stock_name)
+        # No version: nothing is worth keeping in an engine cache here
+        frame = IndicatorEngine().apply(df, self.specs)
+        self.store.write(stock_name, frame, version, self.specs, [str(c) for c in df.columns])
+        self.computed += 1
+        return True
+
+    def run_once(self) -> int:
+        """One pass over the public tickers; returns how many frames were recomputed."""
+        tickers = self.loader.get_available_tickers()
+        count = 0
+        for stock_name in tickers:
+            if self._stop.is_set():
+                break
+            try:
+                count += self.refresh(stock_name)
+                self.errors.pop(stock_name, None)
+            except Exception as e:
+                # A bad file must not stop the others; it's retried next pass
+                self.errors[stock_name] = str(e) or type(e).__name__
+        for stock_name in set(self.store.stored()) - set(tickers):
+            self.store.remove(stock_name)
+        return count
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if self._acquire():
+                    self.run_once()
+                if self.interval <= 0:
+                    return
+                self._stop.wait(self.interval)
+        finally:
+            self._release()
+
+    def start(self):
+        """Run passes in the background every ``interval`` seconds (0: once) while holding the lock."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="precomputer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
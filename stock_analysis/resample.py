@@ -0,0 +1,171 @@
+"""OHLCV bars at coarser intervals.
+
+An interval is ``<n><unit>`` with unit ``m`` (minutes), ``h``, ``D``, ``W``
+(weeks starting Monday) or ``M`` (calendar months), e.g. ``5m``, ``1h``,
+``1W``. Buckets are anchored so their boundaries never move: minute-based
+ones at the Unix epoch, weeks at a Monday, months at January. Each bar is
+labelled with the start of its bucket and aggregated like a price bar
+(Open first, High max, Low min, Close last, Volume sum; other columns last).
+
+Because boundaries are fixed, a bucket of a coarser interval is a union of
+whole buckets of any finer interval whose boundaries nest in it, e.g.
+``1h`` in ``1D`` or ``1D`` in ``1M``. ResampleCache uses that to build
+coarser levels from the coarsest cached finer level rather than from the
+raw bars.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import frame_nbytes, hand_out
+from .downsample import PRICE_AGGREGATES
+
+_INTERVAL = re.compile(r"^([1-9]\d*)(m|h|D|W|M)$")
+_MINUTES = {"m": 1, "h": 60, "D": 1440}
+DAY_MINUTES = 1440
+
+# ("m", minutes) for fixed-width intervals, ("W", weeks) or ("M", months)
+Interval = Tuple[str, int]
+
+
+def parse_interval(interval: str) -> Interval:
+    """Canonical form of ``interval``; ``60m`` and ``1h`` are the same."""
+    match = _INTERVAL.match(interval or "")
+    if match is None:
+        raise ValueError(f"Bad interval {interval!r}; use e.g. 5m, 1h, 1D, 1W, 1M")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit in _MINUTES:
+        return "m", n * _MINUTES[unit]
+    return unit, n
+
+
+def date_format(interval: Interval) -> str:
+    """strftime format for bar labels: with the time of day below one day."""
+    return "%Y-%m-%d %H:%M" if interval[0] == "m" and interval[1] < DAY_MINUTES else "%Y-%m-%d"
+
+
+def nests(finer: Interval, coarser: Interval) -> bool:
+    """Whether every boundary of ``coarser`` is also a boundary of ``finer``."""
+    if finer == coarser:
+        return False
+    if finer[0] == "m":
+        if coarser[0] == "m":
+            return coarser[1] % finer[1] == 0
+        # Weeks and months start at midnight
+        return DAY_MINUTES % finer[1] == 0
+    return finer[0] == coarser[0] and coarser[1] % finer[1] == 0
+
+
+def bucket_keys(dates: np.ndarray, interval: Interval) -> Tuple[np.ndarray, np.ndarray]:
+    """Bucket number of every date and the start of each bucket number's bucket."""
+    unit, n = interval
+    if unit == "M":
+        months = dates.astype("M8[M]").astype(np.int64)
+        keys = months // n
+        return keys, (keys * n).astype("M8[M]").astype(dates.dtype)
+    if unit == "W":
+        # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday
+        days = dates.astype("M8[D]").astype(np.int64) + 3
+        keys = days // (7 * n)
+        return keys, (keys * 7 * n - 3).astype("M8[D]").astype(dates.dtype)
+    minutes = dates.astype("M8[m]").astype(np.int64)
+    keys = minutes // n
+    return keys, (keys * n).astype("M8[m]").astype(dates.dtype)
+
+
+def resample(df: pd.DataFrame, date_col: str, interval: Interval) -> pd.DataFrame:
+    """Aggregate a date-sorted frame into ``interval`` bars; rows without a date are dropped."""
+    dates = df[date_col].to_numpy()
+    if dates.dtype.kind != "M":
+        raise ValueError("Resampling needs timezone-naive dates")
+    valid = ~np.isnat(dates)
+    if not valid.all():
+        df = df[valid]
+        dates = dates[valid]
+    keys, labels = bucket_keys(dates, interval)
+    n = len(keys)
+    if n == 0:
+        return df.iloc[:0]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], n) - 1
+    out = {}
+    for c in df.columns:
+        if c == date_col:
+            out[c] = labels[starts]
+            continue
+        values = df[c].to_numpy()
+        how = PRICE_AGGREGATES.get(c, "last")
+        numeric = pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype)
+        if not numeric or how == "last":
+            out[c] = values[ends]
+        elif how == "first":
+            out[c] = values[starts]
+        elif how == "max":
+            out[c] = np.fmax.reduceat(values, starts)
+        elif how == "min":
+            out[c] = np.fmin.reduceat(values, starts)
+        else:
+            # A missing volume counts as none, as in pandas' sum
+            out[c] = np.add.reduceat(np.where(np.isnan(values), 0, values) if values.dtype.kind == "f" else values,
+                                     starts)
+    return pd.DataFrame(out, columns=df.columns)
+
+
+class ResampleCache:
+    """Resampled frames per (data version, interval), LRU-bounded by bytes."""
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.derived = 0
+        self._entries: "OrderedDict[Tuple[Hashable, Interval], Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, df: pd.DataFrame, version: Hashable, date_col: str, interval: Interval) -> pd.DataFrame:
+        """``df`` (the frame loaded as ``version``) at ``interval``."""
+        key = (version, interval)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hand_out(entry[0])
+            self.misses += 1
+            # The finer level with the fewest bars, if any is cached
+            finer = [frame for (v, i), (frame, _) in self._entries.items() if v == version and nests(i, interval)]
+        source = min(finer, key=len) if finer else df
+        if finer:
+            self.derived += 1
+        result = resample(source, date_col, interval)
+        self._store(key, result)
+        return hand_out(result)
+
+    def _store(self, key, df: pd.DataFrame):
+        nbytes = frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (df, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "derived": self.derived,
+            }
@@ -0,0 +1,52 @@
+"""Chunked encoders for indicator frames.
+
+Each encoder yields the frame a fixed number of rows at a time, so only one
+chunk's worth of text or Arrow buffers exists at once.
+"""
+import io
+from typing import Iterator
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional; only format=arrow needs it
+    pa = None
+
+CHUNK_ROWS = 10_000
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """CSV text as ``df.to_csv(index=False)`` would write it."""
+    yield df.iloc[:0].to_csv(index=False)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False)
+
+
+def iter_ndjson(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """One JSON object per row, NaN as null."""
+    for start in range(0, len(df), chunk_rows):
+        text = df.iloc[start:start + chunk_rows].to_json(orient="records", lines=True)
+        yield text if text.endswith("\n") else text + "\n"
+
+
+def iter_arrow(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """An Arrow IPC stream with one record batch per chunk."""
+    if pa is None:
+        raise RuntimeError("Arrow output requires pyarrow")
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            writer.write_batch(pa.RecordBatch.from_pandas(df.iloc[start:start + chunk_rows], schema=schema,
+                                                          preserve_index=False))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
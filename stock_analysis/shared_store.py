@@ -0,0 +1,228 @@
+"""Ticker frames shared between processes.
+
+Each frame is written once, in the columnar format, to a file in a shared
+directory (``/dev/shm`` where available, so it lives in memory). Every process
+maps those files read-only. The pages are shared, and attaching a frame
+copies nothing. Each deployment gets its own directory (see
+``default_directory``). If the store can't be used, DataLoader keeps frames
+per process instead.
+
+``index.json`` in the same directory maps each frame's version (file path
+and signature, i.e. user, ticker and contents) to its file, column offsets,
+size and slot. Publishing and eviction rewrite it under an exclusive
+``flock``; attaching only reads it, under a shared one. A process marks the
+frames it holds with a shared ``lockf`` lock on their slot's byte of
+``attach.lock`` and touches the frame file, whose mtime orders eviction. Over
+the byte budget, frames whose slot nobody holds are deleted, least recently
+used first. The kernel drops a process's locks when it exits, so a crashed
+worker pins nothing.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .columnar import COLUMNAR_SUFFIX, column_values, read_header, write_columnar
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+Version = Tuple[str, Tuple[int, int]]
+
+
+def default_directory(data_dir: str = "data") -> str:
+    """The store for the deployment whose data lives in ``data_dir``.
+
+    Named after a hash of its absolute path, so two deployments on one host
+    never share an index, a byte budget or each other's frames.
+    """
+    data_dir = os.path.abspath(data_dir)
+    deployment = hashlib.sha1(data_dir.encode("utf-8")).hexdigest()[:12]
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else data_dir
+    return os.path.join(base, f"stock_analysis_frames-{deployment}")
+
+
+class SharedFrameStore:
+    def __init__(self, directory: str = None, max_bytes: int = 1024 * 1024 * 1024):
+        if fcntl is None:
+            raise RuntimeError("SharedFrameStore needs fcntl (POSIX)")
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.attached = 0
+        self.published = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, "index.json")
+        self._lock_path = os.path.join(self.directory, "index.lock")
+        self._slots_path = os.path.join(self.directory, "attach.lock")
+        # Closing any descriptor of a file drops the process's lockf locks on
+        # it, so attach.lock is opened once and kept open
+        self._slots_fd: Optional[int] = None
+        # Key -> slot of every frame this process holds
+        self._held: Dict[str, int] = {}
+        self._held_lock = threading.Lock()
+
+    @staticmethod
+    def key(version: Version) -> str:
+        return hashlib.sha1(json.dumps([version[0], list(version[1])]).encode("utf-8")).hexdigest()[:24]
+
+    @contextlib.contextmanager
+    def _index(self, write: bool = True) -> Iterator[Dict]:
+        """The index, locked against other processes.
+
+        With ``write`` the lock is exclusive and changes are written back on
+        exit; without it the lock is shared and changes are discarded.
+        """
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            try:
+                try:
+                    with open(self._index_path) as f:
+                        index = json.load(f)
+                except (OSError, ValueError):
+                    index = {}
+                before = json.dumps(index, sort_keys=True) if write else None
+                yield index
+                if write and json.dumps(index, sort_keys=True) != before:
+                    tmp_path = f"{self._index_path}.tmp-{os.getpid()}"
+                    with open(tmp_path, "w") as f:
+                        json.dump(index, f)
+                    os.replace(tmp_path, self._index_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _map(self, entry: Dict) -> Optional[pd.DataFrame]:
+        path = os.path.join(self.directory, entry["file"])
+        try:
+            buf = np.memmap(path, dtype=np.uint8, mode="r") if entry["rows"] else None
+        except (OSError, ValueError):
+            return None
+
+        def read(offset, dtype, count):
+            return np.frombuffer(buf, dtype=dtype, count=count, offset=offset) if buf is not None \
+                else np.empty(0, dtype=dtype)
+        return pd.DataFrame({col["name"]: column_values(col, read) for col in entry["columns"]}, copy=False)
+
+    def attach(self, version: Version) -> Optional[pd.DataFrame]:
+        """Map the frame stored for ``version``, or None if no process has published it."""
+        key = self.key(version)
+        with self._index(write=False) as index:
+            entry = index.get(key)
+            if entry is None:
+                return None
+            df = self._map(entry)
+            if df is None:
+                # The next publish replaces the entry
+                return None
+            self._hold(key, entry)
+        self.attached += 1
+        return df
+
+    def publish(self, version: Version, df: pd.DataFrame, username: str = None,
+                stock_name: str = None) -> pd.DataFrame:
+        """Store ``df`` for ``version`` (unless another process already did) and return it mapped."""
+        key = self.key(version)
+        file_name = f"{key}{COLUMNAR_SUFFIX}"
+        with self._index() as index:
+            entry = index.get(key)
+            if entry is None or not os.path.exists(os.path.join(self.directory, file_name)):
+                path = os.path.join(self.directory, file_name)
+                write_columnar(df, path)
+                header = read_header(path)
+                taken = {e["slot"] for k, e in index.items() if k != key}
+                entry = index[key] = {
+                    "user": username,
+                    "ticker": stock_name,
+                    "path": version[0],
+                    "signature": list(version[1]),
+                    "file": file_name,
+                    "rows": header["rows"],
+                    "columns": header["columns"],
+                    "nbytes": os.path.getsize(path),
+                    "slot": next(slot for slot in range(len(taken) + 1) if slot not in taken),
+                }
+                self.published += 1
+            self._hold(key, entry)
+            self._evict(index)
+            mapped = self._map(entry)
+        return mapped if mapped is not None else df
+
+    def release(self, version: Version):
+        """This process no longer holds the frame for ``version``."""
+        with self._held_lock:
+            slot = self._held.pop(self.key(version), None)
+            if slot is not None:
+                fcntl.lockf(self._slots_fd, fcntl.LOCK_UN, 1, slot)
+
+    def release_all(self):
+        with self._held_lock:
+            for slot in self._held.values():
+                fcntl.lockf(self._slots_fd, fcntl.LOCK_UN, 1, slot)
+            self._held.clear()
+
+    def _slots(self) -> int:
+        if self._slots_fd is None:
+            self._slots_fd = os.open(self._slots_path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._slots_fd
+
+    def _hold(self, key: str, entry: Dict):
+        """Mark the frame as held by this process and as just used. Call with the index locked."""
+        with self._held_lock:
+            if self._held.get(key) != entry["slot"]:
+                fcntl.lockf(self._slots(), fcntl.LOCK_SH, 1, entry["slot"])
+                self._held[key] = entry["slot"]
+        try:
+            os.utime(os.path.join(self.directory, entry["file"]))
+        except OSError:
+            pass
+
+    def _in_use(self, key: str, entry: Dict) -> bool:
+        """Whether any process holds the frame. Call with the index locked for writing."""
+        with self._held_lock:
+            # A process never conflicts with its own locks, so its frames are checked here
+            if key in self._held:
+                return True
+            try:
+                fcntl.lockf(self._slots(), fcntl.LOCK_EX | fcntl.LOCK_NB, 1, entry["slot"])
+            except OSError:
+                return True
+            fcntl.lockf(self._slots_fd, fcntl.LOCK_UN, 1, entry["slot"])
+            return False
+
+    def _used(self, entry: Dict) -> float:
+        try:
+            return os.stat(os.path.join(self.directory, entry["file"])).st_mtime
+        except OSError:
+            return float("-inf")
+
+    def _evict(self, index: Dict):
+        total = sum(entry["nbytes"] for entry in index.values())
+        # Mapped files stay valid after unlinking, but held ones are kept anyway
+        for key in sorted(index, key=lambda k: self._used(index[k])):
+            if total <= self.max_bytes:
+                break
+            if self._in_use(key, index[key]):
+                continue
+            entry = index.pop(key)
+            total -= entry["nbytes"]
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._index(write=False) as index:
+            return {
+                "entries": len(index),
+                "bytes": sum(entry["nbytes"] for entry in index.values()),
+                "max_bytes": self.max_bytes,
+                "attached_here": len(self._held),
+                "attached": self.attached,
+                "published": self.published,
+            }
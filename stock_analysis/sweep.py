@@ -0,0 +1,187 @@
+"""Indicator parameter sweeps.
+
+Each indicator family is evaluated for every combination of its swept
+parameters in one pass: rolling statistics come from ``kernels.*_many`` (one
+column per window, all from a single cumulative sum) and EMAs from one 2-D
+``ewm_mean`` with a smoothing factor per column. Every combination is then
+summarised as
+
+* ``last``: the indicator's final value (the lower band for Bollinger, the
+  MACD line for MACD);
+* ``signals``: how many times the rule below entered a position;
+* ``return``: total return of that rule, long or flat, trading at the close
+  after the signal.
+
+Rules: MA: long while Close > MA. RSI: enter below ``rsi_lower``, exit above
+``rsi_upper``. Bollinger: enter on a close below the lower band, exit above
+the middle band. MACD: long while MACD > signal line.
+"""
+import itertools
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from . import kernels
+from .backtest import positions_from_events
+
+MAX_COMBINATIONS = 100_000
+# Combinations x rows; bounds the size of each (rows, combinations) matrix
+MAX_CELLS = 20_000_000
+
+
+def _summarise(positions: np.ndarray, log_returns: np.ndarray, last: np.ndarray) -> Dict[str, np.ndarray]:
+    # The position held after row t earns the return from t to t + 1
+    held = positions[:-1].astype(np.float64)
+    signals = np.count_nonzero(positions[1:] & ~positions[:-1], axis=0) + positions[0]
+    return {
+        "last": last,
+        "signals": signals.astype(np.int64),
+        "return": np.expm1(log_returns @ held),
+    }
+
+
+def sweep_ma(close: np.ndarray, log_returns: np.ndarray, windows: Sequence[int]) -> Dict[str, np.ndarray]:
+    windows = np.asarray(windows, dtype=np.int64)
+    ma = kernels.rolling_mean_many(close, windows)
+    with np.errstate(invalid="ignore"):
+        positions = close[:, None] > ma
+    return {"window": windows, **_summarise(positions, log_returns, ma[-1])}
+
+
+def sweep_rsi(close: np.ndarray, log_returns: np.ndarray, windows: Sequence[int],
+              lower: float = 30.0, upper: float = 70.0) -> Dict[str, np.ndarray]:
+    windows = np.asarray(windows, dtype=np.int64)
+    rsi = kernels.rsi_many(close, windows)
+    with np.errstate(invalid="ignore"):
+        positions = positions_from_events(rsi < lower, rsi > upper)
+    return {"window": windows, **_summarise(positions, log_returns, rsi[-1])}
+
+
+def sweep_bollinger(close: np.ndarray, log_returns: np.ndarray, windows: Sequence[int],
+                    num_stds: Sequence[float]) -> Dict[str, np.ndarray]:
+    unique = np.unique(np.asarray(windows, dtype=np.int64))
+    mid = kernels.rolling_mean_many(close, unique)
+    std = kernels.rolling_std_many(close, unique)
+    grid = np.array(list(itertools.product(range(len(unique)), num_stds)), dtype=np.float64).reshape(-1, 2)
+    col = grid[:, 0].astype(np.int64)
+    k = grid[:, 1]
+    lower = mid[:, col] - std[:, col] * k
+    with np.errstate(invalid="ignore"):
+        positions = positions_from_events(close[:, None] < lower, close[:, None] > mid[:, col])
+    return {"window": unique[col], "num_std": k, **_summarise(positions, log_returns, lower[-1])}
+
+
+def sweep_macd(close: np.ndarray, log_returns: np.ndarray, fasts: Sequence[int], slows: Sequence[int],
+               signals: Sequence[int]) -> Dict[str, np.ndarray]:
+    spans = np.unique(np.concatenate((np.asarray(fasts), np.asarray(slows))).astype(np.int64))
+    emas = kernels.ewm_mean(np.repeat(close[:, None], len(spans), axis=1), alpha=2.0 / (spans + 1.0))
+    pairs = [(f, s) for f in np.unique(fasts) for s in np.unique(slows) if f < s]
+    if not pairs:
+        raise ValueError("MACD needs at least one fast span smaller than a slow span")
+    index = {int(span): i for i, span in enumerate(spans)}
+    fast_cols = [index[int(f)] for f, _ in pairs]
+    slow_cols = [index[int(s)] for _, s in pairs]
+    macd = emas[:, fast_cols] - emas[:, slow_cols]
+
+    signal_spans = np.asarray(signals, dtype=np.int64)
+    repeated = np.repeat(macd, len(signal_spans), axis=1)
+    alphas = np.tile(2.0 / (signal_spans + 1.0), len(pairs))
+    signal_line = kernels.ewm_mean(repeated, alpha=alphas)
+    positions = repeated > signal_line
+    return {
+        "fast": np.repeat([f for f, _ in pairs], len(signal_spans)),
+        "slow": np.repeat([s for _, s in pairs], len(signal_spans)),
+        "signal": np.tile(signal_spans, len(pairs)),
+        **_summarise(positions, log_returns, repeated[-1]),
+    }
+
+
+# Request parameter -> (family, family parameter, default when the family is
+# swept through another of its parameters, integer-valued)
+PARAMETERS = {
+    "ma_window": ("ma", "window", 30, True),
+    "rsi_window": ("rsi", "window", 14, True),
+    "bb_window": ("bollinger", "window", 20, True),
+    "bb_std": ("bollinger", "num_std", 2.0, False),
+    "macd_fast": ("macd", "fast", 12, True),
+    "macd_slow": ("macd", "slow", 26, True),
+    "macd_signal": ("macd", "signal", 9, True),
+}
+
+
+def build_grids(values: Dict[str, List[float]]) -> Dict[str, Dict[str, List[float]]]:
+    """Group request parameters into per-family grids, filling unswept parameters with defaults."""
+    grids: Dict[str, Dict[str, List[float]]] = {}
+    for name, swept in values.items():
+        family, param, _, integer = PARAMETERS[name]
+        if not swept:
+            raise ValueError(f"{name} has no values")
+        if integer:
+            if any(v != int(v) or v < 1 for v in swept):
+                raise ValueError(f"{name} values must be integers >= 1")
+            swept = [int(v) for v in swept]
+        elif any(v <= 0 for v in swept):
+            raise ValueError(f"{name} values must be > 0")
+        grids.setdefault(family, {})[param] = sorted(set(swept))
+    for name, (family, param, default, _) in PARAMETERS.items():
+        if family in grids:
+            grids[family].setdefault(param, [default])
+    if not grids:
+        raise ValueError("Give a range for at least one parameter")
+    return grids
+
+
+def combinations(grids: Dict[str, Dict[str, List[float]]]) -> Dict[str, int]:
+    """Number of combinations each family would evaluate."""
+    counts = {}
+    for family, params in grids.items():
+        count = 1
+        for values in params.values():
+            count *= len(values)
+        counts[family] = count
+    return counts
+
+
+def run_sweep(close, grids: Dict[str, Dict[str, List[float]]], rsi_lower: float = 30.0,
+              rsi_upper: float = 70.0) -> Dict[str, Dict[str, np.ndarray]]:
+    """Evaluate every family in ``grids``; ``close`` must be NaN-free.
+
+    ``grids`` maps a family (ma, rsi, bollinger, macd) to its parameter
+    value lists, e.g. ``{"macd": {"fast": [8, 12], "slow": [26], "signal": [9]}}``.
+    """
+    for family, count in combinations(grids).items():
+        if count > MAX_COMBINATIONS:
+            raise ValueError(f"{family} sweep has {count} combinations (max {MAX_COMBINATIONS})")
+    close = kernels.as_float_array(close)
+    if close.shape[0] < 2:
+        raise ValueError("Need at least two rows to sweep")
+    for family, count in combinations(grids).items():
+        if count * close.shape[0] > MAX_CELLS:
+            raise ValueError(f"{family} sweep of {count} combinations over {close.shape[0]} rows is too large")
+    log_returns = np.log(close[1:] / close[:-1])
+    results = {}
+    if "ma" in grids:
+        results["ma"] = sweep_ma(close, log_returns, grids["ma"]["window"])
+    if "rsi" in grids:
+        results["rsi"] = sweep_rsi(close, log_returns, grids["rsi"]["window"], rsi_lower, rsi_upper)
+    if "bollinger" in grids:
+        results["bollinger"] = sweep_bollinger(close, log_returns, grids["bollinger"]["window"],
+                                               grids["bollinger"]["num_std"])
+    if "macd" in grids:
+        params = grids["macd"]
+        results["macd"] = sweep_macd(close, log_returns, params["fast"], params["slow"], params["signal"])
+    return results
+
+
+def to_json_columns(result: Dict[str, np.ndarray]) -> Dict[str, List[Optional[float]]]:
+    """Column lists with NaN/inf as None."""
+    out = {}
+    for name, values in result.items():
+        values = np.asarray(values)
+        if values.dtype.kind == "f":
+            boxed = values.astype(object)
+            boxed[~np.isfinite(values)] = None
+            out[name] = boxed.tolist()
+        else:
+            out[name] = values.tolist()
+    return out
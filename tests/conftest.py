@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tests import the app packages from the repository root
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app_dir(tmp_path_factory):
+    """A scratch copy of the public tickers; the app runs with this as its working directory."""
+    root = tmp_path_factory.mktemp("app")
+    public = root / "data" / "public"
+    public.mkdir(parents=True)
+    for name in os.listdir(os.path.join(ROOT, "data", "public")):
+        if name.endswith("_raw.csv"):
+            shutil.copy(os.path.join(ROOT, "data", "public", name), public / name)
+    os.symlink(os.path.join(ROOT, "static"), root / "static")
+    cwd = os.getcwd()
+    os.chdir(root)
+    yield root
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def app_module(app_dir):
+    os.environ["SHARED_CACHE_DIR"] = ""
+    import main
+    return main
+
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    from fastapi.testclient import TestClient
+    return TestClient(app_module.app)
+
+
+@pytest.fixture
+def user(client):
+    """A freshly registered user: ``(username, token, headers)``."""
+    username = f"u{uuid.uuid4().hex[:10]}"
+    r = client.post("/register", json={"username": username, "email": f"{username}@example.com",
+                                       "password": "test-password"})
+    assert r.status_code == 200, r.text
+    token = client.post("/token", data={"username": username, "password": "test-password"}).json()["access_token"]
+    return username, token, {"Authorization": f"Bearer {token}"}
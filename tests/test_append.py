@@ -0,0 +1,97 @@
+"""Appended bars: validation, and indicators extended from the previous version."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.datasets import synthetic_ohlcv
+from benchmarks.indicators import PandasIndicators
+from stock_analysis.analysis import analyze
+from stock_analysis.columnar import write_columnar
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.engine import IndicatorEngine
+
+SPECS = [
+    ("ma", {"window": 30}),
+    ("rsi", {"window": 14}),
+    ("ema", {"span": 14}),
+    ("bollinger", {"window": 20, "num_std": 2.0}),
+    ("macd", {"fast": 12, "slow": 26, "signal": 9}),
+    ("atr", {"window": 14}),
+    ("sma", {"window": 10}),
+    ("std", {"window": 5}),
+]
+REFERENCE = {"ma": "add_ma", "rsi": "add_rsi", "ema": "add_ema", "bollinger": "add_bollinger_bands",
+             "macd": "add_macd", "atr": "add_atr", "sma": "add_sma", "std": "add_std"}
+
+
+def reference(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for name, params in SPECS:
+        out = getattr(PandasIndicators, REFERENCE[name])(out, **params)
+    return out
+
+
+def assert_served(served: pd.DataFrame, df: pd.DataFrame):
+    expected = reference(df)
+    assert served["Date"].tolist() == expected["Date"].dt.strftime("%Y-%m-%d").tolist()
+    pd.testing.assert_frame_equal(served.drop(columns="Date"), expected.drop(columns="Date"), rtol=1e-9,
+                                  atol=1e-7, check_dtype=False)
+
+
+@pytest.fixture
+def ticker(tmp_path):
+    """A loader over one public ticker, and the bars that follow its history."""
+    history = synthetic_ohlcv(600)
+    write_columnar(history.iloc[:500], str(tmp_path / "T.cols"))
+    loader = DataLoader(str(tmp_path), str(tmp_path / "users"), revalidate_seconds=0)
+    return loader, history
+
+
+def test_appended_indicators_match_a_full_compute(ticker):
+    loader, history = ticker
+    engine = IndicatorEngine()
+    analyze(loader, engine, "T", None, SPECS)
+    for start, stop in [(500, 501), (501, 540), (540, 600)]:
+        result = loader.append_bars("T", history.iloc[start:stop])
+        assert result["appended"] == stop - start
+        assert_served(analyze(loader, engine, "T", None, SPECS), history.iloc[:stop])
+    # Every step after the first extended the cached columns instead of recomputing them
+    assert engine.stats()["extensions"] >= 3
+
+
+def test_append_after_missing_prices(tmp_path):
+    # Blank closes at the end of the stored history: the EMAs carry their weights across the gap
+    history = synthetic_ohlcv(560)
+    history.loc[470:499, "Close"] = np.nan
+    write_columnar(history.iloc[:500], str(tmp_path / "T.cols"))
+    loader = DataLoader(str(tmp_path), str(tmp_path / "users"), revalidate_seconds=0)
+    engine = IndicatorEngine()
+    analyze(loader, engine, "T", None, SPECS)
+    loader.append_bars("T", history.iloc[500:560])
+    assert_served(analyze(loader, engine, "T", None, SPECS), history)
+    assert engine.stats()["extensions"] >= 1
+
+
+@pytest.mark.parametrize("dates,message", [
+    (["2001-05-20", "2001-05-19"], "strictly increasing"),
+    (["2001-05-20", "2001-05-20"], "strictly increasing"),
+    (["2000-01-01 12:00"], "must be after"),
+])
+def test_out_of_order_and_duplicate_dates_are_rejected(ticker, dates, message):
+    loader, history = ticker
+    before = loader.load_data("T")
+    bars = pd.DataFrame({"Date": pd.to_datetime(dates), "Close": 1.0, "High": 2.0, "Low": 0.5, "Open": 1.0,
+                         "Volume": 100})
+    with pytest.raises(ValueError, match=message):
+        loader.append_bars("T", bars)
+    pd.testing.assert_frame_equal(loader.load_data("T"), before)
+
+
+def test_bar_with_a_stored_date_replaces_it(ticker):
+    loader, history = ticker
+    bar = history.iloc[499:500].copy()
+    bar["Close"] = 1.0
+    result = loader.append_bars("T", bar)
+    assert (result["appended"], result["replaced"]) == (0, 1)
+    assert loader.load_data("T")["Close"].iloc[-1] == 1.0
+    assert len(loader.load_data("T")) == 500
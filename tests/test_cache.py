@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from stock_analysis.cache import FrameCache
+from stock_analysis.resample import ResampleCache, parse_interval
+
+
+def bars(n=48):
+    return pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "Close": np.arange(n, dtype=float),
+    })
+
+
+def test_copy_on_write_not_enabled_process_wide():
+    import stock_analysis.cache  # noqa: F401
+    if int(pd.__version__.split(".")[0]) < 3:
+        assert not pd.get_option("mode.copy_on_write")
+
+
+def test_frame_cache_hands_out_copies():
+    cache = FrameCache()
+    handed = cache.put("a.cols", (1, 2), bars())
+    handed.loc[0, "Close"] = -1.0
+    got = cache.get("a.cols", (1, 2))
+    assert got.loc[0, "Close"] == 0.0
+    got["Close"] *= 2
+    got.loc[1, "Close"] = -1.0
+    pd.testing.assert_frame_equal(cache.get("a.cols", (1, 2)), bars())
+
+
+def test_resample_cache_hands_out_copies():
+    cache = ResampleCache()
+    df = bars()
+    daily = parse_interval("1D")
+    first = cache.get(df, "v1", "Date", daily)
+    expected = first.copy(deep=True)
+    first.loc[0, "Close"] = -1.0
+    hit = cache.get(df, "v1", "Date", daily)
+    pd.testing.assert_frame_equal(hit, expected)
+    hit.loc[1, "Close"] = -1.0
+    pd.testing.assert_frame_equal(cache.get(df, "v1", "Date", daily), expected)
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,70 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_analysis.columnar import ColumnarWriter, read_columnar, read_header, write_columnar
+
+
+def frame():
+    return pd.DataFrame({
+        "Date": pd.date_range("2024-03-09 12:00", periods=6, freq="12h", tz="America/New_York"),
+        "Fixed": pd.date_range("2024-01-01", periods=6, freq="D", tz=dt.timezone(dt.timedelta(hours=5, minutes=30))),
+        "Naive": pd.date_range("2024-01-01", periods=6, freq="D"),
+        "Close": [1.0, np.nan, 3.0, 4.0, 5.0, 6.0],
+        "Note": ["a", None, "", "nan", np.nan, "None"],
+    })
+
+
+def assert_round_trip(got: pd.DataFrame, df: pd.DataFrame):
+    assert list(got.columns) == list(df.columns)
+    for c in ["Date", "Fixed", "Naive", "Close"]:
+        pd.testing.assert_series_equal(got[c], df[c])
+    assert got["Note"].isna().tolist() == df["Note"].isna().tolist()
+    assert got["Note"][got["Note"].notna()].tolist() == ["a", "", "nan", "None"]
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_write_columnar_round_trip(tmp_path, mmap):
+    df = frame()
+    path = str(tmp_path / "T.cols")
+    write_columnar(df, path)
+    assert_round_trip(read_columnar(path, mmap=mmap), df)
+    columns = {col["name"]: col for col in read_header(path)["columns"]}
+    assert columns["Date"]["tz"] == "America/New_York"
+    assert "tz" not in columns["Naive"] and "missing" not in columns["Close"]
+    assert "missing" in columns["Note"]
+
+
+def test_writer_round_trip_across_chunks(tmp_path):
+    df = frame()
+    df["Note"] = ["a", None, "b", "nan", np.nan, "c"]
+    path = str(tmp_path / "T.cols")
+    writer = ColumnarWriter(path)
+    writer.append(df.iloc[:3])
+    writer.append(df.iloc[3:].reset_index(drop=True))
+    writer.close()
+    got = read_columnar(path)
+    assert got["Date"].dtype == df["Date"].dtype
+    assert got["Date"].tolist() == df["Date"].tolist()
+    assert got["Note"].isna().tolist() == [False, True, False, False, True, False]
+    assert got["Note"][got["Note"].notna()].tolist() == ["a", "b", "nan", "c"]
+
+
+def test_writer_rejects_a_chunk_in_another_zone(tmp_path):
+    df = frame()[["Date", "Close"]]
+    writer = ColumnarWriter(str(tmp_path / "T.cols"))
+    writer.append(df.iloc[:3])
+    with pytest.raises(ValueError, match="differ"):
+        writer.append(df.iloc[3:].assign(Date=df["Date"].iloc[3:].dt.tz_convert("UTC")))
+    writer.abort()
+
+
+def test_empty_frame_round_trip(tmp_path):
+    df = frame().iloc[:0]
+    path = str(tmp_path / "T.cols")
+    write_columnar(df, path)
+    got = read_columnar(path, mmap=True)
+    assert len(got) == 0
+    assert got["Date"].dtype == df["Date"].dtype
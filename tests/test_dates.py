@@ -0,0 +1,25 @@
+"""Malformed dates are client errors (400) on every endpoint that takes them."""
+import pytest
+
+
+@pytest.mark.parametrize("field", ["start_date", "end_date"])
+def test_sweep_bad_date(client, user, field):
+    r = client.post("/api/sweep", json={"stock": "NVDA", "ma_window": {"start": 5, "stop": 20, "step": 5},
+                                        field: "garbage"}, headers=user[2])
+    assert r.status_code == 400
+    assert "garbage" in r.json()["detail"]
+
+
+@pytest.mark.parametrize("url", ["/api/analyze", "/api/export-csv"])
+@pytest.mark.parametrize("field", ["start_date", "end_date"])
+def test_bad_date(client, user, url, field):
+    r = client.get(url, params={"stock": "NVDA", field: "2024-13-45"}, headers=user[2])
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("url,params", [("/api/panel/correlation", {}), ("/api/panel/beta", {"benchmark": "NVDA"})])
+def test_panel_bad_end_date(client, user, url, params):
+    r = client.get(url, params={**params, "end_date": "garbage"}, headers=user[2])
+    assert r.status_code == 400
+    assert client.get(url, params={**params, "tickers": "NOPE"}, headers=user[2]).status_code == 404
+    assert client.get(url, params=params, headers=user[2]).status_code == 200
@@ -0,0 +1,82 @@
+"""ETags, 304s and the compressed response cache."""
+import gzip
+import os
+
+import pytest
+
+from stock_analysis.http_cache import ResponseCache, etag_matches, make_etag
+
+
+def test_make_etag_is_stable_and_weak():
+    assert make_etag("analyze", "u", ("/a", (1, 2)), [("ma", {"window": 5})]) == \
+        make_etag("analyze", "u", ("/a", (1, 2)), [("ma", {"window": 5})])
+    assert make_etag("analyze", "u", ("/a", (1, 2))) != make_etag("analyze", "u", ("/a", (1, 3)))
+    assert make_etag("x").startswith('W/"')
+
+
+@pytest.mark.parametrize("header,matches", [
+    (None, False), ("", False), ("*", True), ('W/"abc"', True), ('"abc"', True),
+    ('"other", W/"abc"', True), ('"other"', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, 'W/"abc"') is matches
+
+
+def test_response_cache_keeps_within_budget():
+    cache = ResponseCache(max_bytes=4000)
+    body = b"".join(cache.tee("a", [b"x" * 100, "y" * 100], compressed=True))
+    assert gzip.decompress(body) == b"x" * 100 + b"y" * 100
+    assert cache.get("a") == body
+    # Larger than a quarter of the budget: passed through but not kept
+    noise = os.urandom(2000)
+    assert b"".join(cache.tee("big", [noise], compressed=False)) == noise
+    assert cache.get("big") is None
+
+
+def raw_get(client, url, params, headers):
+    """Status, headers and the body exactly as sent (not decompressed)."""
+    with client.stream("GET", url, params=params, headers=headers) as r:
+        return r.status_code, r.headers, b"".join(r.iter_raw())
+
+
+@pytest.mark.parametrize("url,params", [
+    ("/api/analyze", {"stock": "PLTR", "ma_window": 7}),
+    ("/api/analyze", {"stock": "PLTR", "format": "ndjson"}),
+    ("/api/export-csv", {"stock": "PLTR", "start_date": "2024-01-01"}),
+])
+def test_etag_304_and_cache_hit(client, app_module, user, url, params):
+    headers = user[2]
+    gz = {**headers, "Accept-Encoding": "gzip"}
+    plain = {**headers, "Accept-Encoding": "identity"}
+    # The first load converts the uploaded CSV, which gives the ticker a new version
+    app_module.data_loader.load_data(params["stock"], user[0])
+    hits = app_module.response_cache.hits
+    status, first, miss = raw_get(client, url, params, gz)
+    assert status == 200 and first["content-encoding"] == "gzip"
+    status, second, hit = raw_get(client, url, params, gz)
+    assert second["etag"] == first["etag"]
+    assert hit == miss
+    assert app_module.response_cache.hits == hits + 1
+    # Cached compressed, served decompressed to a client without gzip
+    status, third, body = raw_get(client, url, params, plain)
+    assert "content-encoding" not in third
+    assert body == gzip.decompress(miss)
+
+    r = client.get(url, params=params, headers={**headers, "If-None-Match": first["etag"]})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == first["etag"]
+
+
+def test_etag_changes_with_the_file(client, user):
+    headers = user[2]
+    params = {"stock": "PYPL", "ma_window": 9}
+    before = client.get("/api/analyze", params=params, headers=headers)
+    r = client.post("/api/stocks/PYPL/bars", json={"bars": [
+        {"Date": "2031-06-02", "Open": 1, "High": 2, "Low": 0.5, "Close": 1.5, "Volume": 10}]}, headers=headers)
+    assert r.status_code == 200, r.text
+    after = client.get("/api/analyze", params=params, headers={**headers, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert after.json()["data"][-1]["Date"] == "2031-06-02"
+    # Other users still see the public file, under its old tag
+    assert before.json()["data"][-1]["Date"] != "2031-06-02"
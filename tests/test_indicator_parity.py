@@ -0,0 +1,143 @@
+"""TechnicalIndicators (NumPy kernels) against the pandas implementations they replaced."""
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from benchmarks.datasets import synthetic_ohlcv
+from benchmarks.indicators import METHODS, PandasIndicators
+from stock_analysis import kernels
+from stock_analysis.indicators import TechnicalIndicators
+
+PARAMS = {
+    "add_ma": [{"window": 1}, {"window": 30}],
+    "add_ema": [{"span": 1}, {"span": 3}, {"span": 14}],
+    "add_rsi": [{"window": 14}],
+    "add_macd": [{}, {"fast": 3, "slow": 5, "signal": 3}],
+    "add_atr": [{"window": 14}],
+    "add_sma": [{"window": 20}],
+    "add_std": [{"window": 2}, {"window": 20}],
+    "add_bollinger_bands": [{"window": 20, "num_std": 2.0}],
+}
+CASES = [(method, params) for method in METHODS for params in PARAMS[method]]
+
+
+def ohlc(rows: int, seed: int = 0) -> pd.DataFrame:
+    return synthetic_ohlcv(rows, seed=seed)[["Close", "High", "Low"]]
+
+
+def with_gaps(df: pd.DataFrame, seed: int, share: float = 0.15) -> pd.DataFrame:
+    """``df`` with blank cells scattered through every column and one long run of them in Close."""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    for column in df.columns:
+        df.loc[rng.random(len(df)) < share, column] = np.nan
+    df.loc[len(df) // 3:len(df) // 3 + 40, "Close"] = np.nan
+    return df
+
+
+def two_pass_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling sample std computed window by window, as exact as float64 allows."""
+    std = np.full(len(values), np.nan)
+    if len(values) >= window:
+        std[window - 1:] = sliding_window_view(values, window).std(axis=1, ddof=1)
+    return std
+
+
+def with_exact_std(expected: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """``expected`` with its rolling std columns replaced by the two-pass values.
+
+    pandas' online variance loses most of its digits after a jump in level
+    or on small moves far from zero, where the kernels stay exact.
+    """
+    window = params.get("window", 20)
+    column = f"STD_{window}"
+    if column in expected:
+        expected[column] = two_pass_std(expected["Close"].to_numpy(), window)
+        if f"Upper_BB_{window}" in expected:
+            sma, std = expected[f"SMA_{window}"], expected[column]
+            expected[f"Upper_BB_{window}"] = sma + std * params.get("num_std", 2.0)
+            expected[f"Lower_BB_{window}"] = sma - std * params.get("num_std", 2.0)
+    return expected
+
+
+def assert_parity(df: pd.DataFrame, method: str, params: dict, rtol: float = 1e-9, atol: float = 1e-7,
+                  exact_std: bool = False):
+    expected = getattr(PandasIndicators, method)(df.copy(), **params)
+    if exact_std:
+        expected = with_exact_std(expected, params)
+    actual = getattr(TechnicalIndicators, method)(df.copy(), **params)
+    pd.testing.assert_frame_equal(actual, expected, rtol=rtol, atol=atol, check_dtype=False)
+
+
+@pytest.mark.parametrize("method,params", CASES)
+def test_clean_series(method, params):
+    assert_parity(ohlc(2_000), method, params)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("method,params", CASES)
+def test_nan_gaps(method, params, seed):
+    assert_parity(with_gaps(ohlc(1_000, seed), seed), method, params)
+
+
+@pytest.mark.parametrize("method,params", CASES)
+def test_leading_and_trailing_nan(method, params):
+    df = ohlc(300)
+    df.loc[:24, "Close"] = np.nan
+    df.loc[280:, "Close"] = np.nan
+    assert_parity(df, method, params)
+
+
+@pytest.mark.parametrize("rows", [0, 1, 5, 19])
+@pytest.mark.parametrize("method,params", CASES)
+def test_window_longer_than_series(method, params, rows):
+    assert_parity(ohlc(rows), method, params)
+
+
+@pytest.mark.parametrize("method,params", CASES)
+def test_constant_windows(method, params):
+    df = ohlc(500)
+    # Flat stretches, where the variance is zero and rounding could make it negative
+    df.loc[100:199, ["Close", "High", "Low"]] = 123.456
+    df.loc[300:, ["Close", "High", "Low"]] = 1e-3
+    assert_parity(df, method, params, exact_std=True)
+    if method == "add_std":
+        std = kernels.rolling_std(df["Close"].to_numpy(), params["window"])
+        assert (std[100 + params["window"] - 1:200] >= 0).all()
+        np.testing.assert_allclose(std[100 + params["window"] - 1:200], 0, atol=1e-9)
+
+
+@pytest.mark.parametrize("offset", [1e6, 1e9])
+@pytest.mark.parametrize("method,params", CASES)
+def test_large_offsets(method, params, offset):
+    df = ohlc(2_000) - 100 + offset
+    # Absolute error grows with the level; compare at the precision float64 has there
+    assert_parity(df, method, params, rtol=1e-9, atol=offset * 1e-12, exact_std=True)
+
+
+@pytest.mark.parametrize("offset", [1e6, 1e9])
+@pytest.mark.parametrize("window", [2, 20, 200])
+def test_rolling_std_large_offset_against_two_pass(offset, window):
+    # Small moves on a high level: naive sum-of-squares variance cancels catastrophically
+    rng = np.random.default_rng(0)
+    x = offset + rng.normal(0, 1, 20_000).cumsum() * 1e-2
+    expected = np.full(len(x), np.nan)
+    expected[window - 1:] = sliding_window_view(x, window).std(axis=1, ddof=1)
+    np.testing.assert_allclose(kernels.rolling_std(x, window), expected, rtol=1e-6, atol=offset * 1e-13)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_ewm_random_gaps(seed):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=int(rng.integers(1, 500))).cumsum()
+    x[rng.random(len(x)) < rng.uniform(0, 0.8)] = np.nan
+    for span in (1, 2, 3, 5, 14, 26, float(rng.uniform(1, 50))):
+        expected = pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+        np.testing.assert_allclose(kernels.ewm_mean(x, span), expected, rtol=1e-12, equal_nan=True)
+
+
+def test_ewm_span_three_gap():
+    # com == 1: pandas renormalises the weights across the gap
+    x = np.array([1, 2, np.nan, 4, 5.0])
+    np.testing.assert_allclose(kernels.ewm_mean(x, 3), [1, 1.5, 1.5, 3.375, 4.1875])
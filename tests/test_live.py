@@ -0,0 +1,102 @@
+"""Live feed: IndicatorState against batch indicators, and the /ws/live protocol."""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.datasets import synthetic_ohlcv
+from benchmarks.indicators import PandasIndicators
+from stock_analysis.engine import IndicatorState
+
+SPECS = [
+    ("ma", {"window": 30}),
+    ("rsi", {"window": 14}),
+    ("ema", {"span": 3}),
+    ("ema", {"span": 14}),
+    ("bollinger", {"window": 20, "num_std": 2.0}),
+    ("macd", {"fast": 12, "slow": 26, "signal": 9}),
+    ("atr", {"window": 14}),
+    ("sma", {"window": 10}),
+    ("std", {"window": 5}),
+]
+REFERENCE = {"ma": "add_ma", "rsi": "add_rsi", "ema": "add_ema", "bollinger": "add_bollinger_bands",
+             "macd": "add_macd", "atr": "add_atr", "sma": "add_sma", "std": "add_std"}
+
+
+def reference(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for name, params in SPECS:
+        out = getattr(PandasIndicators, REFERENCE[name])(out, **params)
+    return out
+
+
+@pytest.mark.parametrize("step", [1, 7])
+@pytest.mark.parametrize("gaps", [False, True])
+def test_indicator_state_matches_batch(step, gaps):
+    df = synthetic_ohlcv(300)
+    if gaps:
+        df.loc[np.random.default_rng(0).random(len(df)) < 0.1, "Close"] = np.nan
+        df.loc[100:130, "Close"] = np.nan
+    start = 60
+    state = IndicatorState(df.iloc[:start], SPECS)
+    parts = []
+    for pos in range(start, len(df), step):
+        values = state.update(df.iloc[pos:pos + step])
+        parts.append(pd.DataFrame(values))
+    expected = reference(df).iloc[start:].reset_index(drop=True)
+    got = pd.concat(parts, ignore_index=True)
+    pd.testing.assert_frame_equal(got, expected[list(got.columns)], rtol=1e-9, atol=1e-7, check_dtype=False)
+    assert state.rows == len(df)
+
+
+def receive(ws) -> dict:
+    return json.loads(ws.receive_text())
+
+
+def bar(date: str, close: float) -> dict:
+    return {"Date": date, "Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000}
+
+
+def test_websocket_subscribe_update_unsubscribe(client, app_module, user, monkeypatch):
+    username, token, headers = user
+    monkeypatch.setattr(app_module.live_feed, "interval", 0.05)
+    with client:
+        with client.websocket_connect(f"/ws/live?token={token}") as ws:
+            ws.send_text(json.dumps({"action": "subscribe", "stock": "NVDA", "params": {"ma_window": 5},
+                                     "indicators": ["ma", "rsi"]}))
+            subscribed = receive(ws)
+            assert subscribed["type"] == "subscribed" and subscribed["stock"] == "NVDA"
+            assert {"MA_5", "RSI_14"} <= set(subscribed["columns"])
+
+            for message, detail in [({"action": "subscribe"}, "needs a stock"),
+                                    ({"action": "subscribe", "stock": "NVDA", "params": [1]}, "must be an object"),
+                                    ({"action": "subscribe", "stock": "NVDA", "indicators": ["nope"]}, "nope"),
+                                    ({"action": "subscribe", "stock": "NOPE"}, "not found"),
+                                    ({"action": "dance"}, "Unknown action")]:
+                ws.send_text(json.dumps(message))
+                error = receive(ws)
+                assert error["type"] == "error" and detail in error["detail"], (message, error)
+
+            r = client.post("/api/stocks/NVDA/bars", json={"bars": [bar("2031-01-02", 100.0)]}, headers=headers)
+            assert r.status_code == 200, r.text
+            update = receive(ws)
+            assert update["type"] == "bars" and update["id"] == subscribed["id"]
+            assert [row["Date"] for row in update["data"]] == ["2031-01-02"]
+            served = client.get("/api/analyze", params={"stock": "NVDA", "ma_window": 5, "indicators": "ma,rsi"},
+                                headers=headers).json()["data"][-1]
+            assert update["data"][0] == pytest.approx(served)
+
+            ws.send_text(json.dumps({"action": "unsubscribe", "id": subscribed["id"]}))
+            deadline = time.monotonic() + 5
+            while app_module.live_feed.stats()["subscriptions"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert app_module.live_feed.stats()["subscriptions"] == 0
+
+
+def test_websocket_needs_a_token(client):
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/ws/live?token=nope") as ws:
+            ws.receive_text()
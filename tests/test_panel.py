@@ -0,0 +1,64 @@
+"""PanelStore: one user's panel build doesn't hold up other users."""
+import threading
+
+from benchmarks.datasets import synthetic_ohlcv
+from stock_analysis.columnar import write_columnar
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.panel import PanelStore
+
+
+class SlowLoader(DataLoader):
+    """Loads for ``slow_user`` wait until ``release`` is set."""
+
+    def __init__(self, *args, slow_user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow_user = slow_user
+        self.loading = threading.Event()
+        self.release = threading.Event()
+
+    def load_versioned(self, stock_name, username=None):
+        if username == self.slow_user:
+            self.loading.set()
+            assert self.release.wait(10)
+        return super().load_versioned(stock_name, username)
+
+
+def store(tmp_path):
+    for i, user in enumerate(["alice", "bob"]):
+        (tmp_path / "users" / user).mkdir(parents=True)
+        write_columnar(synthetic_ohlcv(200, seed=i), str(tmp_path / "users" / user / "T.cols"))
+    loader = SlowLoader(str(tmp_path / "public"), str(tmp_path / "users"), revalidate_seconds=0,
+                        slow_user="alice")
+    return loader, PanelStore(loader)
+
+
+def test_other_users_are_served_while_a_panel_builds(tmp_path):
+    loader, panels = store(tmp_path)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.setdefault(i, panels.get("alice"))) for i in range(3)]
+    for t in threads:
+        t.start()
+    try:
+        assert loader.loading.wait(10)
+        # alice's build is blocked inside load_versioned; bob's isn't waiting on it
+        assert panels.get("bob").tickers == ["T"]
+        assert not results
+    finally:
+        loader.release.set()
+        for t in threads:
+            t.join(10)
+    # The requests that waited for alice's build reuse it instead of building again
+    assert len({id(panel) for panel in results.values()}) == 1
+    assert panels.builds == 2
+    assert panels._building == {}
+
+
+def test_changed_file_rebuilds(tmp_path):
+    loader, panels = store(tmp_path)
+    loader.release.set()
+    first = panels.get("bob")
+    assert panels.get("bob") is first
+    write_columnar(synthetic_ohlcv(250, seed=5), str(tmp_path / "users" / "bob" / "T.cols"))
+    second = panels.get("bob")
+    assert second is not first and len(second.dates) == 250
+    assert (panels.builds, panels.reloads) == (2, 2)
@@ -0,0 +1,67 @@
+"""Precomputed frames: one process runs the passes, the others wait their turn."""
+import time
+
+import pytest
+
+from benchmarks.datasets import synthetic_ohlcv
+from stock_analysis.columnar import write_columnar
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.precompute import PrecomputedStore, Precomputer, fcntl
+
+SPECS = [("ma", {"window": 20}), ("rsi", {"window": 14})]
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="needs fcntl")
+
+
+def precomputer(directory, interval=0.02) -> Precomputer:
+    loader = DataLoader(str(directory), str(directory / "users"), revalidate_seconds=0)
+    return Precomputer(loader, PrecomputedStore(str(directory)), SPECS, interval=interval)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_only_the_lock_holder_runs_passes(tmp_path):
+    write_columnar(synthetic_ohlcv(300), str(tmp_path / "T.cols"))
+    first, second = precomputer(tmp_path), precomputer(tmp_path)
+    first.start()
+    try:
+        wait_for(lambda: first.computed == 1)
+        second.start()
+        write_columnar(synthetic_ohlcv(300, seed=1), str(tmp_path / "U.cols"))
+        wait_for(lambda: first.computed == 2)
+        time.sleep(0.1)
+        assert first.leader and not second.leader
+        assert second.computed == 0
+        assert sorted(first.store.stored()) == ["T", "U"]
+        # The lock file isn't a ticker
+        assert first.loader.get_available_tickers() == ["T", "U"]
+
+        # When the leader goes, another worker takes over
+        first.stop()
+        assert not first.leader
+        wait_for(lambda: second.leader)
+        write_columnar(synthetic_ohlcv(300, seed=2), str(tmp_path / "V.cols"))
+        wait_for(lambda: second.computed == 1)
+        assert sorted(second.store.stored()) == ["T", "U", "V"]
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_single_pass_skipped_while_another_process_leads(tmp_path):
+    write_columnar(synthetic_ohlcv(300), str(tmp_path / "T.cols"))
+    leader = precomputer(tmp_path)
+    leader.start()
+    try:
+        wait_for(lambda: leader.computed == 1)
+        once = precomputer(tmp_path, interval=0)
+        once.start()
+        once.stop()
+        assert once.computed == 0 and not once.leader
+    finally:
+        leader.stop()
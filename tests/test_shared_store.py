@@ -0,0 +1,157 @@
+"""SharedFrameStore across processes, and DataLoader's fallback when it fails."""
+import json
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.datasets import synthetic_ohlcv
+from stock_analysis.data_loader import DataLoader
+from stock_analysis.shared_store import SharedFrameStore, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="needs fcntl")
+
+
+def version(name: str):
+    return (f"/data/{name}.cols", (1, 1))
+
+
+def index(store: SharedFrameStore) -> dict:
+    with open(os.path.join(store.directory, "index.json")) as f:
+        return json.load(f)
+
+
+def slots_held(directory: str, slots, out):
+    """Child: which of ``slots`` some other process holds."""
+    fd = os.open(os.path.join(directory, "attach.lock"), os.O_RDWR | os.O_CREAT)
+    held = []
+    for slot in slots:
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+        except OSError:
+            held.append(slot)
+        else:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, slot)
+    out.put(held)
+
+
+def hold(directory: str, name: str, attached, done):
+    """Child: attach ``name`` and keep it until told to exit."""
+    attached.put(SharedFrameStore(directory).attach(version(name)) is not None)
+    done.wait()
+
+
+def probe(directory: str, slots) -> list:
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=slots_held, args=(directory, list(slots), out))
+    proc.start()
+    held = out.get(timeout=60)
+    proc.join()
+    return held
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedFrameStore(str(tmp_path / "shm"))
+
+
+def test_publish_then_attach(store):
+    df = synthetic_ohlcv(500)
+    published = store.publish(version("A"), df)
+    pd.testing.assert_frame_equal(published, df)
+    pd.testing.assert_frame_equal(store.attach(version("A")), df)
+    assert store.attach(version("B")) is None
+
+
+def test_second_store_attaches_without_republishing(store):
+    df = synthetic_ohlcv(200)
+    store.publish(version("A"), df)
+    index_path = os.path.join(store.directory, "index.json")
+    before = os.stat(index_path).st_mtime_ns, index(store)
+    other = SharedFrameStore(store.directory)
+    pd.testing.assert_frame_equal(other.attach(version("A")), df)
+    pd.testing.assert_frame_equal(other.publish(version("A"), synthetic_ohlcv(200, seed=1)), df)
+    assert (store.published, other.published, other.attached) == (1, 0, 1)
+    # Attaching only reads the index
+    assert (os.stat(index_path).st_mtime_ns, index(store)) == before
+
+
+def test_eviction_skips_held_frames_and_removes_oldest_first(store):
+    df = synthetic_ohlcv(200)
+    for name in "ABCD":
+        store.publish(version(name), df)
+        store.release(version(name))
+    ctx = multiprocessing.get_context("spawn")
+    attached, done = ctx.Queue(), ctx.Event()
+    child = ctx.Process(target=hold, args=(store.directory, "A", attached, done))
+    child.start()
+    try:
+        assert attached.get(timeout=60)
+        # A is the oldest, but the child holds it
+        for age, name in enumerate("ABCD"):
+            entry = index(store)[store.key(version(name))]
+            os.utime(os.path.join(store.directory, entry["file"]), (1000 + age, 1000 + age))
+        store.max_bytes = 3 * entry["nbytes"]
+        store.publish(version("E"), df)
+        kept = {e["path"] for e in index(store).values()}
+        assert kept == {version(name)[0] for name in "ADE"}
+        assert sorted(os.listdir(store.directory)) == sorted(
+            ["index.json", "index.lock", "attach.lock"] + [e["file"] for e in index(store).values()])
+    finally:
+        done.set()
+        child.join()
+    # The child's locks went with it
+    store.max_bytes = entry["nbytes"]
+    store.publish(version("F"), df)
+    assert {e["path"] for e in index(store).values()} == {version("E")[0], version("F")[0]}
+
+
+def test_release_all_frees_slots(store):
+    df = synthetic_ohlcv(50)
+    for name in "AB":
+        store.publish(version(name), df)
+    slots = sorted(e["slot"] for e in index(store).values())
+    assert store.stats()["attached_here"] == 2
+    assert probe(store.directory, slots) == slots
+    store.release_all()
+    assert probe(store.directory, slots) == []
+    assert store.stats()["attached_here"] == 0
+
+
+def test_slots_are_reused(store):
+    df = synthetic_ohlcv(50)
+    store.publish(version("A"), df)
+    store.release(version("A"))
+    store.max_bytes = 0
+    # A's slot is freed once B is in, so the next frame takes it
+    store.publish(version("B"), df)
+    store.release(version("B"))
+    store.publish(version("C"), df)
+    assert [(e["path"], e["slot"]) for e in index(store).values()] == [(version("C")[0], 0)]
+
+
+class BrokenStore(SharedFrameStore):
+    def attach(self, version):
+        raise OSError("no locks here")
+
+    def publish(self, version, df, username=None, stock_name=None):
+        raise OSError("tmpfs full")
+
+    def release(self, version):
+        raise OSError("no locks here")
+
+
+def test_loader_falls_back_to_process_frames(tmp_path):
+    public = tmp_path / "public"
+    public.mkdir()
+    df = synthetic_ohlcv(100)
+    df.to_csv(public / "T_raw.csv", index=False)
+    loader = DataLoader(str(public), str(tmp_path / "users"), shared=BrokenStore(str(tmp_path / "shm")))
+    loaded = loader.load_data("T")
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=False)
+    assert loader.cache.stats()["entries"] == 1
+    pd.testing.assert_frame_equal(loader.load_data("T"), loaded)
+    loader.cache.clear()
+    assert loader.cache.stats()["entries"] == 0
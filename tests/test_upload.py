@@ -0,0 +1,87 @@
+"""CSV uploads: streamed validation and the stored .cols file."""
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.datasets import synthetic_ohlcv
+from stock_analysis.columnar import read_columnar
+from stock_analysis.data_loader import DataLoader
+
+
+def csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False, date_format="%Y-%m-%d").encode("utf-8")
+
+
+def upload(client, headers, name: str, content: bytes):
+    return client.post("/api/upload-csv", files={"file": (name, content, "text/csv")}, headers=headers)
+
+
+def user_files(app_dir, username: str) -> list:
+    directory = app_dir / "data" / "users" / username
+    return sorted(os.listdir(directory)) if directory.exists() else []
+
+
+def test_upload_round_trips_through_cols(client, app_dir, user):
+    username, _, headers = user
+    df = synthetic_ohlcv(300)
+    r = upload(client, headers, "MINE.csv", csv_bytes(df))
+    assert r.status_code == 200 and r.json()["ticker"] == "MINE"
+    assert user_files(app_dir, username) == ["MINE.cols"]
+    stored = read_columnar(str(app_dir / "data" / "users" / username / "MINE.cols"))
+    pd.testing.assert_frame_equal(stored, df, check_dtype=False)
+    assert stored["Volume"].dtype.kind == "i"
+    served = client.get("/api/analyze", params={"stock": "MINE", "indicators": "ma"}, headers=headers).json()
+    assert len(served["data"]) == 300
+    assert served["data"][-1]["Close"] == pytest.approx(df["Close"].iloc[-1])
+
+
+@pytest.mark.parametrize("damage,message", [
+    (lambda df: df.iloc[[0, 2, 1] + list(range(3, len(df)))], "Row 3: dates must be strictly increasing"),
+    (lambda df: pd.concat([df.iloc[:10], df.iloc[9:]]), "Row 11: dates must be strictly increasing"),
+])
+def test_unordered_dates_are_rejected(client, app_dir, user, damage, message):
+    username, _, headers = user
+    r = upload(client, headers, "BAD.csv", csv_bytes(damage(synthetic_ohlcv(50))))
+    assert r.status_code == 400
+    assert message in r.json()["detail"]
+    assert user_files(app_dir, username) == []
+
+
+@pytest.mark.parametrize("row,message", [
+    ("2000-02-22,1.0,2.0,0.5,1.0,100,extra", "Expected 6 fields"),
+    ("2000-02-22,abc,2.0,0.5,1.0,100", "Close is not a number"),
+    ("not-a-date,1.0,2.0,0.5,1.0,100", "bad date"),
+])
+def test_malformed_row_leaves_nothing_behind(client, app_dir, user, row, message):
+    username, _, headers = user
+    good = csv_bytes(synthetic_ohlcv(50))
+    content = good + row.encode("utf-8") + b"\n"
+    r = upload(client, headers, "BAD.csv", content)
+    assert r.status_code == 400
+    assert message in r.json()["detail"]
+    assert user_files(app_dir, username) == []
+
+
+def test_failed_upload_keeps_the_previous_data(client, app_dir, user):
+    username, _, headers = user
+    df = synthetic_ohlcv(40)
+    assert upload(client, headers, "KEEP.csv", csv_bytes(df)).status_code == 200
+    damaged = csv_bytes(synthetic_ohlcv(80, seed=1)) + b"garbage,1,2,3,4,5\n"
+    assert upload(client, headers, "KEEP.csv", damaged).status_code == 400
+    assert user_files(app_dir, username) == ["KEEP.cols"]
+    stored = read_columnar(str(app_dir / "data" / "users" / username / "KEEP.cols"))
+    pd.testing.assert_frame_equal(stored, df, check_dtype=False)
+
+
+def test_errors_in_a_later_chunk(tmp_path):
+    # Small chunks, so the bad row is found after earlier chunks were written out
+    loader = DataLoader(str(tmp_path / "public"), str(tmp_path / "users"))
+    df = synthetic_ohlcv(95)
+    df.loc[70, "Date"] = df.loc[69, "Date"]
+    with pytest.raises(ValueError, match="Row 71: dates must be strictly increasing"):
+        loader.save_user_file("u", "T.csv", csv_bytes(df), chunk_rows=20)
+    assert os.listdir(tmp_path / "users" / "u") == []
+    ok = synthetic_ohlcv(95)
+    assert loader.save_user_file("u", "T.csv", csv_bytes(ok), chunk_rows=20) == "T"
+    pd.testing.assert_frame_equal(loader.load_data("T", "u"), ok, check_dtype=False)